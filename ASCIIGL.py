@@ -29,29 +29,95 @@
 	The size of the rendering surface is defined at initialization.
 	
 	---FRAMEBUFFER AND RENDERING---
-	The framebuffer is a list of characters. When you issue a drawing command,
-	this list is modified. It is reset to whatever character you've set the
+	The framebuffer is a set of compact planes: one of character codepoints,
+	and one each of foreground, background and style attribute indices.
+	(See ASCIIGLFramebuffer for the details, and memory figures.)
+	When you issue a drawing command, these planes are modified. It is reset to whatever character you've set the
 	clear character and color to be whenever you call clear(). 
 	*By default, it is a space whatever color your console is.*
 	The actual drawing of the graphics is essentially double-buffered.
-	When required to draw the screen to the console, the framebuffer list
-	is copied down into a string juxtaposed with newlines at each "scanline".
+	When required to draw the screen to the console, the framebuffer
+	is encoded into a string juxtaposed with newlines at each "scanline".
+	Only then are the color escapes glued onto the characters, and only
+	where the colors actually change. (See ASCIIGLEncoder.)
 	This string is then traditionally printed to the screen.
+	That is, unless the presentation mode is PRESENT_DELTA (the default).
+	Then we keep the last frame we presented, and only send the
+	runs of cells that changed since then, each one preceded by a 
+	cursor-positioning escape. If the delta ends up being bigger than a full
+	redraw would have been, we just do the full redraw. The number of bytes
+	sent for the last frame is kept in lastFrameBytes.
+
+	---OUTPUT BACKENDS---
+	"The screen" is really whatever output backend the surface has.
+	By default that's the console, but it can just as well be memory,
+	a file, or nowhere at all, so a surface can render without a console.
+	(See ASCIIGLOutput, and setOutputBackend().)
+	A backend can also be wrapped in a presenter, which writes frames on
+	a thread of its own while the next frame is drawn. If it falls behind,
+	frames are dropped rather than waited for. (See ASCIIGLPresenter.)
+
+	---FRAME LIFECYCLE---
+	Nothing gets allocated per frame once things are warmed up.
+	There are two framebuffers, made up front: the one being drawn into,
+	and the one that was last presented. Presenting a frame swaps the two
+	by reference, and clearing one is a bulk copy from a cleared template.
+	Frames are encoded into output buffers that are reused from frame to
+	frame. And the screen is cleared with an escape sequence, rather than
+	by running a shell command.
+	
+	---LAYERS---
+	A surface can be split into named layers with addLayer(), which are
+	composited into the framebuffer, in z-order, when it's blitted.
+	Static layers are only rasterized again when invalidated, and only
+	rows that dynamic layers drew into are composited again, so a frame
+	only costs what actually moves. (See ASCIIGLLayers.)
+	
+	---COLOR---
+	Besides Colorama's colors, anything that takes a color takes a 256
+	palette or RGB color code from ASCIIGLColor. Cells keep the color they
+	were drawn with, and it's only brought down to what the console can
+	show, set with setColorDepth(), when the frame is encoded.
+	
+	---PROFILING---
+	Call setProfiling(True), and the stats member counts the cells written
+	and culled, the bytes sent, and the time spent, for every frame.
+	(See ASCIIGLProfiler.)
+	
+	---QUALITY---
+	Give a surface an ASCIIGLQuality.QualityController with
+	setQualityController(), and it gives up colors, and then particle
+	updates, whenever the console can't keep up with the frames it's
+	sent, and takes them back when it can. (See ASCIIGLQuality.)
+	
+	---RECORDING---
+	Give a surface a recorder with setRecorder(), and every frame it
+	presents is recorded to a file, to be played back later without
+	whatever drew it. (See ASCIIGLRecorder.)
 	
 	---TIPS AND TRICKS---
 	Console clear commands seem to be really slow. So during continuous
 	drawing, you'll probably experience a nice little flicker. Therefore
 	I recommend only redrawing the scene when there has been a change,
 	e.g. a tetris block moved down or something.
-	Using a COLOR-MODE other than PRESERVE_COLOR will drastically slow down
-	rendering speed. Tearing will happen and frame-times will increase, slowing
-	any animation linearly with each change to the color. So only use it if
-	you're a prick.
+	Using a COLOR-MODE other than PRESERVE_COLOR will slow down rendering.
+	Color escapes are only sent where the colors actually change, so long
+	same-colored runs are cheap, but every change of color still costs bytes.
+	So only use it if you're a prick.
 	COLOR-MODES do not affect textures.
 	Also, it is recommended that you capture keyboard exits in your program
 	so that you can issue one final clear screen call, so you don't have any
 	remnants of the final rendered ASCIIGL frame in your console.
 	
+	---RENDER STATE---
+	Every ASCIIGL surface owns its own render state: its modes, its colors,
+	its clear character. They start out as the defaults in ASCIIGLConstants,
+	and are changed with the setters, so two surfaces can be set up
+	differently.
+	Whenever the state changes, the surface rebuilds a cell writer
+	specialized for it. Drawing functions then just call that writer,
+	without checking any modes per cell.
+	
 	---TL;DR HOW TO USE---
 	Initialize an instance of the ASCIIGL class. Set it up how you want
 	by calling the various setters and getters USING THE APPROPRIATE TERMS
@@ -73,11 +139,35 @@ import ASCIIGLConstants
 #We import ASCIIGLTexture so that we can draw textured stuff.
 import ASCIIGLTexture
 
+#The framebuffer planes live here.
+import ASCIIGLFramebuffer
+
+#And this turns them into something the console understands.
+import ASCIIGLEncoder
+
+#Which then gets written to wherever we're presenting to.
+import ASCIIGLOutput
+
+#For counting what goes into a frame, if asked to.
+import ASCIIGLProfiler
+
+#For drawing in layers.
+import ASCIIGLLayers
+
 #Hey, we need to flatten things somehow. Might as well do it well.
 import math
 
-#This is done almost solely so that we can clear the screen.
-import os
+#For timing frames, for the quality controller.
+import time
+
+#For drawing batches of characters.
+import itertools
+
+#For writing whole spans of the framebuffer at once.
+from array import array
+
+#Text layouts are kept in an LRU cache.
+from collections import OrderedDict
 
 import string
 
@@ -100,27 +190,248 @@ class ASCIIGL(object):
 		self.sizeY = sizeY
 		
 		"""
-			The list of characters that make up the framebuffer.
+			The render state of this surface. It starts out as the defaults
+			in ASCIIGLConstants, and is changed with the setters.
+		"""
+		self.clearCharacter = ASCIIGLConstants.clearCharacter
+		self.flatMode = ASCIIGLConstants.flatMode
+		self.borderCornerMode = ASCIIGLConstants.borderCornerMode
+		self.shapeFillMode = ASCIIGLConstants.shapeFillMode
+		self.cullMode = ASCIIGLConstants.cullMode
+		self.textWrapMode = ASCIIGLConstants.textWrapMode
+		self.colorMode = ASCIIGLConstants.colorMode
+		self.textColor = ASCIIGLConstants.textColor
+		self.textStyle = ASCIIGLConstants.textStyle
+		self.bgColor = ASCIIGLConstants.bgColor
+		self.textureMode = ASCIIGLConstants.textureMode
+		self.texBlendingMode = ASCIIGLConstants.texBlendingMode
+		self.presentMode = ASCIIGLConstants.presentMode
+		self.colorDepth = ASCIIGLConstants.colorDepth
+		
+		"""
+			The planes of characters and attributes that make up the framebuffer.
+		"""
+		self.frameBuffer = ASCIIGLFramebuffer.Framebuffer(sizeX, sizeY, self.clearCharacter)
+		
+		"""
+			The last frame we presented, so we can send only what changed.
+			If lastFrameValid is false, the console contents are unknown,
+			and the next frame has to be a full redraw.
 		"""
-		self.frameBuffer = []
+		self.lastFrame = ASCIIGLFramebuffer.Framebuffer(sizeX, sizeY, self.clearCharacter)
+		self.lastFrameValid = False
+		
+		#How many bytes the last presented frame cost.
+		self.lastFrameBytes = 0
+		
+		#How many frames were dropped because the output backend was busy.
+		self.droppedFrames = 0
+		
+		#Turns the framebuffer into the bytes that draw it.
+		self.encoder = ASCIIGLEncoder.FrameEncoder(self.colorDepth)
+		
+		#What the encoder encodes into: one for a delta, one for a full redraw,
+		#so we can pick whichever's smaller. output is the one we last sent.
+		self.deltaOutput = ASCIIGLEncoder.OutputBuffer()
+		self.fullOutput = ASCIIGLEncoder.OutputBuffer()
+		self.output = self.fullOutput
+		
+		#Where finished frames get written. The console, by default.
+		self.outputBackend = ASCIIGLOutput.TerminalOutput()
+		
+		#What goes into every frame, if profiling is on. None if it's off.
+		self.stats = None
+		
+		#What records every frame we present, if anything.
+		self.recorder = None
 		
-		#Create a swapbuffer string.
-		self.swapString = ""
+		#What trades quality for frame time, if anything.
+		self.quality = None
 		
-		for i in range(sizeX * sizeY):
-			self.frameBuffer.append(ASCIIGLConstants.clearCharacter)
+		#The band of rows [bandTop, bandBottom) that drawing may touch.
+		#All of them, unless setBand() says otherwise.
+		self.bandTop = 0
+		self.bandBottom = sizeY
+		
+		#Text we've already laid out, by (text, x, y, text wrap mode), most
+		#recently used last, and how often we could reuse a layout.
+		self.textLayouts = OrderedDict()
+		self.textLayoutLimit = 256
+		self.textLayoutHits = 0
+		self.textLayoutMisses = 0
+		
+		#The layers, if there are any, and the one being drawn into, if
+		#any. While one is, the framebuffer we composite into is kept in
+		#screenFrame, and frameBuffer is the layer's.
+		self.compositor = None
+		self.layer = None
+		self.screenFrame = self.frameBuffer
+		
+		#Build the cell writer for the initial state.
+		self.updateWriter()
+	
+	"""
+		Rebuilds the functions that drawing goes through, specialized
+		for the current render state. This is called by every setter,
+		so you only need to call it yourself if you poke the state
+		members directly.
+		
+		HOW IT WORKS:
+		All of the mode checks that used to happen for every cell happen
+		here instead, once. Then we build:
+		flatten:		math.floor or math.ceil, based on the flattening mode.
+		attributes:		The foreground, background and style attribute indices
+						a character drawn right now would get.
+		placeCell:		Maps an already flattened (x, y) to a framebuffer index,
+						culling or wrapping based on the culling mode. Returns -1
+						if the location was culled, or lands outside the band.
+		writeCell:		Writes a codepoint, along with the attributes, into the
+						framebuffer at an index.
+		writeSpan:		Writes a codepoint, along with the attributes, into count
+						cells starting at an index, step cells apart, as one slice
+						assignment per plane. Spans are not culled; that's up to
+						the caller.
+		writeGlyphs:	Writes an array of codepoints, along with the attributes,
+						into consecutive cells starting at an index, as one slice
+						assignment per plane. Not culled either.
+		writeTexel:		Writes a picked-apart texel into the framebuffer at an
+						index, based on the texture blending mode.
+		writeTexelSpan:	Like writeSpan, but for a picked-apart texel.
+	"""
+	def updateWriter(self):
+		
+		self.flatten = math.floor if self.flatMode == ASCIIGLConstants.FLAT_FLOOR else math.ceil
+		
+		if(self.colorMode == ASCIIGLConstants.EDIT_COLOR):
+			self.attributes = (ASCIIGLFramebuffer.internColor(self.textColor), ASCIIGLFramebuffer.internColor(self.bgColor), 0)
+		elif(self.colorMode == ASCIIGLConstants.EDIT_COLOR_AND_STYLE):
+			self.attributes = (ASCIIGLFramebuffer.internColor(self.textColor), ASCIIGLFramebuffer.internColor(self.bgColor), ASCIIGLFramebuffer.internAttribute(self.textStyle))
+		else:
+			self.attributes = (0, 0, 0)
+		
+		sizeX = self.sizeX
+		sizeY = self.sizeY
+		size = sizeX * sizeY
+		if self.cullMode == ASCIIGLConstants.CULL:
+			def placeCell(x, y):
+				if x < 0 or x >= sizeX or y < 0 or y >= sizeY:
+					return -1
+				return ((y*sizeX) + x) % size
+		else:
+			def placeCell(x, y):
+				return ((y*sizeX) + x) % size
+		
+		#If only a band of rows may be drawn into, anything that lands outside
+		#it is culled too, whatever the culling mode.
+		if self.bandTop > 0 or self.bandBottom < sizeY:
+			bandStart = self.bandTop * sizeX
+			bandEnd = self.bandBottom * sizeX
+			unbandedPlaceCell = placeCell
+			def placeCell(x, y):
+				index = unbandedPlaceCell(x, y)
+				if index < bandStart or index >= bandEnd:
+					return -1
+				return index
+		self.placeCell = placeCell
+		
+		frameBuffer = self.frameBuffer
+		glyphs, fgPlane, bgPlane, stylePlane = frameBuffer.glyphs, frameBuffer.fg, frameBuffer.bg, frameBuffer.style
+		fg, bg, style = self.attributes
+		def writeCell(index, code):
+			glyphs[index] = code
+			fgPlane[index] = fg
+			bgPlane[index] = bg
+			stylePlane[index] = style
+		self.writeCell = writeCell
+		
+		def writeSpan(index, count, code, step=1):
+			end = index + (count-1)*step + 1
+			glyphs[index:end:step] = array("I", [code]) * count
+			fgPlane[index:end:step] = array("I", [fg]) * count
+			bgPlane[index:end:step] = array("I", [bg]) * count
+			stylePlane[index:end:step] = array("B", [style]) * count
+		self.writeSpan = writeSpan
+		
+		def writeGlyphs(index, codes):
+			count = len(codes)
+			end = index + count
+			glyphs[index:end] = codes
+			fgPlane[index:end] = array("I", [fg]) * count
+			bgPlane[index:end] = array("I", [bg]) * count
+			stylePlane[index:end] = array("B", [style]) * count
+		self.writeGlyphs = writeGlyphs
+		
+		if self.texBlendingMode == ASCIIGLConstants.TEX_MULTIPLY:
+			def writeTexel(index, texel):
+				if texel[1]:
+					fgPlane[index] = texel[1]
+				if texel[2]:
+					bgPlane[index] = texel[2]
+				if texel[3]:
+					stylePlane[index] = texel[3]
+			def writeTexelSpan(index, count, texel, step=1):
+				end = index + (count-1)*step + 1
+				if texel[1]:
+					fgPlane[index:end:step] = array("I", [texel[1]]) * count
+				if texel[2]:
+					bgPlane[index:end:step] = array("I", [texel[2]]) * count
+				if texel[3]:
+					stylePlane[index:end:step] = array("B", [texel[3]]) * count
+		else:
+			def writeTexel(index, texel):
+				glyphs[index] = texel[0] or 32
+				fgPlane[index] = texel[1]
+				bgPlane[index] = texel[2]
+				stylePlane[index] = texel[3]
+			def writeTexelSpan(index, count, texel, step=1):
+				end = index + (count-1)*step + 1
+				glyphs[index:end:step] = array("I", [texel[0] or 32]) * count
+				fgPlane[index:end:step] = array("I", [texel[1]]) * count
+				bgPlane[index:end:step] = array("I", [texel[2]]) * count
+				stylePlane[index:end:step] = array("B", [texel[3]]) * count
+		self.writeTexel = writeTexel
+		self.writeTexelSpan = writeTexelSpan
+		
+		#When profiling, the writers count what they do. When not, they're
+		#left as they are, so not profiling costs nothing.
+		stats = self.stats
+		if stats is not None:
+			def countingPlaceCell(x, y):
+				index = placeCell(x, y)
+				if index < 0:
+					stats.cellsCulled += 1
+				return index
+			def countingWriteCell(index, code):
+				stats.cellsWritten += 1
+				writeCell(index, code)
+			def countingWriteSpan(index, count, code, step=1):
+				stats.cellsWritten += count
+				writeSpan(index, count, code, step)
+			def countingWriteGlyphs(index, codes):
+				stats.cellsWritten += len(codes)
+				writeGlyphs(index, codes)
+			def countingWriteTexel(index, texel):
+				stats.cellsWritten += 1
+				writeTexel(index, texel)
+			def countingWriteTexelSpan(index, count, texel, step=1):
+				stats.cellsWritten += count
+				writeTexelSpan(index, count, texel, step)
+			self.placeCell = countingPlaceCell
+			self.writeCell = countingWriteCell
+			self.writeSpan = countingWriteSpan
+			self.writeGlyphs = countingWriteGlyphs
+			self.writeTexel = countingWriteTexel
+			self.writeTexelSpan = countingWriteTexelSpan
 						
 	"""
-		Changes the clear character, by changing the
-		appropriate value in ASCIIGLConstants. 
+		Changes the clear character of this surface.
 
 	"""
 	def setClearChar(self, clearChar):
-		ASCIIGLConstants.clearCharacter = clearChar[0]
+		self.clearCharacter = clearChar[0]
 		
 	"""
-		Changes the flattening mode, by changing the
-		appropriate value in ASCIIGLConstants. Again,
+		Changes the flattening mode of this surface. Again,
 		it is highly recommended that you use a member
 		defined in ASCIIGLConstants.
 		
@@ -129,7 +440,8 @@ class ASCIIGL(object):
 		FLAT_CEIL:	Ceils location values.
 	"""
 	def setFlatMode(self, mode):
-		ASCIIGLConstants.flatMode = mode
+		self.flatMode = mode
+		self.updateWriter()
 	
 	"""
 		When drawing a rectangle or other shape with corners,
@@ -143,17 +455,19 @@ class ASCIIGL(object):
 		FAVOR_HORIZ:	Favors the horizontal border.
 	"""
 	def setCornerMode(self, mode):
-		ASCIIGLConstants.borderCornerMode = mode
+		self.borderCornerMode = mode
 	
 	"""
 		Resets text appearance.
 	"""
 	def resetAppearance(self):
-		ASCIIGLConstants.bgColor   = ASCIIGLConstants.Back.RESET
-		ASCIIGLConstants.textColor = ASCIIGLConstants.Fore.RESET
-		ASCIIGLConstants.textStyle = ASCIIGLConstants.Style.RESET_ALL
+		self.bgColor   = ASCIIGLConstants.Back.RESET
+		self.textColor = ASCIIGLConstants.Fore.RESET
+		self.textStyle = ASCIIGLConstants.Style.RESET_ALL
+		self.updateWriter()
 		#Print the character into the console so that the ANSI codes are recognized and applied.
-		print(ASCIIGLConstants.bgColor+ASCIIGLConstants.textColor+ASCIIGLConstants.textStyle+" ")
+		self.outputBackend.write((self.bgColor+self.textColor+self.textStyle+" \n").encode("utf-8"))
+		self.outputBackend.flush()
 	
 	"""
 		An ASCIIGL Texture contains four components
@@ -173,7 +487,7 @@ class ASCIIGL(object):
 		USE_TEX_NONE:		Turn off texture usage.
 	"""
 	def setTextureMode(self, mode):
-		ASCIIGLConstants.textureMode = mode
+		self.textureMode = mode
 	
 	"""
 		When using a texture, you might not want to replace existing pixels
@@ -190,7 +504,8 @@ class ASCIIGL(object):
 		TEX_ADDITIVE:	All elements of the texture are used.
 	"""
 	def setTextureBlendingMode(self, mode):
-		ASCIIGLConstants.texBlendingMode = mode
+		self.texBlendingMode = mode
+		self.updateWriter()
 	
 	"""
 		When drawing a shape, we must decide what fill mode
@@ -205,7 +520,18 @@ class ASCIIGL(object):
 		you're drawing.
 	"""
 	def setFillMode(self, mode):
-		ASCIIGLConstants.shapeFillMode = mode
+		self.shapeFillMode = mode
+	
+	"""
+		Sets what text does when it runs off the right edge of the surface.
+		
+		VALUES from ASCIIGLConstants:
+		WRAP_AT_LOCATION:	Carry on on the next row, at the text's X location.
+		WRAP_AT_LINE:		Carry on on the next row, at the left edge of the
+							surface.
+	"""
+	def setTextWrapMode(self, mode):
+		self.textWrapMode = mode
 	
 	"""
 		Sets the color mode of this ASCIIGL surface.
@@ -219,15 +545,170 @@ class ASCIIGL(object):
 								the text's appearance.
 	"""	
 	def setColorMode(self, mode):
-		ASCIIGLConstants.colorMode = mode
+		self.colorMode = mode
+		self.updateWriter()
+	
+	"""
+		Sets how many colors the console can show. Palette and RGB colors
+		are brought down to the nearest one it can, as frames are encoded.
+		ASCIIGLColor.detectColorDepth() makes a good guess.
+		
+		VALUES from ASCIIGLConstants:
+		COLOR_16:	The 16 basic colors.
+		COLOR_256:	The xterm 256 color palette.
+		COLOR_TRUE:	Every 24-bit RGB color.
+	"""
+	def setColorDepth(self, depth):
+		self.colorDepth = depth
+		self.encoder.setColorDepth(depth)
+		#What's on the console was encoded at the old depth.
+		self.lastFrameValid = False
+	
+	"""
+		Sets how finished frames are sent to the console.
+		
+		VALUES from ASCIIGLConstants:
+		PRESENT_FULL:	Reprint the whole framebuffer every frame.
+		PRESENT_DELTA:	Only send the cells that changed since the last
+						frame, falling back to a full redraw when that
+						would be cheaper.
+	"""
+	def setPresentMode(self, mode):
+		self.presentMode = mode
+		self.lastFrameValid = False
+	
+	"""
+		Sets where finished frames are written.
+		Use one of the backends in ASCIIGLOutput, or anything else
+		with the same methods. (See ASCIIGLOutput.)
+		
+		VALUES from ASCIIGLOutput:
+		TerminalOutput:	The console. The default.
+		MemoryOutput:	Kept in memory.
+		NullOutput:		Thrown away.
+		FileOutput:		Written to a file.
+	"""
+	def setOutputBackend(self, backend):
+		self.outputBackend = backend
+		#Whatever's on the new backend, it isn't our last frame.
+		self.lastFrameValid = False
+	
+	"""
+		Sets what records every frame this surface presents, or None to
+		stop recording. Use an ASCIIGLRecorder.Recorder the size of this
+		surface. Frames that are dropped aren't recorded.
+	"""
+	def setRecorder(self, recorder):
+		self.recorder = recorder
+	
+	"""
+		Sets what watches how long frames take to present, and lowers the
+		quality of the show when they take too long, or None to stop.
+		Use an ASCIIGLQuality.QualityController.
+	"""
+	def setQualityController(self, controller):
+		self.quality = controller
+	
+	"""
+		Restricts drawing to the band of rows [top, bottom). Anything drawn
+		outside it is culled, as if the surface ended there, but only after
+		it's been placed, so what's drawn inside the band is exactly what
+		would have been drawn there without one.
+		This is how ASCIIGLParallel splits a frame between processes.
+		
+		PARAMETERS:
+		top:	The first row that may be drawn into.
+		bottom:	The row after the last one that may be drawn into.
+	"""
+	def setBand(self, top, bottom):
+		self.bandTop = max(top, 0)
+		self.bandBottom = min(bottom, self.sizeY)
+		self.updateWriter()
+	
+	"""
+		Adds a layer to this surface. (See ASCIIGLLayers.)
+		Once a surface has layers, everything should be drawn into one.
+		The framebuffer is then only ever what the layers composite to,
+		and blitToScreen() doesn't clear it, whatever it's told.
+		
+		PARAMETERS:
+		name:	The name of the layer.
+		z:		The z-order of the layer. Higher is on top.
+		draw:	Optional. If given, the layer is static, and this is called
+				with the surface to rasterize it, the first time it's
+				composited, and again whenever it's been invalidated with
+				invalidateLayer(). If not, the layer is dynamic, drawn into
+				with setLayer() every frame.
+		
+		RAISES:
+		ValueError, if there already is a layer with that name.
+	"""
+	def addLayer(self, name, z, draw=None):
+		if self.compositor is None:
+			self.compositor = ASCIIGLLayers.Compositor(self.sizeX, self.sizeY)
+		self.compositor.addLayer(name, z, draw)
+	
+	"""
+		Removes a layer from this surface.
+	"""
+	def removeLayer(self, name):
+		if self.layer is not None and self.layer.name == name:
+			self.setLayer(None)
+		self.compositor.removeLayer(name)
+	
+	"""
+		Marks a static layer to be rasterized again the next time it's
+		composited, like when what's on it changed.
+	"""
+	def invalidateLayer(self, name):
+		self.compositor.invalidate(name)
+	
+	"""
+		Marks every static layer to be rasterized again before the next
+		frame, like when the render state they were drawn with changed.
+		Does nothing if there aren't any layers.
+	"""
+	def invalidateLayers(self):
+		if self.compositor is not None:
+			self.compositor.invalidateLayers()
+	
+	"""
+		Makes drawing go into the given layer, or, if it's None, straight
+		into the framebuffer again. The cell writers are rebuilt to write
+		into the layer's planes, so everything drawn afterwards, particle
+		systems included, lands there.
+		Whichever layer is being drawn into when the surface is blitted
+		is still being drawn into afterwards.
+	"""
+	def setLayer(self, name):
+		if self.layer is None:
+			self.screenFrame = self.frameBuffer
+		self.layer = None if name is None else self.compositor.getLayer(name)
+		self.frameBuffer = self.screenFrame if self.layer is None else self.layer.frameBuffer
+		self.updateWriter()
+	
+	"""
+		Turns profiling on or off. While it's on, stats is an
+		ASCIIGLProfiler.FrameStats counting what goes into every frame.
+		While it's off, stats is None.
+		
+		PARAMETERS:
+		enabled:	Whether to profile.
+		window:		How many frames of history to keep.
+	"""
+	def setProfiling(self, enabled, window=60):
+		self.stats = ASCIIGLProfiler.FrameStats(window) if enabled else None
+		self.updateWriter()
 	
 	"""
 		Sets the text's color.
 		Use ASCIIGLConstants.Fore, which is 
-		inherited from Colorama.
+		inherited from Colorama, or a color
+		code from ASCIIGLColor.
 	"""
 	def setTextColor(self, coloramaForeColor):
-		ASCIIGLConstants.textColor = coloramaForeColor
+		self.textColor = coloramaForeColor
+		self.updateWriter()
 	
 	"""
 		Sets the text's style.
@@ -235,46 +716,61 @@ class ASCIIGL(object):
 		inherited from Colorama.
 	"""
 	def setTextStyle(self, coloramaTextStyle):
-		ASCIIGLConstants.textStyle = coloramaTextStyle
+		self.textStyle = coloramaTextStyle
+		self.updateWriter()
 	
 	"""
 		Sets the background color.
 		Use ASCIIGLConstants.Back, which is 
-		inherited from Colorama.
+		inherited from Colorama, or a color
+		code from ASCIIGLColor.
 	"""
 	def setBGColor(self, coloramaBackColor):
-		ASCIIGLConstants.bgColor = coloramaBackColor
+		self.bgColor = coloramaBackColor
+		self.updateWriter()
 		
 	"""
 		Clears the screen so a new frame can be rendered and drawn.
 		This, however, does not clear the framebuffer.
 	"""
 	def clearScreen(self):
-		if os.name == 'nt': 
-			os.system('cls')
-		else: 
-			os.system('clear')
+		#Erase the display and home the cursor. On Windows, Colorama
+		#turns this into the matching console calls.
+		self.outputBackend.write(b"\x1b[2J\x1b[1;1H")
+		self.outputBackend.flush()
+		#Whatever we presented before is gone now.
+		self.lastFrameValid = False
 	
 	"""
 		Resets the framebuffer to a fresh state, filled with the
-		clearCharacter defined in ASCIIGLConstants.
+		clear character of this surface.
 	"""
 	def clearFramebuffer(self):
-		self.frameBuffer = []
-		for i in range(self.sizeX * self.sizeY):
-			self.frameBuffer.append(ASCIIGLConstants.clearCharacter)
+		#Layers are cleared to transparent, not to the clear character.
+		if self.layer is not None:
+			self.frameBuffer.clear("\0")
+			return
+		self.frameBuffer.clear(self.clearCharacter)
+		if self.compositor is not None:
+			self.compositor.invalidateAll()
 	
 	"""
 		Pushes the given value out to an integer value based on the
-		method defined in ASCIIGLConstants.
+		flattening mode of this surface.
 	"""
 	def pushToInt(self, value):
-		if ASCIIGLConstants.flatMode == ASCIIGLConstants.FLAT_FLOOR:
-			value = math.floor(value)
-		else:
-			value = math.ceil(value)
-		return int(value)
+		return int(self.flatten(value))
+		
+	"""
+		Returns the attribute indices a character drawn right now would get,
+		based on the color mode and colors of this surface.
 		
+		RETURNS:
+		A tuple of the foreground, background and style attribute indices.
+	"""
+	def currentAttributes(self):
+		return self.attributes
+	
 	"""
 		Draws a rectangle, first drawing it's inside, then 
 		the border.
@@ -285,6 +781,12 @@ class ASCIIGL(object):
 		
 		HOW IT WORKS:
 		Just read the damn code.
+		Alright, fine. In CULL mode, we clip the rectangle to the surface
+		first, with clipRect(), so the part of it that's off the surface
+		costs nothing at all. Then we build the top/bottom row and the
+		middle row as templates, just for the columns that are left, and
+		write it a row at a time with slice assignments, so the cost goes
+		with the number of rows, not the number of cells.
 		
 		PARAMETERS:
 		x:					The X location of the rectangle.
@@ -296,46 +798,174 @@ class ASCIIGL(object):
 	"""
 	def rect(self, x, y, sx, sy, fillChar, horizBorderChar, vertBorderChar):
 		
-		#For every character in the rectangle:
-		for i in range(x, x+sx, 1):
-			for k in range(y, y+sy, 1):
-				#Take care of the top and bottom rows, which are part of the border:
-				#That is, if we are supposed to draw the border.
-				if ASCIIGLConstants.shapeFillMode == ASCIIGLConstants.FILL_AND_BORDER or ASCIIGLConstants.shapeFillMode == ASCIIGLConstants.BORDER_ONLY:
-					if k == y or k == y+sy-1:
-						self.character(i, k, horizBorderChar)
-						#If we are favoring the vertical border at the corner, overwrite the
-						#corners with the vertical border character.
-						if ASCIIGLConstants.borderCornerMode == ASCIIGLConstants.FAVOR_VERT:
-							if i == x or i == x+sx-1:
-								self.character(i, k, vertBorderChar)
-				#For the rows in the middle:
-					else:
-						#If the current location is on the border, we draw the border character.
-						#Here we must also test the shape-fill-mode.
-						if ASCIIGLConstants.shapeFillMode == ASCIIGLConstants.FILL_AND_BORDER or ASCIIGLConstants.shapeFillMode == ASCIIGLConstants.BORDER_ONLY:
-							if i == x or i == x+sx-1:
-								self.character(i, k, vertBorderChar)
-						#Otherwise, we draw the fill character.
-							else:
-								if ASCIIGLConstants.shapeFillMode == ASCIIGLConstants.FILL_AND_BORDER or ASCIIGLConstants.shapeFillMode == ASCIIGLConstants.FILL_ONLY:
-									self.character(i, k, fillChar)
-									
+		if sx <= 0 or sy <= 0:
+			return
+		
+		#Work out what we are supposed to draw once, rather than for every cell.
+		#A code of zero is something we aren't supposed to draw.
+		drawBorder = self.shapeFillMode != ASCIIGLConstants.FILL_ONLY
+		drawFill = self.shapeFillMode != ASCIIGLConstants.BORDER_ONLY
+		fillCode = ord(fillChar[0]) if fillChar and drawFill else 0
+		horizCode = ord(horizBorderChar[0]) if horizBorderChar and drawBorder else 0
+		vertCode = ord(vertBorderChar[0]) if vertBorderChar and drawBorder else 0
+		
+		#If we are favoring the vertical border at the corner, the corners get
+		#the vertical border character.
+		if self.borderCornerMode == ASCIIGLConstants.FAVOR_VERT and vertCode:
+			cornerCode = vertCode
+		else:
+			cornerCode = horizCode
+		
+		#In CULL mode, we only ever look at the part of the rectangle on the surface.
+		cull = self.cullMode == ASCIIGLConstants.CULL
+		if cull:
+			clipped = self.clipRect(x, y, sx, sy)
+			if clipped is None:
+				return
+			left, top, right, bottom = clipped
+		else:
+			left, top, right, bottom = x, y, x+sx, y+sy
+		
+		#The top and bottom rows, and the rows in the middle, as templates
+		#for the columns we're drawing.
+		edgeRow = array("I", [horizCode]) * (right-left)
+		middleRow = array("I", [fillCode]) * (right-left)
+		if left == x:
+			edgeRow[0] = cornerCode
+			middleRow[0] = vertCode
+		if right == x+sx:
+			edgeRow[-1] = cornerCode
+			middleRow[-1] = vertCode
+		
+		#In WRAP mode, every cell has to be placed on its own so it can wrap around.
+		if not cull:
+			placeCell = self.placeCell
+			writeCell = self.writeCell
+			for k in range(y, y+sy):
+				template = edgeRow if k == y or k == y+sy-1 else middleRow
+				for i in range(sx):
+					if template[i]:
+						index = placeCell(x+i, k)
+						if index >= 0:
+							writeCell(index, template[i])
+			return
+		
+		#Otherwise we go row by row.
+		sizeX = self.sizeX
+		writeSpan = self.writeSpan
+		writeGlyphs = self.writeGlyphs
+		
+		#The top and bottom rows. If there's no horizontal border,
+		#only the corners might be left.
+		for k in sorted(set((y, y+sy-1))):
+			if k < top or k >= bottom:
+				continue
+			if horizCode:
+				writeGlyphs(k*sizeX + left, edgeRow)
+			elif cornerCode:
+				for i in (x, x+sx-1):
+					if left <= i < right:
+						writeSpan(k*sizeX + i, 1, cornerCode)
+		
+		#The rows in the middle.
+		middleTop = max(y+1, top)
+		middleBottom = min(y+sy-1, bottom)
+		if middleTop >= middleBottom:
+			return
+		#If there's both a border and a fill, each row is one slice of the template.
+		if vertCode and fillCode:
+			for k in range(middleTop, middleBottom):
+				writeGlyphs(k*sizeX + left, middleRow)
+			return
+		#Otherwise the border is two columns, and the fill is a span per row.
+		if vertCode:
+			for i in sorted(set((x, x+sx-1))):
+				if left <= i < right:
+					writeSpan(middleTop*sizeX + i, middleBottom-middleTop, vertCode, sizeX)
+		if fillCode:
+			fillLeft = max(x+1, left)
+			fillRight = min(x+sx-1, right)
+			if fillLeft < fillRight:
+				for k in range(middleTop, middleBottom):
+					writeSpan(k*sizeX + fillLeft, fillRight-fillLeft, fillCode)
+	
+	"""
+		Draws a rectangle out of texels: one for the border, and
+		another for the inside.
+		
+		HOW IT WORKS:
+		Just like rect(), we clip the rectangle to the surface once,
+		with clipRect(), then write the border as two row spans and two column spans,
+		and the inside as a span per row.
+		
+		PARAMETERS:
+		x:			The X location of the rectangle.
+		y:			The Y location of the rectangle.
+		sx:			The X size of the rectangle.
+		sy:			The Y size of the rectangle.
+		borderChar:	The texel for the border.
+		fillChar:	The texel for the inside.
+	"""
 	def simpleRect(self, x, y, sx, sy, borderChar, fillChar):
 		
-		for i in range(x, x+sx, 1):
-			for k in range(y, y+sy, 1):
-				if k == y or k == y+sy-1 or i == x or i == x+sx-1:
-					self.applyTexel(i, k, borderChar)
-				else:
-					self.applyTexel(i, k, fillChar)
-					
+		if sx <= 0 or sy <= 0:
+			return
+		
+		#Pick the texels apart once, rather than for every cell.
+		borderTexel = ASCIIGLFramebuffer.parseTexel(borderChar)
+		fillTexel = ASCIIGLFramebuffer.parseTexel(fillChar)
+		
+		#In WRAP mode, every cell has to be placed on its own so it can wrap around.
+		if self.cullMode != ASCIIGLConstants.CULL:
+			placeCell = self.placeCell
+			writeTexel = self.writeTexel
+			for i in range(x, x+sx, 1):
+				for k in range(y, y+sy, 1):
+					index = placeCell(i, k)
+					if index < 0:
+						continue
+					if k == y or k == y+sy-1 or i == x or i == x+sx-1:
+						writeTexel(index, borderTexel)
+					else:
+						writeTexel(index, fillTexel)
+			return
+		
+		clipped = self.clipRect(x, y, sx, sy)
+		if clipped is None:
+			return
+		left, top, right, bottom = clipped
+		sizeX = self.sizeX
+		writeTexelSpan = self.writeTexelSpan
+		
+		for k in sorted(set((y, y+sy-1))):
+			if top <= k < bottom:
+				writeTexelSpan(k*sizeX + left, right-left, borderTexel)
+		middleTop = max(y+1, top)
+		middleBottom = min(y+sy-1, bottom)
+		if middleTop >= middleBottom:
+			return
+		for i in sorted(set((x, x+sx-1))):
+			if left <= i < right:
+				writeTexelSpan(middleTop*sizeX + i, middleBottom-middleTop, borderTexel, sizeX)
+		fillLeft = max(x+1, left)
+		fillRight = min(x+sx-1, right)
+		if fillLeft < fillRight:
+			for k in range(middleTop, middleBottom):
+				writeTexelSpan(k*sizeX + fillLeft, fillRight-fillLeft, fillTexel)
 				
 	"""
 		Draws a textured rectangle.
 		
 		HOW IT WORKS:
-		Goes through and queries for texels per-fragment.
+		The texture is picked apart into planes, just like the framebuffer's,
+		the first time it's drawn. (See ASCIIGLFramebuffer.texturePlanes.)
+		Then we clip the rectangle to the surface with clipRect(), and for
+		every row, copy the matching row segment of those planes straight
+		into the framebuffer. The texture repeats, so a segment that runs
+		off the edge of the texture is copied in pieces.
+		In TEX_MULTIPLY mode, only the attributes a texel actually has may
+		be applied, so we fall back to applying texels one by one, though
+		still only the ones on the surface.
 		
 		PARAMETERS:
 		x:	The X position of the top right corner of the rectangle.
@@ -347,11 +977,56 @@ class ASCIIGL(object):
 	"""
 	def texRect(self, x, y, sx, sy, tx, ty, texture):
 		
-		#For every pixel in the area of the rectangle...
-		for i in range(x, x+sx, 1):
-			for k in range(y, y+sy, 1):
-				#This is where things are changed up. We get a texel, and then apply it.
-				self.applyTexel(i, k, texture.getTexel(tx+i, ty+k))
+		if sx <= 0 or sy <= 0:
+			return
+		
+		planes = ASCIIGLFramebuffer.texturePlanes(texture)
+		
+		#In WRAP mode, we go texel by texel, so they can wrap around.
+		if self.cullMode != ASCIIGLConstants.CULL:
+			placeCell = self.placeCell
+			writeTexel = self.writeTexel
+			for k in range(sy):
+				for i in range(sx):
+					index = placeCell(x+i, y+k)
+					if index >= 0:
+						texIndex = ((ty+k) % planes.sizeY)*planes.sizeX + (tx+i) % planes.sizeX
+						writeTexel(index, (planes.glyphs[texIndex], planes.fg[texIndex], planes.bg[texIndex], planes.style[texIndex]))
+			return
+		
+		clipped = self.clipRect(x, y, sx, sy)
+		if clipped is None:
+			return
+		left, top, right, bottom = clipped
+		sizeX = self.sizeX
+		
+		#In TEX_MULTIPLY mode, we go texel by texel over what's left.
+		if self.texBlendingMode == ASCIIGLConstants.TEX_MULTIPLY:
+			writeTexel = self.writeTexel
+			for k in range(top, bottom):
+				texRow = ((ty + k - y) % planes.sizeY) * planes.sizeX
+				for i in range(left, right):
+					texIndex = texRow + (tx + i - x) % planes.sizeX
+					writeTexel(k*sizeX + i, (planes.glyphs[texIndex], planes.fg[texIndex], planes.bg[texIndex], planes.style[texIndex]))
+			return
+		
+		if self.stats is not None:
+			self.stats.cellsWritten += (right-left)*(bottom-top)
+		frameBuffer = self.frameBuffer
+		for k in range(top, bottom):
+			texRow = ((ty + k - y) % planes.sizeY) * planes.sizeX
+			i = left
+			while i < right:
+				#Copy as much as we can before the texture repeats.
+				texX = (tx + i - x) % planes.sizeX
+				count = min(right - i, planes.sizeX - texX)
+				index = k*sizeX + i
+				texIndex = texRow + texX
+				frameBuffer.glyphs[index:index+count] = planes.glyphs[texIndex:texIndex+count]
+				frameBuffer.fg[index:index+count] = planes.fg[texIndex:texIndex+count]
+				frameBuffer.bg[index:index+count] = planes.bg[texIndex:texIndex+count]
+				frameBuffer.style[index:index+count] = planes.style[texIndex:texIndex+count]
+				i += count
 	
 	"""
 		Draws a textured line.
@@ -359,6 +1034,8 @@ class ASCIIGL(object):
 		HOW IT WORKS:
 		Just like a standard line, except for each character in the line,
 		we use the character stored in the locaiton of the the line.
+		In CULL mode the line is clipped to the surface first, just like
+		a standard one.
 		
 		PARAMETERS:
 		startX:		The starting X position of the line.
@@ -380,22 +1057,32 @@ class ASCIIGL(object):
 		startY = self.pushToInt(startY)
 		endX = self.pushToInt(endX)
 		endY = self.pushToInt(endY)
-	
-		#Get the X distance of the line.
-		xLength = endX - startX
 		
-		#Get the Y distance of the line.
-		yLength = endY - startY
-		
-		#Get the X increment.
-		try:
-			xIncrement = xLength/yLength
-		except:
-			xIncrement = 0
+		writeTexel = self.writeTexel
+		if self.cullMode == ASCIIGLConstants.CULL:
+			clipped = self.clipLine(startX, startY, endX, endY)
+			if self.stats is not None:
+				cells = max(abs(endX - startX), abs(endY - startY)) + 1
+				self.stats.cellsCulled += cells - (clipped[1] - clipped[0] + 1 if clipped else 0)
+			if clipped is None:
+				return
+			runs = self.lineRuns(startX, startY, endX, endY, *clipped)
+			sizeX = self.sizeX
+			def placeCell(x, y):
+				return y*sizeX + x
+		else:
+			runs = self.lineRuns(startX, startY, endX, endY)
+			placeCell = self.placeCell
 		
-		#This is where things are changed up. We get a texel, and then apply it.
-		for i in range (startY, endY, 1):
-			self.applyTexel(startX + ( (i-startY)*xIncrement), i, texture.getTexel(((i-startY)*xIncrement)-startX+texAnchorX, i-startY+texAnchorY))
+		#This is where things are changed up. For every cell of the line, we get the
+		#texel at the same offset from the anchor, and then apply it.
+		for x, y, count, vertical in runs:
+			for i in range(count):
+				cellX = x if vertical else x+i
+				cellY = y+i if vertical else y
+				index = placeCell(cellX, cellY)
+				if index >= 0:
+					writeTexel(index, ASCIIGLFramebuffer.parseTexel(texture.getTexel(cellX-startX+texAnchorX, cellY-startY+texAnchorY)))
 		
 		
 	"""
@@ -413,6 +1100,8 @@ class ASCIIGL(object):
 		then map our 2-D location to our 1-D framebuffer.
 		Next we perform culling duties, 
 		and finally we edit the framebuffer.
+		All of that is done by the functions updateWriter()
+		built for the current render state.
 		Note, though, that we don't edit the framebuffer if the
 		character is empty, none, or a carriage-moving escape character.
 		This allows for somewhat of transparency.
@@ -427,40 +1116,105 @@ class ASCIIGL(object):
 	"""
 	def character(self, x, y, character):
 	
-		#Normalize the location.
-		x = self.pushToInt(x)
-		y = self.pushToInt(y)
-		
-		#Map down the location into 1-D.
-		index = int( ((y*self.sizeX) + x) % (self.sizeY*self.sizeX) )
-		
-		#These if statements perform culling duties.
-		if(ASCIIGLConstants.cullMode == ASCIIGLConstants.CULL):
-			if (x < 0 or x > self.sizeX):
-				return True
-			elif (y < 0 or y > self.sizeY):
-				return True
-		elif(ASCIIGLConstants.cullMode == ASCIIGLConstants.WRAP):
-			index = index % (self.sizeY*self.sizeX)
-		else:
-			index = index % (self.sizeY*self.sizeX)
+		#Normalize the location, map it down into 1-D, and cull it.
+		index = self.placeCell(self.flatten(x), self.flatten(y))
+		if index < 0:
+			return True
 		
-		#If the character is a nothing character, or a special character, we simply don't do
-		#anything. 
-		#character = str(character)
-		#if (not character == "") or (not character == None) or (not character == "\n") or (not character == "\t") or (not character == "\r"):
-			
-		#Based on the appearance modification attributes defined in ASCIIGLConstants, we append color info to the pixel string.
-		if(ASCIIGLConstants.colorMode == ASCIIGLConstants.EDIT_COLOR):
-			self.frameBuffer[int(index)] = ASCIIGLConstants.bgColor + ASCIIGLConstants.textColor + character
-		elif(ASCIIGLConstants.colorMode == ASCIIGLConstants.EDIT_COLOR_AND_STYLE):
-			self.frameBuffer[int(index)] = ASCIIGLConstants.bgColor + ASCIIGLConstants.textColor + ASCIIGLConstants.textStyle + character
-		else:
-			self.frameBuffer[int(index)] = character
+		#If the character is a nothing character, we simply don't do
+		#anything. That's our transparency.
+		if not character:
+			return False
+		
+		#The cell writer already knows what attributes go with the character.
+		self.writeCell(index, ord(character[0]))
 		
 		#Finally, since the pixel was not culled, we return false.
 		return False
 	
+	"""
+		Draws a whole batch of characters in one go. The result is the
+		same as calling character() for each of them in turn, just much
+		faster.
+		
+		HOW IT WORKS:
+		Everything character() would work out per call, like the
+		flattening function, the culling mode, and the attribute
+		indices of the current colors, is worked out once up front.
+		Then we walk the batch, normalizing, culling and writing each
+		location into the framebuffer planes directly.
+		
+		PARAMETERS:
+		xs:			The X locations of the characters. Any sequence works:
+					lists, arrays, buffers, NumPy arrays.
+		ys:			The Y locations of the characters.
+		chars:		Either a single character to draw at every location,
+					or a sequence of characters, one per location. Empty
+					characters are skipped, just like in character().
+		colors:		Optional. Either a single text color, or a sequence of
+					text colors, one per location. Use ASCIIGLConstants.Fore,
+					or color codes from ASCIIGLColor.
+					If omitted, the current text color is used.
+					Like setTextColor(), this does nothing in PRESERVE_COLOR mode.
+		
+		RETURNS:
+		How many of the characters were culled.
+	"""
+	def points(self, xs, ys, chars, colors=None):
+		
+		#Work out everything that doesn't change from point to point.
+		flatten = self.flatten
+		cull = self.cullMode == ASCIIGLConstants.CULL
+		sizeX = self.sizeX
+		sizeY = self.sizeY
+		size = sizeX * sizeY
+		fg, bg, style = self.currentAttributes()
+		frameBuffer = self.frameBuffer
+		glyphs, fgPlane, bgPlane, stylePlane = frameBuffer.glyphs, frameBuffer.fg, frameBuffer.bg, frameBuffer.style
+		
+		if isinstance(chars, str) and len(chars) == 1:
+			codes = itertools.repeat(ord(chars))
+		else:
+			codes = [ord(c[0]) if c else 0 for c in chars]
+		
+		if colors is None or self.colorMode == ASCIIGLConstants.PRESERVE_COLOR:
+			colorIndices = itertools.repeat(fg)
+		elif isinstance(colors, (str, int)):
+			colorIndices = itertools.repeat(ASCIIGLFramebuffer.internColor(colors))
+		else:
+			colorIndices = [ASCIIGLFramebuffer.internColor(c) for c in colors]
+		
+		culled = 0
+		empty = 0
+		#Inside a band, placing a point is more than just mapping it, so it's
+		#left to placeCell.
+		placeCell = self.placeCell if self.bandTop > 0 or self.bandBottom < sizeY else None
+		for x, y, code, color in zip(xs, ys, codes, colorIndices):
+			#math.floor and math.ceil already hand back ints.
+			x = flatten(x)
+			y = flatten(y)
+			if placeCell is not None:
+				index = placeCell(x, y)
+				if index < 0:
+					culled += 1
+					continue
+			elif cull and not (0 <= x < sizeX and 0 <= y < sizeY):
+				culled += 1
+				continue
+			else:
+				index = ((y*sizeX) + x) % size
+			if not code:
+				empty += 1
+				continue
+			glyphs[index] = code
+			fgPlane[index] = color
+			bgPlane[index] = bg
+			stylePlane[index] = style
+		if self.stats is not None:
+			self.stats.cellsCulled += culled
+			self.stats.cellsWritten += min(len(xs), len(ys)) - culled - empty
+		return culled
+	
 	"""
 		Applies a texel to a pixel in the framebuffer.
 		
@@ -481,47 +1235,203 @@ class ASCIIGL(object):
 	"""
 	def applyTexel(self, x, y, texel):
 	
-		#Normalize the location.
-		x = self.pushToInt(x)
-		y = self.pushToInt(y)
-		
-		#Map down our location.
-		index = (y*self.sizeX)+x
-		
-		#These if statements perform culling duties.
-		if(ASCIIGLConstants.cullMode == ASCIIGLConstants.CULL):
-			if (x < 0 or x > self.sizeX):
-				return True
-			elif (y < 0 or y > self.sizeY):
-				return True
-		elif(ASCIIGLConstants.cullMode == ASCIIGLConstants.WRAP):
-			index = index % (self.sizeY*self.sizeX)
-		else:
-			index = index % (self.sizeY*self.sizeX)
+		#Normalize the location, map it down, and cull it.
+		index = self.placeCell(self.flatten(x), self.flatten(y))
+		if index < 0:
+			return True
 		
 		#Since texels are formatted, we don't need to worry about special character culling.
-		
-		#Based on the blending mode, we either append the texel's String to the pixel in
-		#the framebuffer, or replace the pixel with it.
-		if ASCIIGLConstants.texBlendingMode == ASCIIGLConstants.TEX_MULTIPLY:
-			self.frameBuffer[int(index% (self.sizeY*self.sizeX-1))] += texel
-		else:
-			self.frameBuffer[int(index% (self.sizeY*self.sizeX-1))] = texel
+		#We do need to pick them apart into their components though.
+		#The texel writer then either applies the texel's appearance modifiers to the
+		#pixel in the framebuffer, or replaces the pixel with it, based on the blending mode.
+		self.writeTexel(index, ASCIIGLFramebuffer.parseTexel(texel))
 			
 		#Finaly, since our texel was not culled, we return false.
 		return False
 		
 	
+	"""
+		Breaks the line from (startX, startY) to (endX, endY) down into
+		runs of cells, using Bresenham's algorithm. Both ends are included,
+		and it works in every octant.
+		
+		HOW IT WORKS:
+		We step along whichever axis the line covers the most distance in,
+		one cell at a time, keeping an integer error term that tells us when
+		to take a step along the other axis too.
+		A shallow line is a staircase of horizontal runs, and a steep line is
+		a staircase of vertical runs, so rather than handing back every cell,
+		we hand back those runs. A horizontal or vertical line is a single run.
+		We can start partway along, too. By the time we've taken k steps,
+		we've taken -((half - k*minor) // major) steps along the other axis,
+		(see clipLine()), so we just start from there, with the error term
+		it would have had.
+		
+		PARAMETERS:
+		startX:		The starting X location of the line. Must be an integer.
+		startY:		The starting Y location of the line. Must be an integer.
+		endX:		The finishing X location of the line. Must be an integer.
+		endY:		The finishing Y location of the line. Must be an integer.
+		first:		Optional. How many cells along the line to start from.
+		last:		Optional. How many cells along the line to stop at,
+					included. Defaults to the end of the line.
+		
+		RETURNS:
+		A list of (x, y, count, vertical) runs. (x, y) is the top or left
+		cell of the run, and count is how many cells it covers, going down
+		if vertical is true, or right if not.
+	"""
+	def lineRuns(self, startX, startY, endX, endY, first=0, last=None):
+		dx = abs(endX - startX)
+		dy = abs(endY - startY)
+		stepX = 1 if endX >= startX else -1
+		stepY = 1 if endY >= startY else -1
+		runs = []
+		
+		#Shallow lines: step along X, building horizontal runs.
+		if dx >= dy:
+			if last is None:
+				last = dx
+			lastX = startX + stepX*last
+			half = dx // 2
+			error = (half - first*dy) % dx if dx else half
+			y = startY - stepY*((half - first*dy) // dx) if dx else startY
+			runStart = startX + stepX*first
+			for x in range(runStart, lastX, stepX):
+				error -= dy
+				if error < 0:
+					runs.append((min(runStart, x), y, abs(x - runStart) + 1, False))
+					y += stepY
+					error += dx
+					runStart = x + stepX
+			runs.append((min(runStart, lastX), y, abs(lastX - runStart) + 1, False))
+		
+		#Steep lines: step along Y, building vertical runs.
+		else:
+			if last is None:
+				last = dy
+			lastY = startY + stepY*last
+			half = dy // 2
+			error = (half - first*dx) % dy
+			x = startX - stepX*((half - first*dx) // dy)
+			runStart = startY + stepY*first
+			for y in range(runStart, lastY, stepY):
+				error -= dx
+				if error < 0:
+					runs.append((x, min(runStart, y), abs(y - runStart) + 1, True))
+					x += stepX
+					error += dy
+					runStart = y + stepY
+			runs.append((x, min(runStart, lastY), abs(lastY - runStart) + 1, True))
+		
+		return runs
+	
+	"""
+		Clips a rectangle to the surface, or the band of it we may draw into.
+		If profiling, the cells that were clipped off are counted as culled.
+		
+		PARAMETERS:
+		x:	The X location of the rectangle.
+		y:	The Y location of the rectangle.
+		sx:	The X size of the rectangle.
+		sy:	The Y size of the rectangle.
+		
+		RETURNS:
+		The (left, top, right, bottom) of what's left, right and bottom not
+		included, or None if nothing is.
+	"""
+	def clipRect(self, x, y, sx, sy):
+		left = max(x, 0)
+		right = min(x+sx, self.sizeX)
+		top = max(y, self.bandTop)
+		bottom = min(y+sy, self.bandBottom)
+		visible = max(right-left, 0)*max(bottom-top, 0)
+		if self.stats is not None:
+			self.stats.cellsCulled += sx*sy - visible
+		if not visible:
+			return None
+		return left, top, right, bottom
+	
+	"""
+		Clips the line from (startX, startY) to (endX, endY) to the surface,
+		or the band of it we may draw into, before a single cell of it is
+		worked out.
+		
+		HOW IT WORKS:
+		This is Liang-Barsky, but on the cells lineRuns() would hand back,
+		rather than on the ideal line, so the clipped line is exactly the
+		same cells as the unclipped one, minus the ones off the surface.
+		We measure how far along the line we are in cells along the axis
+		it covers the most distance in, its major axis. After k cells, it
+		has moved k cells along the major axis, and
+		m(k) = -((half - k*minor) // major) cells along the other one,
+		where major and minor are the distances along each axis, and half
+		is major // 2, the error term Bresenham starts with.
+		Both only ever go one way, so every edge of the surface cuts off
+		one end of the line, and we can work out where, straight from
+		those formulas. What's left, if anything, is a single range of k.
+		
+		PARAMETERS:
+		startX:		The starting X location of the line. Must be an integer.
+		startY:		The starting Y location of the line. Must be an integer.
+		endX:		The finishing X location of the line. Must be an integer.
+		endY:		The finishing Y location of the line. Must be an integer.
+		
+		RETURNS:
+		The (first, last) cells of the line that are on the surface, as
+		lineRuns() takes them, or None if none are.
+	"""
+	def clipLine(self, startX, startY, endX, endY):
+		dx = abs(endX - startX)
+		dy = abs(endY - startY)
+		bounds = ((startX, 1 if endX >= startX else -1, 0, self.sizeX - 1),
+		          (startY, 1 if endY >= startY else -1, self.bandTop, self.bandBottom - 1))
+		if dx >= dy:
+			major, minor = dx, dy
+			(majorStart, majorStep, majorLow, majorHigh), (minorStart, minorStep, minorLow, minorHigh) = bounds
+		else:
+			major, minor = dy, dx
+			(minorStart, minorStep, minorLow, minorHigh), (majorStart, majorStep, majorLow, majorHigh) = bounds
+		
+		#Along the major axis, cell k is at majorStart + majorStep*k.
+		if majorStep > 0:
+			first = max(0, majorLow - majorStart)
+			last = min(major, majorHigh - majorStart)
+		else:
+			first = max(0, majorStart - majorHigh)
+			last = min(major, majorStart - majorLow)
+		
+		#Along the other one, m(k) has to stay between these.
+		if minorStep > 0:
+			low, high = minorLow - minorStart, minorHigh - minorStart
+		else:
+			low, high = minorStart - minorHigh, minorStart - minorLow
+		if not minor:
+			if low > 0 or high < 0:
+				return None
+		else:
+			half = major // 2
+			#m(k) >= low once k*minor > half + (low-1)*major,
+			#and m(k) <= high as long as k*minor <= half + high*major.
+			first = max(first, (half + (low-1)*major) // minor + 1)
+			last = min(last, (half + high*major) // minor)
+		
+		if first > last:
+			return None
+		return first, last
+	
 	"""
 		Draws a line from (startX, startY) to (endX, endY),
 		consisting of the character specified.
 		
 		HOW IT WORKS:
-		First we get the distances covered in either axis
-		by the line.
-		Next, we divide the X distance by the Y distance. This
-		gives us the step we increment the X value by to draw the current
-		character.
+		In CULL mode, we first clip the line to the surface with
+		clipLine(), so cells that are off the surface are never even
+		worked out. Then we break what's left down into horizontal or
+		vertical runs of cells with lineRuns(), and write each one to
+		the framebuffer as a single slice, rather than cell by cell.
+		In WRAP mode the cells of each run are placed one at a time,
+		so they can wrap around.
 		
 		PARAMETERS:
 		startX: 	The starting X location of the line.
@@ -532,40 +1442,132 @@ class ASCIIGL(object):
 	"""
 	def line(self, startX, startY, endX, endY, character):
 	
+		#An empty character draws nothing.
+		if not character:
+			return
+		code = ord(character[0])
+		
 		startX = self.pushToInt(startX)
 		startY = self.pushToInt(startY)
 		endX = self.pushToInt(endX)
 		endY = self.pushToInt(endY)
+		
+		if self.cullMode != ASCIIGLConstants.CULL:
+			placeCell = self.placeCell
+			writeCell = self.writeCell
+			for x, y, count, vertical in self.lineRuns(startX, startY, endX, endY):
+				for i in range(count):
+					index = placeCell(x, y+i) if vertical else placeCell(x+i, y)
+					if index >= 0:
+						writeCell(index, code)
+			return
+		
+		clipped = self.clipLine(startX, startY, endX, endY)
+		if self.stats is not None:
+			cells = max(abs(endX - startX), abs(endY - startY)) + 1
+			self.stats.cellsCulled += cells - (clipped[1] - clipped[0] + 1 if clipped else 0)
+		if clipped is None:
+			return
+		sizeX = self.sizeX
+		writeSpan = self.writeSpan
+		for x, y, count, vertical in self.lineRuns(startX, startY, endX, endY, *clipped):
+			writeSpan(y*sizeX + x, count, code, sizeX if vertical else 1)
 	
-		#Get the X distance of the line.
-		xLength = endX - startX
+	"""
+		Works out where every character of the text goes, if it's drawn
+		at (x, y), and keeps the result, so the same text drawn at the
+		same place again doesn't have to be laid out again.
+		
+		HOW IT WORKS:
+		We go through the text, keeping track of where the next character
+		goes. A newline goes to the start of the next row, at x again. A tab
+		goes on to the next tab stop, every 4 columns from x, leaving the
+		cells in between alone. A character that would land past the right
+		edge of the surface goes on to the next row instead, at x in
+		WRAP_AT_LOCATION mode, or at the left edge in WRAP_AT_LINE mode.
+		Whatever lies between two of those is a segment: a row, the column
+		it starts at, and an array of its codepoints, ready to be written
+		as a single slice.
+		Layouts are kept by (text, x, y, text wrap mode), in an LRU cache
+		of at most textLayoutLimit layouts. Hits and misses are counted in
+		textLayoutHits and textLayoutMisses, and, if profiling, in the
+		stats too.
 		
-		#Get the Y distance of the line.
-		yLength = endY - startY
+		PARAMETERS:
+		x:		The X location of the text. Must be an integer.
+		y:		The Y location of the text. Must be an integer.
+		text:	The text.
 		
-		#Get the X increment.
-		try:
-			xIncrement = xLength/yLength
-		except:
-			xIncrement = 0
-			
-		for i in range (startY, endY, 1):
-			self.character(startX + ( (i-startY)*xIncrement), i, character)
+		RETURNS:
+		A tuple of (row, column, codepoints) segments.
+	"""
+	def layoutText(self, x, y, text):
+		key = (text, x, y, self.textWrapMode)
+		layouts = self.textLayouts
+		layout = layouts.get(key)
+		if layout is not None:
+			layouts.move_to_end(key)
+			self.textLayoutHits += 1
+			if self.stats is not None:
+				self.stats.textLayoutHits += 1
+			return layout
+		self.textLayoutMisses += 1
+		if self.stats is not None:
+			self.stats.textLayoutMisses += 1
+		
+		sizeX = self.sizeX
+		wrapX = x if self.textWrapMode == ASCIIGLConstants.WRAP_AT_LOCATION else 0
+		segments = []
+		row = y
+		column = start = x
+		codes = []
+		for character in text:
+			if character == "\n" or character == "\t":
+				if codes:
+					segments.append((row, start, array("I", codes)))
+					codes = []
+				if character == "\n":
+					row += 1
+					column = x
+				else:
+					column = x + ((column - x) // 4 + 1) * 4
+				start = column
+				continue
+			#Text only wraps if there's somewhere to wrap to.
+			if column >= sizeX and wrapX < sizeX:
+				if codes:
+					segments.append((row, start, array("I", codes)))
+					codes = []
+				row += 1
+				column = start = wrapX
+			codes.append(ord(character))
+			column += 1
+		if codes:
+			segments.append((row, start, array("I", codes)))
+		
+		layout = tuple(segments)
+		layouts[key] = layout
+		if len(layouts) > self.textLayoutLimit:
+			layouts.popitem(last=False)
+		return layout
 	
 	"""
-		Draws the string of text at the location (x, y).
-		Newlines, and tabs are removed and accounted for
-		manually to avoid currupting the framebuffer.
+		Draws the string of text with its first character at the
+		location (x, y).
+		Newlines and tabs are accounted for manually to avoid
+		currupting the framebuffer, and text that runs off the right
+		edge of the surface wraps around, based on the text wrap mode.
 		
 		HOW IT WORKS:
-		First we create location variables to know where the
-		current character should be printed.
-		Then we go through every character in the text to be printed,
-		checking to see if it is a newline, tab, or empty "", and
-		adjust the location accordingly.
-		Finally, if the character isn't one of the above characters,
-		we draw it at the current location, and then increment the 
-		current x position by one.
+		First we lay the text out with layoutText(), which is usually
+		already done, since most text is drawn in the same place frame
+		after frame. That hands back segments of text, one per stretch
+		of a row.
+		In CULL mode, each segment is clipped to the surface, and what's
+		left is written in one go with writeGlyphs().
+		In WRAP mode, a segment is still written in one go, unless it runs
+		off the end of the framebuffer, or we may only draw into a band of
+		it. Then its characters are placed one at a time.
 		
 		PARAMETERS:
 		x:		The X location of the text.
@@ -574,61 +1576,145 @@ class ASCIIGL(object):
 	"""
 	def text(self, x, y, text):
 	
-		#We need to keep track of where the current
-		#character should go.
-		curX = self.pushToInt(x)
-		curY = self.pushToInt(y)
+		layout = self.layoutText(self.pushToInt(x), self.pushToInt(y), text)
+		sizeX = self.sizeX
+		writeGlyphs = self.writeGlyphs
 		
-		#We repr the string so that we maintain the escape characters.
-		#text = str(text)
+		if self.cullMode == ASCIIGLConstants.CULL:
+			bandTop = self.bandTop
+			bandBottom = self.bandBottom
+			culled = 0
+			for row, column, codes in layout:
+				count = len(codes)
+				left = max(column, 0)
+				right = min(column+count, sizeX)
+				if bandTop <= row < bandBottom and left < right:
+					if right-left < count:
+						codes = codes[left-column:right-column]
+						culled += count - (right-left)
+					writeGlyphs(row*sizeX + left, codes)
+				else:
+					culled += count
+			if self.stats is not None:
+				self.stats.cellsCulled += culled
+			return
 		
-		for character in text:
-			if(character == '\n'):
-				curY += 1
-				curX =  self.pushToInt(x)
-			elif(character == '\t'):
-				curY += 4
-			elif(character == ''):
-				None
-			else:
-				curX += 1
-				self.character(curX, curY, character)
+		size = sizeX * self.sizeY
+		banded = self.bandTop > 0 or self.bandBottom < self.sizeY
+		placeCell = self.placeCell
+		writeCell = self.writeCell
+		for row, column, codes in layout:
+			index = (row*sizeX + column) % size
+			if not banded and index + len(codes) <= size:
+				writeGlyphs(index, codes)
+				continue
+			for i, code in enumerate(codes):
+				index = placeCell(column+i, row)
+				if index >= 0:
+					writeCell(index, code)
 	
 	"""
 		Draws the framebuffer to the screen, as described out front.
 		
 		HOW IT WORKS:
-		We create a string that we will use to render the framebuffer
-		to the screen.
-		Then we copy the framebuffer into that string, adding a newline
-		every sizeX characters.
-		Finally, we print that string. Simple.
+		We encode the bytes that we will use to render the framebuffer
+		to the screen. In PRESENT_DELTA mode that's just the changed runs
+		since the last frame, unless a full redraw is cheaper. Otherwise
+		it's the whole framebuffer, with a newline every sizeX characters.
+		Then we write that out to the output backend, and note how many
+		bytes it cost in lastFrameBytes.
+		If the backend isn't ready for another frame yet, we don't wait for
+		it. The frame is dropped before it's even encoded, and counted in
+		droppedFrames. The last frame stays as it was, so the next delta is
+		still against what the backend actually got.
+		If profiling is on, the time spent encoding and writing, and what
+		the frame cost, go into the stats.
+		If the surface has layers, they're composited into the framebuffer
+		before any of that.
+		Finally, the framebuffer we presented is swapped with the last
+		frame, so we know what's on the console for next time, and the
+		other one is either cleared or brought up to date to draw into.
+		With layers, it's always brought up to date, since the compositor
+		only redoes the rows that changed.
 		
 		PARAMETERS:
 		reallyClear:	If this is true, we fill the framebuffer with 
 						the clear character. If false, we don't
 	"""
 	def blitToScreen(self, reallyClear):
-		print('\x1b[1;1H')
-		#print('\x1b[2J')
-		self.swapString = ""
-		for i in range(len(self.frameBuffer)):
-			self.swapString += self.frameBuffer[i]
-			if i % self.sizeX == 0:
-				self.swapString += "\n"
+		stats = self.stats
+		quality = self.quality
+		layer = None
+		if self.compositor is not None:
+			layer = self.layer
+			if layer is not None:
+				self.setLayer(None)
+			if stats is not None:
+				stats.begin(ASCIIGLProfiler.RASTERIZE)
+			self.compositor.composite(self)
+			if stats is not None:
+				stats.end(ASCIIGLProfiler.RASTERIZE)
+			reallyClear = False
 		
-		print(self.swapString)
-		#print(stringToDraw)
+		if not self.outputBackend.ready():
+			self.droppedFrames += 1
+			if stats is not None:
+				stats.endFrame(0, 0)
+			if(reallyClear == True):
+				self.clearFramebuffer()
+			if layer is not None:
+				self.setLayer(layer.name)
+			if quality is not None:
+				quality.frameDone(self, 0.0, True)
+			return
 		
+		if quality is not None:
+			presentStart = time.perf_counter()
+		if stats is not None:
+			stats.begin(ASCIIGLProfiler.ENCODE)
+		if self.presentMode == ASCIIGLConstants.PRESENT_DELTA and self.lastFrameValid:
+			self.encoder.deltaFrame(self.frameBuffer, self.lastFrame, self.deltaOutput)
+			self.output = self.deltaOutput
+			#A full redraw costs at least one byte per cell. So if the delta
+			#is bigger than that, we check whether the full redraw is cheaper.
+			if len(self.deltaOutput) > self.frameBuffer.size:
+				self.encoder.fullFrame(self.frameBuffer, self.fullOutput)
+				if len(self.fullOutput) < len(self.deltaOutput):
+					self.output = self.fullOutput
+		else:
+			self.encoder.fullFrame(self.frameBuffer, self.fullOutput)
+			self.output = self.fullOutput
 		
-		#print(charList)
+		if stats is not None:
+			stats.end(ASCIIGLProfiler.ENCODE)
+			stats.begin(ASCIIGLProfiler.WRITE)
+		self.outputBackend.write(self.output.getvalue())
+		self.lastFrameBytes = len(self.output)
+		if quality is not None:
+			presentTime = time.perf_counter() - presentStart
+		if stats is not None:
+			stats.end(ASCIIGLProfiler.WRITE)
+			stats.endFrame(self.lastFrameBytes, self.output.sgrBytes)
+		if self.recorder is not None:
+			self.recorder.record(self.frameBuffer)
 		
+		#What we just presented becomes the last frame, and the old last
+		#frame becomes the one we draw into next.
+		self.lastFrame, self.frameBuffer = self.frameBuffer, self.lastFrame
+		self.lastFrameValid = True
 		if(reallyClear == True):
 			self.clearFramebuffer()
+		else:
+			self.frameBuffer.copyFrom(self.lastFrame)
 		
+		#The cell writer has to write into the new framebuffer, or the
+		#layer we were drawing into.
+		if layer is not None:
+			self.setLayer(layer.name)
+		else:
+			self.updateWriter()
 		
-		
-		
-		
-	
-	
+		#Only now, so whatever the controller changes applies from the
+		#next frame on.
+		if quality is not None:
+			quality.frameDone(self, presentTime)
@@ -0,0 +1,532 @@
+"""
+	This module is a handful of benchmarks for ASCIIGL.
+	Run it directly to run all of them:
+
+	python ASCIIGLBenchmark.py
+
+	None of them need a console; nothing is ever blitted to the screen
+	unless a benchmark says otherwise.
+"""
+
+import ASCIIGL, ASCIIGLConstants, ASCIIGLColor, ASCIIGLEncoder, ASCIIGLOutput, ASCIIGLParallel, ASCIIGLBitplane, ASCIIGLParticles
+
+#For timing things.
+import time
+
+#For making up things to draw.
+import random
+
+#For counting allocations.
+import tracemalloc
+
+#For writing to the null device.
+import os
+
+#For knowing what Colorama used to do here.
+import sys
+
+#For seeing what Colorama's stream wrapper costs.
+from colorama.ansitowin32 import AnsiToWin32, is_a_tty
+from colorama.initialise import wrap_stream
+
+"""
+	Runs the given function the given number of times, and returns
+	the average time it took in milliseconds.
+"""
+def timeIt(function, repeats):
+	start = time.perf_counter()
+	for i in range(repeats):
+		function()
+	return (time.perf_counter() - start) * 1000.0 / repeats
+
+"""
+	Compares drawing a batch of points with per-cell character() calls
+	against drawing them with one points() call.
+
+	PARAMETERS:
+	count:	How many points to draw per frame.
+	frames:	How many frames to average over.
+"""
+def benchmarkPoints(count=10000, frames=20):
+	width, height = 200, 100
+	xs = [random.uniform(-10, width + 10) for i in range(count)]
+	ys = [random.uniform(-10, height + 10) for i in range(count)]
+	chars = [random.choice("@#*.") for i in range(count)]
+	colors = [random.choice([ASCIIGLConstants.Fore.RED, ASCIIGLConstants.Fore.GREEN]) for i in range(count)]
+
+	perCell = ASCIIGL.ASCIIGL(width, height)
+	batch = ASCIIGL.ASCIIGL(width, height)
+
+	def drawPerCell():
+		for x, y, c, color in zip(xs, ys, chars, colors):
+			perCell.setTextColor(color)
+			perCell.character(x, y, c)
+
+	def drawBatch():
+		batch.points(xs, ys, chars, colors)
+
+	perCellTime = timeIt(drawPerCell, frames)
+	batchTime = timeIt(drawBatch, frames)
+	same = perCell.frameBuffer.sameRun(batch.frameBuffer, 0, perCell.frameBuffer.size)
+
+	print("points: %d points per frame" % count)
+	print("  character(): %8.2f ms/frame" % perCellTime)
+	print("  points():    %8.2f ms/frame (%.1fx, identical output: %s)" % (batchTime, perCellTime / batchTime, same))
+
+"""
+	Checks that the frame lifecycle doesn't allocate anything that sticks
+	around: draws and blits a bunch of frames under tracemalloc, and
+	reports how much more memory is in use afterwards, per frame.
+	More than the limit fails the benchmark, so a leak can't slip in
+	unnoticed.
+
+	PARAMETERS:
+	frames:	How many frames to measure over, after warming up.
+	limit:	The most net allocation allowed, in bytes per frame. A few
+			bytes come and go with the interpreter's own bookkeeping,
+			but anything kept per frame is more than this.
+
+	RAISES:
+	AssertionError, if the frame lifecycle allocates more than the limit.
+"""
+def benchmarkAllocations(frames=200, limit=32):
+	renderer = ASCIIGL.ASCIIGL(100, 60)
+	renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+	renderer.setBGColor(ASCIIGLConstants.Back.BLACK)
+	renderer.setOutputBackend(ASCIIGLOutput.NullOutput())
+	xs = [random.uniform(0, 100) for i in range(200)]
+	ys = [random.uniform(0, 60) for i in range(200)]
+
+	def frame(i):
+		renderer.rect(10, 10, 30, 10, ".", "=", "|")
+		renderer.line(50, 59, 50 + i % 20, 20, ":")
+		renderer.text(5, 7, "Fireworks are the\nbest, aren't they,\nwhen ASCII?")
+		renderer.points(xs[i % 50:], ys[i % 50:], "@", ASCIIGLConstants.Fore.RED)
+		renderer.blitToScreen(True)
+
+	#Warm up, so the output buffers and caches reach their full size.
+	for i in range(50):
+		frame(i)
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	for i in range(frames):
+		frame(i)
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+
+	perFrame = (after - before) / float(frames)
+	print("allocations: %d frames" % frames)
+	print("  net allocated: %.1f bytes/frame (limit %d)" % (perFrame, limit))
+	assert perFrame <= limit, "The frame lifecycle kept %.1f bytes/frame, more than the %d allowed." % (perFrame, limit)
+
+"""
+	Compares drawing and blitting frames with profiling off and on.
+	
+	PARAMETERS:
+	frames:	How many frames to average over.
+"""
+def benchmarkProfiling(frames=200):
+	xs = [random.uniform(-10, 110) for i in range(500)]
+	ys = [random.uniform(-10, 70) for i in range(500)]
+	
+	def timeFrames(profile):
+		renderer = ASCIIGL.ASCIIGL(100, 60)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+		renderer.setOutputBackend(ASCIIGLOutput.NullOutput())
+		renderer.setProfiling(profile)
+		state = {"i": 0}
+		def frame():
+			i = state["i"]
+			state["i"] += 1
+			renderer.rect(i % 50, 10, 30, 10, ".", "=", "|")
+			renderer.line(50, 59, 50 + i % 20, 20, ":")
+			renderer.text(5, 7, "Fireworks are the\nbest, aren't they,\nwhen ASCII?")
+			renderer.points(xs, ys, "@", ASCIIGLConstants.Fore.RED)
+			renderer.blitToScreen(True)
+		return timeIt(frame, frames)
+	
+	offTime = timeFrames(False)
+	onTime = timeFrames(True)
+	print("profiling: %d frames" % frames)
+	print("  off: %8.3f ms/frame" % offTime)
+	print("  on:  %8.3f ms/frame (%+.1f%%)" % (onTime, (onTime / offTime - 1.0) * 100.0))
+
+"""
+	Compares drawing lines and rectangles that are almost all off the
+	surface, like a rocket launched from below it, against drawing the
+	same ones where they're all on it. With clipping, the ones that are
+	off the surface should cost next to nothing, however long they are.
+
+	PARAMETERS:
+	count:	How many lines and rectangles to draw per frame.
+	frames:	How many frames to average over.
+"""
+def benchmarkClipping(count=200, frames=20):
+	width, height = 80, 60
+	renderer = ASCIIGL.ASCIIGL(width, height)
+	
+	def offSurface():
+		for i in range(count):
+			renderer.line(i % width, height - 3, (i*7) % width, height + 2000, ":")
+			renderer.rect(-1000, height - 2, 2000, 1000, ".", "=", "|")
+		renderer.clearFramebuffer()
+	def onSurface():
+		for i in range(count):
+			renderer.line(i % width, 0, (i*7) % width, height - 1, ":")
+			renderer.rect(0, 0, width, height, ".", "=", "|")
+		renderer.clearFramebuffer()
+	
+	offTime = timeIt(offSurface, frames)
+	onTime = timeIt(onSurface, frames)
+	print("clipping: %d lines and %d rects per frame" % (count, count))
+	print("  on the surface:     %8.2f ms/frame" % onTime)
+	print("  mostly off of it:   %8.2f ms/frame (%.1fx)" % (offTime, onTime / offTime))
+
+"""
+	Compares drawing the same text over and over with its layout cached
+	against laying it out every time, like it would be if every frame's
+	text were different.
+
+	PARAMETERS:
+	count:	How many times to draw the text per frame.
+	frames:	How many frames to average over.
+"""
+def benchmarkText(count=200, frames=20):
+	renderer = ASCIIGL.ASCIIGL(80, 60)
+	message = "Fireworks are the\nbest, aren't they,\nwhen ASCII?"
+	
+	def frame():
+		for i in range(count):
+			renderer.text(5, 7, message)
+	
+	cachedTime = timeIt(frame, frames)
+	renderer.textLayoutLimit = 0
+	renderer.textLayouts.clear()
+	uncachedTime = timeIt(frame, frames)
+	print("text: %d three-line messages per frame" % count)
+	print("  laid out every time: %8.2f ms/frame" % uncachedTime)
+	print("  layout cached:       %8.2f ms/frame (%.1fx)" % (cachedTime, uncachedTime / cachedTime))
+
+"""
+	Compares redrawing a busy, unchanging background under a few moving
+	points every frame against keeping the background in a static layer,
+	and the points in a dynamic one over it, and checks they send exactly
+	the same bytes.
+
+	PARAMETERS:
+	frames:	How many frames to average over.
+	count:	How many moving points to draw per frame.
+"""
+def benchmarkLayers(frames=100, count=20):
+	width, height = 100, 60
+	rects = [(random.randint(-10, width), random.randint(-10, height), random.randint(1, 30), random.randint(1, 20)) for i in range(40)]
+	lines = [(random.uniform(0, width), random.uniform(0, height), random.uniform(0, width), random.uniform(0, height)) for i in range(200)]
+	
+	def background(renderer):
+		renderer.setTextColor(ASCIIGLConstants.Fore.BLUE)
+		for x, y, sx, sy in rects:
+			renderer.rect(x, y, sx, sy, ".", "=", "|")
+		renderer.setTextColor(ASCIIGLConstants.Fore.CYAN)
+		for startX, startY, endX, endY in lines:
+			renderer.line(startX, startY, endX, endY, ":")
+	
+	def run(layered):
+		renderer = ASCIIGL.ASCIIGL(width, height)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+		output = ASCIIGLOutput.MemoryOutput()
+		renderer.setOutputBackend(output)
+		if layered:
+			renderer.addLayer("background", 0, background)
+			renderer.addLayer("points", 1)
+		state = {"i": 0}
+		def frame():
+			i = state["i"]
+			state["i"] += 1
+			if layered:
+				renderer.setLayer("points")
+			else:
+				background(renderer)
+			xs = [(k*7 + i) % width for k in range(count)]
+			ys = [(k*3 + i // 4) % 8 for k in range(count)]
+			renderer.points(xs, ys, "*", ASCIIGLConstants.Fore.RED)
+			renderer.blitToScreen(True)
+		return timeIt(frame, frames), output.getvalue()
+	
+	redrawTime, redrawBytes = run(False)
+	layeredTime, layeredBytes = run(True)
+	print("layers: %d rects and %d lines of background, %d moving points per frame" % (len(rects), len(lines), count))
+	print("  redrawn every frame: %8.2f ms/frame" % redrawTime)
+	print("  static layer:        %8.2f ms/frame (%.1fx, identical output: %s)" % (layeredTime, redrawTime / layeredTime, layeredBytes == redrawBytes))
+
+"""
+	Compares encoding a frame full of colors at every color depth: the
+	basic colors, palette colors and RGB colors, each sent as they are,
+	and RGB colors brought down to what a lesser console can show.
+
+	PARAMETERS:
+	frames:	How many frames to average over.
+	count:	How many colored points to draw per frame.
+"""
+def benchmarkColors(frames=20, count=4000):
+	width, height = 100, 60
+	xs = [random.uniform(0, width) for i in range(count)]
+	ys = [random.uniform(0, height) for i in range(count)]
+	basic = [ASCIIGLConstants.Fore.RED, ASCIIGLConstants.Fore.GREEN, ASCIIGLConstants.Fore.YELLOW,
+	         ASCIIGLConstants.Fore.BLUE, ASCIIGLConstants.Fore.MAGENTA, ASCIIGLConstants.Fore.CYAN]
+	palette = [ASCIIGLColor.palette(random.randrange(256)) for i in range(64)]
+	rgb = [ASCIIGLColor.rgb(random.randrange(256), random.randrange(256), random.randrange(256)) for i in range(512)]
+	
+	def run(colors, depth):
+		renderer = ASCIIGL.ASCIIGL(width, height)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+		renderer.setPresentMode(ASCIIGLConstants.PRESENT_FULL)
+		renderer.setColorDepth(depth)
+		output = ASCIIGLOutput.NullOutput()
+		renderer.setOutputBackend(output)
+		pointColors = [colors[i % len(colors)] for i in range(count)]
+		renderer.points(xs, ys, "*", pointColors)
+		def frame():
+			renderer.blitToScreen(False)
+		frameTime = timeIt(frame, frames)
+		return frameTime, output.bytesWritten / float(frames)
+	
+	print("colors: %d colored points per frame, full redraws" % count)
+	for name, colors, depth in (("16 colors", basic, ASCIIGLConstants.COLOR_16),
+	                            ("256 colors", palette, ASCIIGLConstants.COLOR_256),
+	                            ("truecolor", rgb, ASCIIGLConstants.COLOR_TRUE),
+	                            ("truecolor at 256", rgb, ASCIIGLConstants.COLOR_256),
+	                            ("truecolor at 16", rgb, ASCIIGLConstants.COLOR_16)):
+		frameTime, frameBytes = run(colors, depth)
+		print("  %-17s %8.2f ms/frame, %6d bytes/frame" % (name + ":", frameTime, frameBytes))
+
+"""
+	Builds a frame the way it used to be built, as one big string, with
+	every cell's escapes glued onto its glyph.
+"""
+def legacyFrame(frameBuffer, encoder):
+	pieces = ["\x1b[1;1H"]
+	for i in range(frameBuffer.size):
+		if i and i % frameBuffer.sizeX == 0:
+			pieces.append("\n")
+		b, f, s = frameBuffer.bg[i], frameBuffer.fg[i], frameBuffer.style[i]
+		if b or f or s:
+			pieces.append(encoder.escape(b, f, s))
+		pieces.append(chr(frameBuffer.glyphs[i]))
+	return "".join(pieces)
+
+"""
+	Compares presenting a frame the whole way it used to be done, building
+	it as one big string and handing it to print(), against encoding it
+	straight to bytes and writing them with TerminalOutput, which does it
+	in one os.write(). Off Windows, Colorama never wrapped stdout, so both
+	write to the null device as it is. On Windows, redirected output went
+	through Colorama's wrapper and was stripped, so that's timed too, but
+	apart. Only our side of the write is timed.
+
+	PARAMETERS:
+	frames:	How many frames to average over.
+	count:	How many colored points to draw on the frame.
+"""
+def benchmarkPresenting(frames=200, count=3000):
+	width, height = 200, 60
+	renderer = ASCIIGL.ASCIIGL(width, height)
+	renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+	renderer.setBGColor(ASCIIGLConstants.Back.BLACK)
+	renderer.rect(0, 0, width, height, " ", " ", " ")
+	colors = [ASCIIGLConstants.Fore.RED, ASCIIGLConstants.Fore.GREEN, ASCIIGLConstants.Fore.CYAN]
+	xs = [random.uniform(0, width) for i in range(count)]
+	ys = [random.uniform(0, height) for i in range(count)]
+	renderer.points(xs, ys, "*", [random.choice(colors) for i in range(count)])
+	frameBuffer = renderer.frameBuffer
+	encoder = ASCIIGLEncoder.FrameEncoder()
+	buffer = ASCIIGLEncoder.OutputBuffer()
+	
+	stream = open(os.devnull, "w", encoding="utf-8")
+	output = ASCIIGLOutput.TerminalOutput(stream)
+	oldTime = timeIt(lambda: print(legacyFrame(frameBuffer, encoder), end="", file=stream, flush=True), frames)
+	def present():
+		encoder.fullFrame(frameBuffer, buffer)
+		output.write(buffer.getvalue())
+	newTime = timeIt(present, frames)
+	encodeTime = timeIt(lambda: encoder.fullFrame(frameBuffer, buffer), frames)
+	#What Colorama did to redirected output on Windows, and only there.
+	stripping = AnsiToWin32(stream, strip=True).stream
+	strippedTime = timeIt(lambda: print(legacyFrame(frameBuffer, encoder), end="", file=stripping, flush=True), frames)
+	stream.close()
+	print("presenting: %dx%d frame, %d bytes" % (width, height, len(buffer)))
+	print("  string, print():        %8.3f ms/frame" % oldTime)
+	print("  bytes, one write:       %8.3f ms/frame (%.1fx)" % (newTime, oldTime / newTime))
+	print("    of which encoding:    %8.3f ms/frame" % encodeTime)
+	print("  string, print(), Windows, redirected (stripped): %8.3f ms/frame" % strippedTime)
+
+"""
+	Compares writing a frame to stdout as Colorama used to leave it, with
+	its old defaults, against as it leaves it now, on the same stream,
+	for a frame with escapes and one without. Off Windows, Colorama never
+	wrapped anything, and still doesn't, so both are just a write; what's
+	changed only shows on Windows. Everything is written to the null
+	device.
+
+	PARAMETERS:
+	frames:	How many frames to average over.
+"""
+def benchmarkColorama(frames=200):
+	width, height = 200, 60
+	renderer = ASCIIGL.ASCIIGL(width, height)
+	renderer.rect(0, 0, width, height, ".", "=", "|")
+	encoder = ASCIIGLEncoder.FrameEncoder()
+	buffer = ASCIIGLEncoder.OutputBuffer()
+	#Without colors, the frame's only escape is the cursor home.
+	encoder.fullFrame(renderer.frameBuffer, buffer)
+	plain = str(buffer.getvalue(), "utf-8")[len("\x1b[1;1H"):]
+	renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+	renderer.setBGColor(ASCIIGLConstants.Back.BLACK)
+	for y in range(height):
+		renderer.setTextColor(random.choice([ASCIIGLConstants.Fore.RED, ASCIIGLConstants.Fore.GREEN, ASCIIGLConstants.Fore.CYAN]))
+		renderer.line(random.uniform(0, width), y, random.uniform(0, width), y, "*")
+	encoder.fullFrame(renderer.frameBuffer, buffer)
+	colored = str(buffer.getvalue(), "utf-8")
+	
+	stream = open(os.devnull, "w", encoding="utf-8")
+	#Colorama's old defaults: strip on Windows, and convert on a Windows console.
+	onWindows = sys.platform.startswith("win")
+	oldStdout = wrap_stream(stream, onWindows and is_a_tty(stream), onWindows, False, True)
+	newStdout = wrap_stream(stream, None, None, False, True)
+	print("colorama: %dx%d frames, %d characters with escapes, %d without, on %s" % (width, height, len(colored), len(plain), sys.platform))
+	for name, text in (("escapes:", colored), ("no escapes:", plain)):
+		oldTime = timeIt(lambda: oldStdout.write(text), frames)
+		newTime = timeIt(lambda: newStdout.write(text), frames)
+		print("  %-12s old defaults %8.3f ms/frame (wrapped: %s), new defaults %8.3f ms/frame (wrapped: %s, %.1fx)" %
+		      (name, oldTime, oldStdout is not stream, newTime, newStdout is not stream, oldTime / newTime))
+	stream.close()
+
+"""
+	Times packing an 800x480 plane of dots into glyphs, and plotting,
+	packing and drawing it, in each sub-cell mode.
+
+	PARAMETERS:
+	frames:	How many frames to average over.
+	count:	How many dots to plot per frame.
+"""
+def benchmarkBitplane(frames=50, count=40000):
+	dotsX, dotsY = 800, 480
+	print("bitplane: %dx%d dots, %d plotted per frame (%s)" % (dotsX, dotsY, count, "NumPy" if ASCIIGLBitplane.numpy is not None else "no NumPy"))
+	for name, mode in (("half-block", ASCIIGLBitplane.HALF_BLOCK), ("braille", ASCIIGLBitplane.BRAILLE)):
+		cellWidth, cellHeight = ASCIIGLBitplane.CELL_SIZES[mode]
+		width, height = dotsX // cellWidth, dotsY // cellHeight
+		xs = [random.uniform(0, width) for i in range(count)]
+		ys = [random.uniform(0, height) for i in range(count)]
+		if ASCIIGLBitplane.numpy is not None:
+			xs = ASCIIGLBitplane.numpy.array(xs)
+			ys = ASCIIGLBitplane.numpy.array(ys)
+		renderer = ASCIIGL.ASCIIGL(width, height)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+		renderer.setTextColor(ASCIIGLConstants.Fore.GREEN)
+		bitplane = ASCIIGLBitplane.Bitplane(width, height, mode)
+		bitplane.plot(xs, ys)
+		packTime = timeIt(bitplane.pack, frames)
+		def frame():
+			bitplane.plot(xs, ys, ASCIIGLConstants.Fore.RED)
+			bitplane.draw(renderer)
+		frameTime = timeIt(frame, frames)
+		print("  %-11s %dx%d cells, pack: %8.2f ms/frame, plot and draw: %8.2f ms/frame" % (name + ":", width, height, packTime, frameTime))
+
+"""
+	Compares drawing a crowd of particles, most of them sharing cells
+	with others, one glyph each, against accumulating them with a density
+	ramp, and counts the cells each writes.
+
+	PARAMETERS:
+	frames:	How many frames to average over.
+	count:	How many particles to draw per frame.
+"""
+def benchmarkDensity(frames=50, count=100000):
+	width, height = 100, 60
+	
+	def run(ramp):
+		renderer = ASCIIGL.ASCIIGL(width, height)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+		renderer.setProfiling(True)
+		particles = ASCIIGLParticles.ParticleSystem(count)
+		random.seed(25)
+		#Bursts, so cells in the middle of them get crowded.
+		for burst in range(count // 1000):
+			vx = [random.gauss(0, 8) for i in range(1000)]
+			vy = [random.gauss(0, 5) for i in range(1000)]
+			particles.emit(random.uniform(20, 80), random.uniform(15, 45), vx, vy, ASCIIGLConstants.Fore.RED)
+		particles.step()
+		particles.setDensityRamp(ramp)
+		def frame():
+			renderer.stats.cellsWritten = 0
+			particles.draw(renderer)
+		frameTime = timeIt(frame, frames)
+		return frameTime, renderer.stats.cellsWritten, particles.count
+	
+	drawTime, drawCells, drawn = run(None)
+	densityTime, densityCells, accumulated = run(ASCIIGLParticles.DENSITY_RAMP)
+	print("density: %d particles on %dx%d, %d of them on it (%s)" % (count, width, height, drawn, "NumPy" if ASCIIGLParticles.numpy is not None else "no NumPy"))
+	print("  one glyph each: %8.2f ms/frame, %6d cells written" % (drawTime, drawCells))
+	print("  accumulated:    %8.2f ms/frame, %6d cells written" % (densityTime, densityCells))
+
+"""
+	Compares rasterizing a heavy frame on a big surface in one process
+	against rasterizing it with ASCIIGLParallel, with different numbers
+	of workers, and checks that every one of them sends exactly the same
+	bytes.
+	
+	PARAMETERS:
+	workerCounts:	The numbers of workers to try.
+	frames:			How many frames to average over.
+	count:			How many points to draw per frame.
+"""
+def benchmarkParallel(workerCounts=(1, 2, 4, 8), frames=10, count=100000):
+	width, height = 400, 200
+	xs = [random.uniform(-10, width + 10) for i in range(count)]
+	ys = [random.uniform(-10, height + 10) for i in range(count)]
+	rects = [(random.randint(-20, width), random.randint(-20, height), random.randint(1, 60), random.randint(1, 40)) for i in range(200)]
+	lines = [(random.uniform(0, width), random.uniform(0, height), random.uniform(0, width), random.uniform(0, height)) for i in range(500)]
+	
+	def run(workers):
+		renderer = ASCIIGL.ASCIIGL(width, height)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
+		output = ASCIIGLOutput.MemoryOutput()
+		renderer.setOutputBackend(output)
+		target = ASCIIGLParallel.ParallelRasterizer(renderer, workers) if workers else renderer
+		state = {"i": 0}
+		def frame():
+			i = state["i"]
+			state["i"] += 1
+			target.setTextColor(ASCIIGLConstants.Fore.GREEN)
+			for x, y, sx, sy in rects:
+				target.rect(x + i, y, sx, sy, ".", "=", "|")
+			target.setTextColor(ASCIIGLConstants.Fore.WHITE)
+			for startX, startY, endX, endY in lines:
+				target.line(startX, startY + i, endX, endY, ":")
+			target.points(xs, ys, "@", ASCIIGLConstants.Fore.RED)
+			target.text(5, 7, "Fireworks are the\nbest, aren't they,\nwhen ASCII?")
+			target.blitToScreen(True)
+		frameTime = timeIt(frame, frames)
+		if workers:
+			target.close()
+		return frameTime, output.getvalue()
+	
+	singleTime, singleBytes = run(0)
+	print("parallel: %dx%d surface, %d points, %d rects, %d lines per frame" % (width, height, count, len(rects), len(lines)))
+	print("  1 process:   %8.2f ms/frame" % singleTime)
+	for workers in workerCounts:
+		frameTime, frameBytes = run(workers)
+		print("  %d workers:   %8.2f ms/frame (%.2fx, identical output: %s)" % (workers, frameTime, singleTime / frameTime, frameBytes == singleBytes))
+
+if __name__ == "__main__":
+	benchmarkPoints()
+	benchmarkAllocations()
+	benchmarkProfiling()
+	benchmarkClipping()
+	benchmarkText()
+	benchmarkLayers()
+	benchmarkColors()
+	benchmarkPresenting()
+	benchmarkColorama()
+	benchmarkBitplane()
+	benchmarkDensity()
+	benchmarkParallel()
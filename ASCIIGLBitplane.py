@@ -0,0 +1,246 @@
+"""
+	This module holds bitplanes: surfaces of dots, at a finer resolution
+	than the cells of an ASCIIGL rendering surface, that are packed into
+	glyphs that draw several dots each.
+
+	---SUB-CELL MODES---
+	HALF_BLOCK:	1x2 dots per cell, drawn with the half and full block
+				characters. Twice the resolution, down.
+	BRAILLE:	2x4 dots per cell, drawn with the Braille patterns. Eight
+				times the resolution, in a console font that has them.
+
+	---DATA ORGANISATION---
+	dots:	One byte per dot, 1 if it's set, 0 if it isn't, row by row.
+			(dotsY, dotsX) with NumPy, flat without.
+	colors:	The foreground color code of each cell, whatever was last
+			plotted into it. 0 means the surface's text color.
+	Dots are in dot-space, where a dot is a cellWidth-th of a cell across
+	and a cellHeight-th down. Plotting takes caret-space locations, just
+	like the rest of ASCIIGL, and scales them.
+
+	---PACKING---
+	Every dot of a cell has a bit in the cell's pattern, and the glyph of
+	each possible pattern is in a lookup table. With NumPy, the dots in
+	each position of a cell are pulled out of the plane as one strided
+	view, shifted into their bit, and ORed together, so packing a whole
+	plane is just cellWidth*cellHeight whole-array operations and one
+	table lookup.
+	Without NumPy, only the dots that are set are visited, pulled out
+	with itertools.compress().
+
+	---DRAWING---
+	draw() packs the plane, and writes every cell with any dots in it into
+	the framebuffer, or layer, the surface is drawing into, just like a
+	particle system would. Cells without any dots aren't touched, so
+	whatever's under them shows. Then the plane is cleared for the next
+	frame.
+"""
+
+#We want a fast path, but we don't want to need it.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+#For picking out the dots that are set, without NumPy.
+import itertools
+
+#Dots are flattened down, always.
+import math
+
+#The fallback storage.
+from array import array
+
+import ASCIIGLConstants, ASCIIGLFramebuffer
+
+"""
+	The sub-cell modes.
+"""
+HALF_BLOCK = 1
+BRAILLE = 2
+
+"""
+	For each mode, the size of a cell in dots, and for each dot of a
+	cell, its (x, y) in the cell and its bit in the pattern.
+"""
+CELL_SIZES = {HALF_BLOCK: (1, 2), BRAILLE: (2, 4)}
+DOT_BITS = {HALF_BLOCK: ((0, 0, 0), (0, 1, 1)),
+            BRAILLE: ((0, 0, 0), (0, 1, 1), (0, 2, 2), (1, 0, 3),
+                      (1, 1, 4), (1, 2, 5), (0, 3, 6), (1, 3, 7))}
+
+"""
+	For each mode, the codepoint that draws each pattern. Pattern 0 has
+	no dots, and no glyph.
+"""
+GLYPHS = {HALF_BLOCK: (0, 0x2580, 0x2584, 0x2588),
+          BRAILLE: (0,) + tuple(range(0x2801, 0x2900))}
+
+class Bitplane(object):
+
+	"""
+		Initializes an empty bitplane.
+
+		PARAMETERS:
+		sizeX:	The X size of the rendering surface it's drawn onto, in cells.
+		sizeY:	The Y size of the rendering surface it's drawn onto, in cells.
+		mode:	HALF_BLOCK or BRAILLE.
+	"""
+	def __init__(self, sizeX, sizeY, mode=BRAILLE):
+		self.sizeX = sizeX
+		self.sizeY = sizeY
+		self.size = sizeX * sizeY
+		self.mode = mode
+		self.cellWidth, self.cellHeight = CELL_SIZES[mode]
+		self.dotsX = sizeX * self.cellWidth
+		self.dotsY = sizeY * self.cellHeight
+		if numpy is not None:
+			self.dots = numpy.zeros((self.dotsY, self.dotsX), dtype=numpy.uint8)
+			self.colors = numpy.zeros(self.size, dtype=numpy.uint32)
+			self.glyphTable = numpy.array(GLYPHS[mode], dtype=numpy.uint32)
+			#Where the packed patterns go, made once.
+			self.patterns = numpy.zeros((sizeY, sizeX), dtype=numpy.uint8)
+			self.shifted = numpy.zeros((sizeY, sizeX), dtype=numpy.uint8)
+		else:
+			self.dots = bytearray(self.dotsX * self.dotsY)
+			self.colors = array("I", [0]) * self.size
+			self.glyphTable = GLYPHS[mode]
+			#Which cell, and which bit of it, each dot of a row is, by x.
+			self.dotColumns = [(x // self.cellWidth, x % self.cellWidth) for x in range(self.dotsX)]
+			self.dotBits = {}
+			for dx, dy, bit in DOT_BITS[mode]:
+				self.dotBits[(dx, dy)] = 1 << bit
+
+	"""
+		Clears every dot and color.
+	"""
+	def clear(self):
+		if numpy is not None:
+			self.dots.fill(0)
+			self.colors.fill(0)
+		else:
+			self.dots[:] = bytes(len(self.dots))
+			self.colors[:] = array("I", [0]) * self.size
+
+	"""
+		Sets the dots at a batch of locations.
+
+		PARAMETERS:
+		xs:		The X locations of the dots, in caret-space. Any sequence
+				works, NumPy arrays included.
+		ys:		The Y locations of the dots, in caret-space.
+		colors:	Optional. Either a single text color, or a sequence of
+				text colors, one per location. Use ASCIIGLConstants.Fore,
+				or color codes from ASCIIGLColor. A NumPy array has to
+				hold color codes already. If omitted, the cells get the
+				surface's text color when they're drawn.
+
+		RETURNS:
+		How many of the dots were off the plane, and culled.
+	"""
+	def plot(self, xs, ys, colors=None):
+		count = min(len(xs), len(ys))
+		if isinstance(colors, (str, int)):
+			colors = ASCIIGLFramebuffer.internColor(colors)
+		elif colors is not None and not (numpy is not None and isinstance(colors, numpy.ndarray)):
+			colors = [ASCIIGLFramebuffer.internColor(color) for color in colors[:count]]
+		if numpy is not None:
+			dx = numpy.floor(numpy.asarray(xs[:count], dtype=numpy.float64) * self.cellWidth).astype(numpy.int64)
+			dy = numpy.floor(numpy.asarray(ys[:count], dtype=numpy.float64) * self.cellHeight).astype(numpy.int64)
+			visible = (dx >= 0) & (dx < self.dotsX) & (dy >= 0) & (dy < self.dotsY)
+			dx = dx[visible]
+			dy = dy[visible]
+			self.dots[dy, dx] = 1
+			if colors is not None:
+				cells = (dy // self.cellHeight)*self.sizeX + dx // self.cellWidth
+				self.colors[cells] = colors if isinstance(colors, int) else numpy.asarray(colors[:count], dtype=numpy.uint32)[visible]
+			return count - len(dx)
+		culled = 0
+		dots = self.dots
+		dotsX, dotsY = self.dotsX, self.dotsY
+		cellWidth, cellHeight = self.cellWidth, self.cellHeight
+		for i in range(count):
+			dx = math.floor(xs[i] * cellWidth)
+			dy = math.floor(ys[i] * cellHeight)
+			if not (0 <= dx < dotsX and 0 <= dy < dotsY):
+				culled += 1
+				continue
+			dots[dy*dotsX + dx] = 1
+			if colors is not None:
+				self.colors[(dy // cellHeight)*self.sizeX + dx // cellWidth] = colors if isinstance(colors, int) else colors[i]
+		return culled
+
+	"""
+		Packs the dots of every cell into its pattern.
+
+		RETURNS:
+		With NumPy, a (sizeY, sizeX) array of the pattern of every cell.
+		Without it, a dict of the pattern of every cell with any dots
+		in it, by cell index.
+	"""
+	def pack(self):
+		if numpy is not None:
+			patterns = self.patterns
+			shifted = self.shifted
+			patterns.fill(0)
+			dots = self.dots
+			for dx, dy, bit in DOT_BITS[self.mode]:
+				numpy.left_shift(dots[dy::self.cellHeight, dx::self.cellWidth], bit, out=shifted)
+				patterns |= shifted
+			return patterns
+		patterns = {}
+		dotsX = self.dotsX
+		cellHeight = self.cellHeight
+		sizeX = self.sizeX
+		dotColumns = self.dotColumns
+		dotBits = self.dotBits
+		for index in itertools.compress(range(len(self.dots)), self.dots):
+			dy, x = divmod(index, dotsX)
+			cellX, dx = dotColumns[x]
+			cell = (dy // cellHeight)*sizeX + cellX
+			patterns[cell] = patterns.get(cell, 0) | dotBits[(dx, dy % cellHeight)]
+		return patterns
+
+	"""
+		Packs the plane, and draws every cell with any dots in it onto the
+		given ASCIIGL rendering surface, as described out front. Then
+		clears the plane.
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface to draw onto. It has to
+					be the size the plane was made for.
+
+		RETURNS:
+		How many cells were written.
+	"""
+	def draw(self, renderer):
+		frameBuffer = renderer.frameBuffer
+		fg, bg, style = renderer.currentAttributes()
+		keepColor = renderer.colorMode != ASCIIGLConstants.PRESERVE_COLOR
+		patterns = self.pack()
+		if numpy is not None:
+			cells = numpy.flatnonzero(patterns)
+			codes = self.glyphTable[patterns.ravel()[cells]]
+			colors = self.colors[cells]
+			if keepColor:
+				colors = numpy.where(colors != 0, colors, fg)
+			else:
+				colors = 0
+			numpy.frombuffer(frameBuffer.glyphs, dtype=numpy.uint32)[cells] = codes
+			numpy.frombuffer(frameBuffer.fg, dtype=numpy.uint32)[cells] = colors
+			numpy.frombuffer(frameBuffer.bg, dtype=numpy.uint32)[cells] = bg
+			numpy.frombuffer(frameBuffer.style, dtype=numpy.uint8)[cells] = style
+			written = len(cells)
+		else:
+			glyphTable = self.glyphTable
+			colors = self.colors
+			glyphs, fgPlane, bgPlane, stylePlane = frameBuffer.glyphs, frameBuffer.fg, frameBuffer.bg, frameBuffer.style
+			for cell, pattern in patterns.items():
+				glyphs[cell] = glyphTable[pattern]
+				fgPlane[cell] = (colors[cell] or fg) if keepColor else 0
+				bgPlane[cell] = bg
+				stylePlane[cell] = style
+			written = len(patterns)
+		if renderer.stats is not None:
+			renderer.stats.cellsWritten += written
+		self.clear()
+		return written
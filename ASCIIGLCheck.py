@@ -0,0 +1,217 @@
+"""
+	This module is a handful of checks for ASCIIGL, for the things that
+	are easy to get subtly wrong and hard to see by eye. Run it directly
+	to run all of them:
+
+	python ASCIIGLCheck.py
+
+	Each check raises an AssertionError if something's wrong. None of them
+	need a console: frames are played into a little console emulator, and
+	what it ends up showing is compared.
+"""
+
+import ASCIIGL, ASCIIGLConstants, ASCIIGLColor, ASCIIGLEncoder, ASCIIGLFramebuffer
+
+#For making up things to draw.
+import random
+
+#For picking apart escapes.
+import re
+
+"""
+	The escapes the emulator understands. Anything else is ignored.
+"""
+ESCAPE_RE = re.compile("\x1b\\[([\\d;]*)([A-Za-z])")
+
+class Console(object):
+
+	"""
+		A console of the given size, showing nothing, with the default
+		attributes.
+		Every cell is a glyph and the attributes it was printed with.
+		The attributes are the foreground, the background, and the set of
+		style parameters that are on, with None for the default colors.
+	"""
+	def __init__(self, sizeX, sizeY):
+		self.sizeX = sizeX
+		self.sizeY = sizeY
+		self.default = (None, None, frozenset())
+		self.cells = [(" ", self.default)] * (sizeX * sizeY)
+		self.attributes = self.default
+		self.x = 0
+		self.y = 0
+
+	"""
+		Applies the parameters of an SGR escape to the attributes.
+	"""
+	def sgr(self, params):
+		params = [int(p) if p else 0 for p in params.split(";")]
+		fg, bg, style = self.attributes
+		style = set(style)
+		i = 0
+		while i < len(params):
+			p = params[i]
+			if p in (38, 48):
+				#256 color and RGB colors take more parameters.
+				length = 3 if params[i+1] == 5 else 5
+				color = tuple(params[i+1:i+length])
+				if p == 38:
+					fg = color
+				else:
+					bg = color
+				i += length
+				continue
+			if p == 0:
+				fg, bg, style = None, None, set()
+			elif 30 <= p <= 37 or 90 <= p <= 97:
+				fg = p
+			elif p == 39:
+				fg = None
+			elif 40 <= p <= 47 or 100 <= p <= 107:
+				bg = p
+			elif p == 49:
+				bg = None
+			elif p == 22:
+				style.discard(1)
+				style.discard(2)
+			else:
+				style.add(p)
+			i += 1
+		self.attributes = (fg, bg, frozenset(style))
+
+	"""
+		Plays the given bytes into the console.
+	"""
+	def feed(self, data):
+		text = bytes(data).decode("utf-8")
+		i = 0
+		while i < len(text):
+			match = ESCAPE_RE.match(text, i)
+			if match:
+				params, command = match.groups()
+				if command == "m":
+					self.sgr(params)
+				elif command == "H":
+					row, column = (params.split(";") + ["1", "1"])[:2]
+					self.y = int(row or 1) - 1
+					self.x = int(column or 1) - 1
+				i = match.end()
+				continue
+			if text[i] == "\n":
+				self.x = 0
+				self.y += 1
+			else:
+				if 0 <= self.x < self.sizeX and 0 <= self.y < self.sizeY:
+					self.cells[self.y*self.sizeX + self.x] = (text[i], self.attributes)
+				self.x += 1
+			i += 1
+
+"""
+	Draws a frame of random glyphs with random attributes onto a surface,
+	over a background of cleared cells, including every attribute that
+	resets something. Without clearing, it's drawn over the last frame.
+"""
+def drawRandomFrame(renderer, rnd, count=500, clear=True):
+	fgs = ["", ASCIIGLConstants.Fore.RED, ASCIIGLConstants.Fore.GREEN, ASCIIGLConstants.Fore.RESET,
+	       ASCIIGLColor.palette(200), ASCIIGLColor.rgb(10, 200, 30)]
+	bgs = ["", ASCIIGLConstants.Back.BLACK, ASCIIGLConstants.Back.BLUE, ASCIIGLConstants.Back.RESET,
+	       ASCIIGLColor.palette(17)]
+	styles = ["", ASCIIGLConstants.Style.BRIGHT, ASCIIGLConstants.Style.DIM,
+	          ASCIIGLConstants.Style.NORMAL, ASCIIGLConstants.Style.RESET_ALL]
+	if clear:
+		renderer.clearFramebuffer()
+	for i in range(count):
+		renderer.setTextColor(rnd.choice(fgs))
+		renderer.setBGColor(rnd.choice(bgs))
+		renderer.setTextStyle(rnd.choice(styles))
+		x = rnd.randrange(renderer.sizeX)
+		y = rnd.randrange(renderer.sizeY)
+		#Runs of the same attributes, too.
+		for dx in range(rnd.choice((1, 1, 4))):
+			renderer.character(x + dx, y, rnd.choice("*#@"))
+
+"""
+	Returns the bytes that draw a whole framebuffer one cell at a time,
+	each cell with a reset and the escapes of its background, foreground
+	and style in front of it, in that order, and nothing coalesced. That's
+	what a cell's attributes mean.
+"""
+def perCellFrame(frameBuffer, encoder):
+	pieces = [b"\x1b[1;1H"]
+	for y in range(frameBuffer.sizeY):
+		if y:
+			pieces.append(b"\n")
+		for i in range(y*frameBuffer.sizeX, (y+1)*frameBuffer.sizeX):
+			b, f, s = frameBuffer.bg[i], frameBuffer.fg[i], frameBuffer.style[i]
+			escape = "\x1b[0m" + (encoder.escape(b, 0, 0) if b else "") + (encoder.escape(0, f, 0) if f else "") + (encoder.escape(0, 0, s) if s else "")
+			pieces.append((escape + chr(frameBuffer.glyphs[i])).encode("utf-8"))
+	return b"".join(pieces)
+
+"""
+	Checks that coalescing escapes doesn't change what any cell looks
+	like: every full frame has to show exactly what drawing each cell
+	with its own escapes shows, at every color depth.
+
+	PARAMETERS:
+	frames:	How many random frames to check.
+"""
+def checkCoalescing(frames=30):
+	#Wide enough for the encoder to take its NumPy path, if it can.
+	width, height = 80, 12
+	rnd = random.Random(6)
+	for depth in (ASCIIGLConstants.COLOR_16, ASCIIGLConstants.COLOR_256, ASCIIGLConstants.COLOR_TRUE):
+		renderer = ASCIIGL.ASCIIGL(width, height)
+		renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR_AND_STYLE)
+		encoder = ASCIIGLEncoder.FrameEncoder(depth)
+		out = ASCIIGLEncoder.OutputBuffer()
+		for frame in range(frames):
+			drawRandomFrame(renderer, rnd)
+			encoder.fullFrame(renderer.frameBuffer, out)
+			coalesced = Console(width, height)
+			coalesced.feed(out.getvalue())
+			expected = Console(width, height)
+			expected.feed(perCellFrame(renderer.frameBuffer, encoder))
+			wrong = sum(1 for a, b in zip(coalesced.cells, expected.cells) if a != b)
+			assert wrong == 0, "%d cells look wrong in frame %d at color depth %d" % (wrong, frame, depth)
+	print("coalescing: %d frames at 3 color depths, every cell right" % frames)
+
+"""
+	Checks that delta frames show exactly what full frames do, cleared
+	cells included, whatever the console was left with in between.
+
+	PARAMETERS:
+	frames:	How many random frames to check.
+"""
+def checkDelta(frames=60):
+	width, height = 80, 12
+	rnd = random.Random(1)
+	renderer = ASCIIGL.ASCIIGL(width, height)
+	renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR_AND_STYLE)
+	encoder = ASCIIGLEncoder.FrameEncoder()
+	out = ASCIIGLEncoder.OutputBuffer()
+	lastFrame = ASCIIGLFramebuffer.Framebuffer(width, height, renderer.clearCharacter)
+	screen = Console(width, height)
+	for frame in range(frames):
+		#Mostly small changes, like a show makes, and a fresh frame now and then.
+		drawRandomFrame(renderer, rnd, rnd.choice((5, 20, 500)), frame % 10 == 0)
+		if frame:
+			encoder.deltaFrame(renderer.frameBuffer, lastFrame, out)
+		else:
+			encoder.fullFrame(renderer.frameBuffer, out)
+		#Anything at all could have been printed in between.
+		screen.feed(rnd.choice((b"", b"\x1b[0m", b"\x1b[41;33;1m", b"\x1b[2m")))
+		screen.feed(out.getvalue())
+		encoder.fullFrame(renderer.frameBuffer, out)
+		full = Console(width, height)
+		full.feed(out.getvalue())
+		expected = Console(width, height)
+		expected.feed(perCellFrame(renderer.frameBuffer, encoder))
+		wrong = sum(1 for a, b in zip(screen.cells, expected.cells) if a != b)
+		assert wrong == 0, "%d cells of delta frame %d look wrong" % (wrong, frame)
+		assert full.cells == screen.cells, "delta frame %d doesn't show what the full frame does" % frame
+		lastFrame.copyFrom(renderer.frameBuffer)
+	print("delta: %d frames, every cell the same as in full frames" % frames)
+
+if __name__ == "__main__":
+	checkCoalescing()
+	checkDelta()
@@ -0,0 +1,232 @@
+"""
+	This module holds 256-color and 24-bit RGB colors for ASCIIGL, on
+	top of the 8 Colorama ones.
+
+	---COLOR CODES---
+	The foreground and background planes of a framebuffer hold color
+	codes, which are plain integers:
+	0:					No color.
+	1 to 255:			An index into ASCIIGLFramebuffer.attributeTable,
+						which is how Colorama's escapes are stored.
+	palette(n):			Color n of the xterm 256 color palette.
+	rgb(r, g, b):		A 24-bit RGB color.
+	The kind of code is in the top byte, so a code takes the same 4 bytes
+	of a plane whatever kind it is, and nothing is interned to use one.
+	Anywhere a color can be given, like setTextColor(), either a Colorama
+	escape or one of these codes will do.
+
+	---COLOR DEPTH---
+	Not every console can show every color. Codes are stored as they are
+	given, and only brought down to the color depth of the console when a
+	frame is encoded. (See ASCIIGL.setColorDepth().)
+	RGB colors are brought down to the 256 color palette with a table of
+	every RGB color with 5 bits per channel, 32 KiB, built the first time
+	it's needed. The 256 color palette is brought down to the 16 basic
+	colors with a table of its own. So quantizing a color is a table
+	lookup or two, never a search.
+	detectColorDepth() makes a guess at what the console can do.
+
+	---SGR TABLES---
+	An SGRTable hands the encoder the SGR parameters of a color code, at
+	a color depth. Those of the 256 palette colors are worked out up
+	front, for the foreground and background. RGB colors the console
+	can't show are quantized to one of those. RGB colors it can show
+	would be too many to work out up front, so they're worked out as
+	they're needed, and kept in an LRU cache of at most truecolorLimit
+	of them.
+"""
+
+#For guessing what the console can do.
+import os
+
+#The truecolor cache.
+from collections import OrderedDict
+
+import ASCIIGLConstants
+
+"""
+	The kinds of color code, in the top byte.
+"""
+PALETTE = 1 << 24
+RGB = 2 << 24
+
+"""
+	The RGB values of the 16 basic colors, as xterm shows them.
+"""
+BASIC_COLORS = ((0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+                (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+                (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+                (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255))
+
+"""
+	The levels of each channel in the 6x6x6 color cube of the 256 color
+	palette.
+"""
+CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+"""
+	Returns the code of color n of the xterm 256 color palette.
+"""
+def palette(n):
+	return PALETTE | n
+
+"""
+	Returns the code of a 24-bit RGB color.
+"""
+def rgb(r, g, b):
+	return RGB | (r << 16) | (g << 8) | b
+
+"""
+	Returns the RGB value of color n of the 256 color palette.
+"""
+def paletteRGB(n):
+	if n < 16:
+		return BASIC_COLORS[n]
+	if n < 232:
+		n -= 16
+		return (CUBE_LEVELS[n // 36], CUBE_LEVELS[(n // 6) % 6], CUBE_LEVELS[n % 6])
+	level = 8 + 10*(n - 232)
+	return (level, level, level)
+
+"""
+	Returns the 256 color palette color nearest to an RGB color.
+
+	HOW IT WORKS:
+	We take the nearest color of the color cube, channel by channel, and
+	the nearest of the grays, and whichever is nearer wins.
+"""
+def nearestPaletteColor(r, g, b):
+	def cubeIndex(v):
+		return 0 if v < 48 else 1 if v < 115 else (v - 35) // 40
+	cube = 16 + 36*cubeIndex(r) + 6*cubeIndex(g) + cubeIndex(b)
+	average = (r + g + b) // 3
+	gray = 232 + min(max((average - 3) // 10, 0), 23)
+	def distance(n):
+		pr, pg, pb = paletteRGB(n)
+		return (pr - r)**2 + (pg - g)**2 + (pb - b)**2
+	return cube if distance(cube) <= distance(gray) else gray
+
+"""
+	Returns the basic color nearest to color n of the 256 color palette.
+"""
+def nearestBasicColor(n):
+	if n < 16:
+		return n
+	r, g, b = paletteRGB(n)
+	distances = [(pr - r)**2 + (pg - g)**2 + (pb - b)**2 for pr, pg, pb in BASIC_COLORS]
+	return distances.index(min(distances))
+
+"""
+	Maps each 256 palette color to the nearest basic color.
+"""
+PALETTE_TO_BASIC = bytes(nearestBasicColor(n) for n in range(256))
+
+"""
+	Maps each RGB color, with 5 bits per channel, to the nearest 256
+	palette color. Built by quantizationTable() the first time it's needed.
+"""
+rgbToPalette = None
+
+"""
+	Returns the table that maps RGB colors to 256 palette colors, building
+	it if need be. Index it with rgbIndex().
+"""
+def quantizationTable():
+	global rgbToPalette
+	if rgbToPalette is None:
+		rgbToPalette = bytes(nearestPaletteColor((i >> 10) << 3 | 4, ((i >> 5) & 31) << 3 | 4, (i & 31) << 3 | 4)
+		                     for i in range(32768))
+	return rgbToPalette
+
+"""
+	Returns where an RGB color code is in the quantization table.
+"""
+def rgbIndex(code):
+	return ((code >> 9) & 0x7C00) | ((code >> 6) & 0x3E0) | ((code >> 3) & 0x1F)
+
+"""
+	Returns the color code a color code is brought down to at the given
+	color depth. Colorama escapes are left as they are; they're basic
+	colors already.
+"""
+def quantize(code, depth):
+	if code < PALETTE or depth == ASCIIGLConstants.COLOR_TRUE:
+		return code
+	if code >= RGB:
+		code = PALETTE | quantizationTable()[rgbIndex(code)]
+	if depth == ASCIIGLConstants.COLOR_16:
+		code = PALETTE | PALETTE_TO_BASIC[code & 0xFF]
+	return code
+
+"""
+	Makes a guess at the color depth of the console we're running in,
+	from the environment.
+
+	HOW IT WORKS:
+	Consoles that can show RGB colors mostly say so in COLORTERM, and
+	those that can show 256 colors mostly say so in TERM. The Windows
+	console, through Colorama, only shows the basic colors, unless it's
+	Windows Terminal, which shows them all.
+
+	RETURNS:
+	COLOR_16, COLOR_256 or COLOR_TRUE, from ASCIIGLConstants.
+"""
+def detectColorDepth(environ=None):
+	if environ is None:
+		environ = os.environ
+	if environ.get("COLORTERM", "").lower() in ("truecolor", "24bit") or "WT_SESSION" in environ:
+		return ASCIIGLConstants.COLOR_TRUE
+	if "256color" in environ.get("TERM", ""):
+		return ASCIIGLConstants.COLOR_256
+	return ASCIIGLConstants.COLOR_16
+
+class SGRTable(object):
+
+	"""
+		Works out the SGR parameters of every 256 palette color at the
+		given color depth.
+
+		PARAMETERS:
+		depth:			The color depth, from ASCIIGLConstants.
+		truecolorLimit:	How many RGB colors to keep the parameters of.
+	"""
+	def __init__(self, depth, truecolorLimit=1024):
+		self.depth = depth
+		self.truecolorLimit = truecolorLimit
+		self.truecolor = OrderedDict()
+		if depth != ASCIIGLConstants.COLOR_TRUE:
+			quantizationTable()
+
+		#The parameters of each palette color, as a foreground and as a
+		#background. Basic colors get the short, classic parameters.
+		self.paletteParams = ([], [])
+		for n in range(256):
+			basic = PALETTE_TO_BASIC[n] if depth == ASCIIGLConstants.COLOR_16 else n
+			for background, params in enumerate(self.paletteParams):
+				if basic < 8:
+					params.append(str((40 if background else 30) + basic))
+				elif basic < 16:
+					params.append(str((100 if background else 90) + basic - 8))
+				else:
+					params.append("%d;5;%d" % (48 if background else 38, basic))
+
+	"""
+		Returns the SGR parameters of a palette or RGB color code, as a
+		foreground or background color.
+	"""
+	def params(self, code, background):
+		if code < RGB:
+			return self.paletteParams[background][code & 0xFF]
+		if self.depth != ASCIIGLConstants.COLOR_TRUE:
+			return self.paletteParams[background][rgbToPalette[rgbIndex(code)]]
+		key = (code, background)
+		cache = self.truecolor
+		params = cache.get(key)
+		if params is None:
+			params = "%d;2;%d;%d;%d" % (48 if background else 38, (code >> 16) & 0xFF, (code >> 8) & 0xFF, code & 0xFF)
+			cache[key] = params
+			if len(cache) > self.truecolorLimit:
+				cache.popitem(last=False)
+		else:
+			cache.move_to_end(key)
+		return params
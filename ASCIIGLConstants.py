@@ -10,6 +10,9 @@ init()
 """
 	This module is simply a bunch of constants for
 	ASCIIGL.
+	The lower-case values are the defaults that every new
+	ASCIIGL surface starts out with. Each surface keeps its own
+	copy of them, which is changed through its setters.
 """
 
 """
@@ -63,6 +66,19 @@ EDIT_COLOR_AND_STYLE = 2
 PRESERVE_COLOR = 4
 colorMode = EDIT_COLOR_AND_STYLE
 
+"""
+	The color depth of the console. Colors it can't show are
+	quantized down to the nearest ones it can, when presented.
+	(See ASCIIGLColor.)
+	COLOR_16:	The 8 colors, and their bright versions.
+	COLOR_256:	The xterm 256 color palette.
+	COLOR_TRUE:	24-bit RGB.
+"""
+COLOR_16 = 1
+COLOR_256 = 2
+COLOR_TRUE = 4
+colorDepth = COLOR_TRUE
+
 
 """
 	The color of the text.
@@ -112,4 +128,17 @@ texBlendingMode = TEX_ADDITIVE
 
 	
 
-	
\ No newline at end of file
+	
+"""
+	The presentation mode. How does a finished frame get
+	to the console?
+	PRESENT_FULL:	Reprint the whole framebuffer every frame.
+	PRESENT_DELTA:	Only send the runs of cells that changed since
+					the last presented frame, each preceded by a
+					cursor-positioning escape. If that would cost
+					more bytes than a full redraw, a full redraw
+					is sent instead.
+"""
+PRESENT_FULL	= 1
+PRESENT_DELTA	= 2
+presentMode = PRESENT_DELTA
@@ -0,0 +1,393 @@
+"""
+	This module turns ASCIIGL framebuffers into the bytes that draw them
+	on the console.
+
+	---ATTRIBUTE STATE---
+	A console remembers the last colors and style it was told to use,
+	and applies them to everything printed after. So there's no point
+	telling it the same thing again for every character of a long run of
+	same-colored cells.
+	The encoder keeps track of what the console's current attributes are
+	while it emits a frame, and only emits an SGR escape when a cell's
+	foreground, background or style differs from them. When it does, every
+	component that changed is packed into one escape, e.g. "\\x1b[40;31m"
+	rather than "\\x1b[40m\\x1b[31m".
+	Components are always applied in the order background, foreground,
+	style, just as the old per-cell strings were, so a style that resets
+	everything still wins. After one, we don't know anything about the
+	state, so even a cell with the same attributes gets its escape again.
+
+	---DEFAULTS---
+	A component of 0 means the console's default, not whatever the
+	console happens to have. Otherwise a cleared cell would look like
+	whatever was drawn before it, which is different in a full frame and
+	in a delta frame that skips some cells. So when a cell lacks a color
+	the state has, or has a different style than the state, the escape
+	resets everything first, then sets whatever the cell has. Styles
+	always go through a reset, since they don't undo each other.
+	A cell whose style only resets everything has no attributes at all,
+	so it's encoded just like one that has none.
+
+	The attribute state starts out unknown at the beginning of every frame,
+	so each frame stands on its own no matter what else was printed to the
+	console in between. Even a frame with no attributes at all starts with
+	a reset.
+
+	---COLOR DEPTH---
+	Palette and RGB color codes are brought down to the console's color
+	depth right here, as their escapes are built, by an
+	ASCIIGLColor.SGRTable. So drawing never has to care what the console
+	can show, and a cell costs the same to encode whatever its color is.
+	Built escapes are cached. With RGB colors there could be no end of
+	them, so only the escapeLimit most recently built are kept.
+
+	---BYTES, NOT TEXT---
+	Frames are encoded straight to UTF-8 bytes, never to one big string
+	that would have to be encoded again on its way out. A run's glyphs
+	are turned into bytes in one go, and the stretches of cells between
+	escapes are just sliced out of them. A cell that needs an escape is
+	looked up, escape and glyph together, in a cache of pre-encoded
+	cells, so changing colors every cell only costs a lookup per cell.
+
+	---OUTPUT BUFFERS---
+	Frames are encoded into an OutputBuffer, a bytearray that is kept
+	around and written over from frame to frame. It only ever grows, to
+	the size of the biggest frame so far, so once a show has warmed up,
+	encoding a frame doesn't leave anything new allocated behind.
+"""
+
+#We want a fast path, but we don't want to need it.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import ASCIIGLFramebuffer, ASCIIGLColor, ASCIIGLConstants
+
+#The escape and cell caches, which let go of their oldest first.
+from collections import OrderedDict
+
+"""
+	The attribute state we're in when we don't know what the console has.
+"""
+UNKNOWN = -1
+
+class OutputBuffer(object):
+
+	"""
+		Initializes the buffer with room for the given number of bytes.
+	"""
+	def __init__(self, capacity=65536):
+		self.data = bytearray(capacity)
+		self.view = memoryview(self.data)
+		self.length = 0
+		
+		#How many of the bytes are color and style escapes. The encoder
+		#fills this in once it's done with a frame.
+		self.sgrBytes = 0
+
+	"""
+		Empties the buffer, keeping its memory.
+	"""
+	def reset(self):
+		self.length = 0
+		self.sgrBytes = 0
+
+	"""
+		Appends the given bytes to the buffer.
+
+		HOW IT WORKS:
+		The bytes are copied over the top of what's already there, which
+		never resizes the bytearray. Only if they don't fit do we grow it,
+		by doubling.
+	"""
+	def write(self, piece):
+		end = self.length + len(piece)
+		if end > len(self.data):
+			#A bytearray can't be resized while it's being viewed.
+			self.view.release()
+			self.data.extend(bytes(max(end, 2*len(self.data)) - len(self.data)))
+			self.view = memoryview(self.data)
+		self.data[self.length:end] = piece
+		self.length = end
+
+	"""
+		Returns a view of the bytes in the buffer. It's only good until
+		the buffer is next written to.
+	"""
+	def getvalue(self):
+		return self.view[:self.length]
+
+	def __len__(self):
+		return self.length
+
+class FrameEncoder(object):
+
+	"""
+		Initializes the encoder with an unknown attribute state.
+	"""
+	def __init__(self, depth=ASCIIGLConstants.colorDepth):
+		self.resetState()
+
+		#SGR escapes we've already built, by the components that changed.
+		self.escapeCache = OrderedDict()
+		self.escapeLimit = 4096
+
+		#Cells we've already encoded, escape and all, by the components that
+		#changed and the glyph.
+		self.cellCache = OrderedDict()
+		self.setColorDepth(depth)
+
+	"""
+		Sets the color depth palette and RGB colors are encoded at.
+		(See ASCIIGL.setColorDepth().)
+	"""
+	def setColorDepth(self, depth):
+		self.sgrTable = ASCIIGLColor.SGRTable(depth)
+		self.escapeCache.clear()
+		self.cellCache.clear()
+
+	"""
+		Forgets what attributes the console has.
+	"""
+	def resetState(self):
+		self.fg = UNKNOWN
+		self.bg = UNKNOWN
+		self.style = UNKNOWN
+		
+		#How many bytes of escapes we've emitted since.
+		self.sgrBytes = 0
+
+	"""
+		Returns the SGR parameters of an attribute component, or None if
+		it isn't a plain SGR escape.
+	"""
+	def componentParams(self, code, background):
+		if code < ASCIIGLColor.PALETTE:
+			return ASCIIGLFramebuffer.attributeParams[code]
+		return self.sgrTable.params(code, background)
+
+	"""
+		Returns the escape that applies the given attribute components.
+		A component of 0 is left alone.
+
+		HOW IT WORKS:
+		If every component is a plain SGR escape, their parameters are
+		joined into one escape, after a 0 if everything is reset first.
+		Otherwise the escapes are just glued together, the reset, then
+		background, then foreground, then style.
+		When the cache is full, the oldest escape in it makes room.
+	"""
+	def escape(self, bg, fg, style, reset=False):
+		key = (reset, bg, fg, style)
+		cache = self.escapeCache
+		escape = cache.get(key)
+		if escape is None:
+			params = [self.componentParams(bg, True) if bg else None,
+			          self.componentParams(fg, False) if fg else None,
+			          ASCIIGLFramebuffer.attributeParams[style] if style else None]
+			parts = [(code, param) for code, param in zip(key[1:], params) if code]
+			if all(param is not None for code, param in parts):
+				escape = "\x1b[" + ";".join((["0"] if reset else []) + [param for code, param in parts]) + "m"
+			else:
+				escape = ("\x1b[0m" if reset else "") + "".join(ASCIIGLFramebuffer.attributeTable[code] if code < ASCIIGLColor.PALETTE else "\x1b[%sm" % param
+				                                          for code, param in parts)
+			if len(cache) >= self.escapeLimit:
+				cache.popitem(last=False)
+			cache[key] = escape
+		return escape
+
+	"""
+		Encodes a cell that needs an escape, escape and glyph together, and
+		adds it to the cell cache.
+
+		PARAMETERS:
+		key:	Whether the escape resets everything first, its
+				background, foreground and style components, and the
+				glyph.
+
+		RETURNS:
+		The bytes of the cell, and how many of them are the escape.
+	"""
+	def encodeCell(self, key):
+		cache = self.cellCache
+		escape = self.escape(key[1], key[2], key[3], key[0])
+		cell = ((escape + chr(key[4])).encode("utf-8"), len(escape))
+		if len(cache) >= self.escapeLimit:
+			cache.popitem(last=False)
+		cache[key] = cell
+		return cell
+
+	"""
+		Encodes the cells in [start, end) of the framebuffer into the bytes
+		that draw them, starting from the current attribute state.
+
+		HOW IT WORKS:
+		The glyphs of the run are decoded in one go. If none of the cells
+		have any attributes, that's it, with a reset in front if the
+		state isn't the defaults already.
+		Otherwise we walk the cells, or with NumPy, just the ones that
+		might need an escape (see changedCells()). Whenever a cell has an attribute
+		component that differs from the state, the cells since the last
+		escape are sliced out of the glyphs, and the cell itself comes out
+		of the cell cache, with one escape for all of the components that
+		differ, or a reset and all of the cell's components, as described
+		out front. Then the state is updated.
+		Glyphs that are all ASCII are sliced as bytes. Otherwise they're
+		sliced as text, and each slice is encoded.
+		A style that resets everything leaves the whole state unknown,
+		so the next cell's escape says everything, its style included.
+
+		RETURNS:
+		The bytes for the run.
+	"""
+	def encodeRun(self, frameBuffer, start, end):
+		length = end - start
+		fgRun = frameBuffer.fg[start:end]
+		bgRun = frameBuffer.bg[start:end]
+		styleRun = frameBuffer.style[start:end]
+		glyphRun = frameBuffer.glyphs[start:end]
+		text = glyphRun.tobytes().decode(ASCIIGLFramebuffer.glyphCodec)
+		if fgRun.count(0) == length and bgRun.count(0) == length and styleRun.count(0) == length:
+			if self.fg == 0 and self.bg == 0 and self.style == 0:
+				return text.encode("utf-8")
+			self.fg = self.bg = self.style = 0
+			self.sgrBytes += 4
+			return b"\x1b[0m" + text.encode("utf-8")
+		#Stretches of plain ASCII cells can just be sliced out of the bytes.
+		ascii = text.isascii()
+		if ascii:
+			text = text.encode("ascii")
+
+		resets = ASCIIGLFramebuffer.attributeResets
+		clears = ASCIIGLFramebuffer.attributeClears
+		cellCache = self.cellCache
+		curFg, curBg, curStyle = self.fg, self.bg, self.style
+		sgrBytes = 0
+		pieces = []
+		#Where the cells that don't need an escape start.
+		plain = 0
+		if numpy is not None and length >= 64:
+			cells = self.changedCells(fgRun, bgRun, styleRun)
+		else:
+			cells = zip(range(length), fgRun, bgRun, styleRun)
+		for i, f, b, s in cells:
+			if clears[s]:
+				f = b = s = 0
+			#Does anything the cell doesn't have need taking away?
+			reset = (s != curStyle and curStyle != 0) or (not b and curBg != 0) or (not f and curFg != 0)
+			if reset or (b and b != curBg) or (f and f != curFg) or s != curStyle:
+				if plain < i:
+					pieces.append(text[plain:i] if ascii else text[plain:i].encode("utf-8"))
+				if reset:
+					key = (True, b, f, s, glyphRun[i])
+				else:
+					key = (False, b if b != curBg else 0, f if f != curFg else 0, s if s != curStyle else 0, glyphRun[i])
+				cell = cellCache.get(key)
+				if cell is None:
+					cell = self.encodeCell(key)
+				pieces.append(cell[0])
+				sgrBytes += cell[1]
+				plain = i+1
+				curBg, curFg, curStyle = b, f, s
+				#After a reset that sets things of its own, the next cell has
+				#to say everything again, even if it's another one.
+				if resets[s]:
+					curFg = curBg = curStyle = UNKNOWN
+		if plain < length:
+			pieces.append(text[plain:] if ascii else text[plain:].encode("utf-8"))
+		self.fg, self.bg, self.style = curFg, curBg, curStyle
+		self.sgrBytes += sgrBytes
+		return b"".join(pieces)
+
+	"""
+		Returns the cells of a run that might need an escape, with NumPy,
+		as (index, fg, bg, style) tuples.
+
+		HOW IT WORKS:
+		A cell with the same attributes as the one before it can only
+		need an escape if the one before it reset everything, and then
+		set something of its own. So only the first cell, and cells that
+		differ from the one before them, or follow such a reset, need
+		looking at.
+	"""
+	def changedCells(self, fgRun, bgRun, styleRun):
+		fg = numpy.frombuffer(fgRun, dtype=numpy.uint32)
+		bg = numpy.frombuffer(bgRun, dtype=numpy.uint32)
+		style = numpy.frombuffer(styleRun, dtype=numpy.uint8)
+		resets = numpy.array(ASCIIGLFramebuffer.attributeResets, dtype=bool) & ~numpy.array(ASCIIGLFramebuffer.attributeClears, dtype=bool)
+		changed = numpy.empty(len(fg), dtype=bool)
+		changed[0] = True
+		changed[1:] = (fg[1:] != fg[:-1]) | (bg[1:] != bg[:-1]) | (style[1:] != style[:-1]) | resets[style[:-1]]
+		changed = numpy.flatnonzero(changed)
+		return zip(changed.tolist(), fg[changed].tolist(), bg[changed].tolist(), style[changed].tolist())
+
+	"""
+		Encodes the bytes that redraw the whole framebuffer.
+
+		HOW IT WORKS:
+		We home the cursor, then encode every "scanline" of the framebuffer,
+		with newlines in between.
+
+		PARAMETERS:
+		frameBuffer:	The framebuffer to present.
+		out:			The OutputBuffer to encode into. It is emptied first.
+	"""
+	def fullFrame(self, frameBuffer, out):
+		self.resetState()
+		out.reset()
+		out.write(b"\x1b[1;1H")
+		sizeX = frameBuffer.sizeX
+		for y in range(frameBuffer.sizeY):
+			if y:
+				out.write(b"\n")
+			out.write(self.encodeRun(frameBuffer, y*sizeX, (y+1)*sizeX))
+		out.sgrBytes = self.sgrBytes
+
+	"""
+		Encodes the bytes that turn the last presented frame into
+		the current one.
+
+		HOW IT WORKS:
+		Scanlines that didn't change are skipped outright. For the rest,
+		we walk the cells, gathering runs of changed cells. A run is
+		only broken when the unchanged stretch after it is longer than
+		the cursor-positioning escape we'd need to skip over it.
+		Each run is emitted as a cursor-positioning escape followed by
+		the cells of the run.
+		Moving the cursor doesn't change the console's attributes, so the
+		attribute state carries on from one run to the next.
+
+		PARAMETERS:
+		frameBuffer:	The framebuffer to present.
+		lastFrame:		The framebuffer that was last presented.
+		out:			The OutputBuffer to encode into. It is emptied first.
+	"""
+	def deltaFrame(self, frameBuffer, lastFrame, out):
+		self.resetState()
+		out.reset()
+		sizeX = frameBuffer.sizeX
+		for y in range(frameBuffer.sizeY):
+			rowStart = y*sizeX
+			rowEnd = rowStart + sizeX
+			#Most scanlines don't change at all.
+			if frameBuffer.sameRun(lastFrame, rowStart, rowEnd):
+				continue
+			runStart = -1
+			runEnd = -1
+			for i in range(rowStart, rowEnd):
+				if frameBuffer.sameCell(lastFrame, i):
+					continue
+				#A cursor escape costs about 8 bytes, so small gaps of unchanged
+				#cells are cheaper to just send again.
+				if runStart >= 0 and i - runEnd > 8:
+					out.write(b"\x1b[%d;%dH" % (y+1, runStart-rowStart+1))
+					out.write(self.encodeRun(frameBuffer, runStart, runEnd))
+					runStart = -1
+				if runStart < 0:
+					runStart = i
+				runEnd = i+1
+			if runStart >= 0:
+				out.write(b"\x1b[%d;%dH" % (y+1, runStart-rowStart+1))
+				out.write(self.encodeRun(frameBuffer, runStart, runEnd))
+		out.sgrBytes = self.sgrBytes
@@ -0,0 +1,308 @@
+"""
+	This module is the framebuffer behind an ASCIIGL rendering surface.
+	Instead of a list with one ANSI-prefixed string per cell, the
+	framebuffer is stored as four compact, parallel planes.
+
+	---DATA ORGANISATION---
+	glyphs:	The codepoint of the character in each cell.
+	fg:		The foreground/character color code of each cell.
+	bg:		The background color code of each cell.
+	style:	The index of the character style escape of each cell.
+
+	Every plane is a linear array, sizeX*sizeY long, so cell (x, y) lives
+	at index (y*sizeX)+x in each of them.
+	The attribute planes don't hold escape strings, just small integers.
+	Those integers index attributeTable, which holds each distinct escape
+	string we've ever been asked to draw with. Index 0 is always the
+	empty string, meaning "no attribute".
+	Escape strings are only glued back onto characters at blit time,
+	by ASCIIGLEncoder.
+	The color planes hold color codes. A color code is either one of
+	those indices, or a 256 palette or RGB color. (See ASCIIGLColor.)
+
+	---MEMORY---
+	Each cell costs 4 bytes of codepoint, 4 bytes each of foreground and
+	background color code, and 1 byte of style. That's 13 bytes per cell,
+	flat, no matter how colorful the surface is, even in RGB.
+	The old list of strings cost an 8 byte pointer per cell, plus, for every
+	colored cell, its own string object of around 60 bytes.
+	For a 400x200 LED-wall sized surface (80,000 cells), that is:
+	Planes:				80,000 * 13 = 1,040,000 bytes, about 1016 KiB.
+	List of strings:	80,000 * 68 = 5,440,000 bytes, about 5.2 MiB.
+	ASCIIGL keeps a second framebuffer around as the last presented frame,
+	so double those figures for the whole surface.
+"""
+
+#The planes are arrays, not lists.
+from array import array
+
+#We need to know which way our codepoints are stored to decode them.
+import sys
+
+#So we can pick apart texels.
+import re
+
+"""
+	Every distinct escape string we've been asked to draw with.
+	The attribute planes hold indices into this.
+"""
+attributeTable = [""]
+
+"""
+	Maps an escape string back to its index in attributeTable.
+"""
+attributeIndex = {"": 0}
+
+"""
+	The SGR parameters of each escape in attributeTable, like "31" for
+	Fore.RED, so they can be packed together with others into one escape.
+	None if the escape isn't a plain SGR escape.
+"""
+attributeParams = [""]
+
+"""
+	Whether each escape in attributeTable resets every attribute,
+	like Style.RESET_ALL does.
+"""
+attributeResets = [False]
+
+"""
+	Whether each escape in attributeTable does nothing but reset every
+	attribute, like Style.RESET_ALL, so a cell with it looks just like a
+	cell with no attributes at all.
+"""
+attributeClears = [False]
+
+"""
+	The codec that turns the raw bytes of a run of the glyph plane
+	straight into a string.
+"""
+glyphCodec = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+
+"""
+	Finds the SGR escapes within a texel string.
+"""
+SGR_RE = re.compile("\033\\[((?:\\d|;)*)m")
+
+"""
+	Texels we've already picked apart.
+"""
+texelCache = {}
+
+"""
+	Returns the index in attributeTable of the given escape string,
+	adding it to the table if we've never seen it before.
+
+	PARAMETERS:
+	escape:	The escape string, like ASCIIGLConstants.Fore.RED.
+
+	RETURNS:
+	The attribute index of the escape string.
+
+	RAISES:
+	RuntimeError, if there are more distinct attributes than fit in a plane.
+"""
+def internAttribute(escape):
+	index = attributeIndex.get(escape)
+	if index is None:
+		if len(attributeTable) > 255:
+			raise RuntimeError("Too many distinct attributes to fit in the framebuffer.")
+		index = len(attributeTable)
+		attributeTable.append(escape)
+		attributeIndex[escape] = index
+		match = SGR_RE.fullmatch(escape)
+		params = match.group(1) if match else None
+		attributeParams.append(params)
+		attributeResets.append(params is not None and params.split(";")[0] in ("", "0"))
+		attributeClears.append(params in ("", "0"))
+	return index
+
+"""
+	Returns the color code of a color, for the foreground or background
+	plane. Colorama escapes are interned, and color codes are already
+	color codes.
+
+	PARAMETERS:
+	color:	An escape, like ASCIIGLConstants.Fore.RED, or a color code,
+			like ASCIIGLColor.rgb(255, 128, 0).
+
+	RETURNS:
+	The color code.
+"""
+def internColor(color):
+	if isinstance(color, int):
+		return color
+	return internAttribute(color)
+
+"""
+	Makes attributeTable start with exactly the given escapes, in order,
+	throwing away anything else. Another process's attribute indices
+	then mean the same thing here.
+
+	HOW IT WORKS:
+	If the table already starts with them, the ones it doesn't have yet
+	are added. If it doesn't, it's rebuilt from scratch, and so is
+	everything that holds indices into it, like the texel cache.
+
+	PARAMETERS:
+	table:	The escapes, starting with "".
+"""
+def loadAttributeTable(table):
+	if attributeTable[:len(table)] != table[:len(attributeTable)]:
+		del attributeTable[1:]
+		del attributeParams[1:]
+		del attributeResets[1:]
+		del attributeClears[1:]
+		attributeIndex.clear()
+		attributeIndex[""] = 0
+		texelCache.clear()
+	for escape in table[len(attributeTable):]:
+		internAttribute(escape)
+
+"""
+	Picks apart a texel into its components.
+
+	HOW IT WORKS:
+	Texels are formatted the way Colorama formats things, that is, a bunch of
+	escapes and a character, either as one string or a list of the parts.
+	We go through the SGR escapes, deciding whether each one is a foreground
+	color (30-39, 90-97), a background color (40-49, 100-107), or a style
+	(everything else). Whatever isn't an escape is the character.
+	The result is cached, since textures only ever have a handful of
+	distinct texels.
+
+	PARAMETERS:
+	texel:	The texel, as a string or a list of strings.
+
+	RETURNS:
+	A tuple of (codepoint, fg, bg, style). The codepoint is 0 if the
+	texel didn't have a character.
+"""
+def parseTexel(texel):
+	if not isinstance(texel, str):
+		texel = "".join(texel)
+	parsed = texelCache.get(texel)
+	if parsed is None:
+		fg = bg = style = 0
+		for match in SGR_RE.finditer(texel):
+			escape = match.group(0)
+			code = int((match.group(1).split(";") or ["0"])[0] or 0)
+			if 30 <= code <= 39 or 90 <= code <= 97:
+				fg = internAttribute(escape)
+			elif 40 <= code <= 49 or 100 <= code <= 107:
+				bg = internAttribute(escape)
+			else:
+				style = internAttribute(escape)
+		character = SGR_RE.sub("", texel)
+		parsed = (ord(character[-1]) if character else 0, fg, bg, style)
+		texelCache[texel] = parsed
+	return parsed
+
+"""
+	Returns the texels of a texture picked apart into planes, just like
+	a framebuffer's, so rows of it can be copied straight into one.
+	
+	HOW IT WORKS:
+	The first time we see a texture, we query and pick apart every texel,
+	and keep the planes on the texture. After that they're just handed back.
+	Texels without a character get a space, like they would when applied.
+	
+	PARAMETERS:
+	texture:	The ASCIIGLTexture, or anything else with sizeX, sizeY and
+				getTexel(x, y).
+	
+	RETURNS:
+	A Framebuffer the size of the texture.
+"""
+def texturePlanes(texture):
+	planes = getattr(texture, "planes", None)
+	if planes is None:
+		planes = Framebuffer(texture.sizeX, texture.sizeY, " ")
+		for y in range(texture.sizeY):
+			for x in range(texture.sizeX):
+				glyph, fg, bg, style = parseTexel(texture.getTexel(x, y))
+				index = y*texture.sizeX + x
+				planes.glyphs[index] = glyph or 32
+				planes.fg[index] = fg
+				planes.bg[index] = bg
+				planes.style[index] = style
+		texture.planes = planes
+	return planes
+
+class Framebuffer(object):
+
+	"""
+		Creates the planes of the framebuffer, filled with the given
+		clear character and no attributes.
+
+		PARAMETERS:
+		sizeX:			The X size of the framebuffer.
+		sizeY:			The Y size of the framebuffer.
+		clearCharacter:	The character to fill the framebuffer with.
+	"""
+	def __init__(self, sizeX, sizeY, clearCharacter):
+		self.sizeX = sizeX
+		self.sizeY = sizeY
+		self.size = sizeX * sizeY
+
+		self.glyphs = array("I", [ord(clearCharacter)]) * self.size
+		self.fg = array("I", [0]) * self.size
+		self.bg = array("I", [0]) * self.size
+		self.style = array("B", [0]) * self.size
+
+		#What a cleared framebuffer looks like, kept around so clearing
+		#is just a copy.
+		self.clearCode = ord(clearCharacter)
+		self.clearGlyphs = array("I", self.glyphs)
+		self.clearColors = array("I", self.fg)
+		self.clearStyles = array("B", self.style)
+
+	"""
+		Fills the framebuffer with the clear character, and
+		removes all attributes.
+
+		HOW IT WORKS:
+		Each plane is overwritten in one go from a cleared template, so
+		nothing is allocated unless the clear character changed.
+
+		PARAMETERS:
+		clearCharacter:	The character to fill the framebuffer with.
+	"""
+	def clear(self, clearCharacter):
+		if ord(clearCharacter) != self.clearCode:
+			self.clearCode = ord(clearCharacter)
+			self.clearGlyphs = array("I", [self.clearCode]) * self.size
+		self.glyphs[:] = self.clearGlyphs
+		self.fg[:] = self.clearColors
+		self.bg[:] = self.clearColors
+		self.style[:] = self.clearStyles
+
+	"""
+		Overwrites this framebuffer with the contents of another one
+		of the same size, without allocating anything.
+	"""
+	def copyFrom(self, other):
+		self.glyphs[:] = other.glyphs
+		self.fg[:] = other.fg
+		self.bg[:] = other.bg
+		self.style[:] = other.style
+
+	"""
+		Returns whether the cells in [start, end) are the same in this
+		framebuffer and the other one.
+	"""
+	def sameRun(self, other, start, end):
+		return (self.glyphs[start:end] == other.glyphs[start:end] and
+				self.fg[start:end] == other.fg[start:end] and
+				self.bg[start:end] == other.bg[start:end] and
+				self.style[start:end] == other.style[start:end])
+
+	"""
+		Returns whether cell i is the same in this framebuffer and
+		the other one.
+	"""
+	def sameCell(self, other, i):
+		return (self.glyphs[i] == other.glyphs[i] and
+				self.fg[i] == other.fg[i] and
+				self.bg[i] == other.bg[i] and
+				self.style[i] == other.style[i])
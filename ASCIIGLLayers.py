@@ -0,0 +1,242 @@
+"""
+	This module holds the layers of an ASCIIGL rendering surface, and the
+	compositor that merges them into its framebuffer.
+
+	---LAYERS---
+	A layer is a framebuffer of its own, with a name and a z-order. Layers
+	with a higher z-order are drawn over those with a lower one. A cell of
+	a layer whose glyph is 0 is transparent: whatever is under it shows
+	through. Layers are cleared to that, so only what's drawn into a layer
+	covers anything.
+	A layer is either static or dynamic.
+	Static layers are for things that don't change, like a sign, or a
+	background. A static layer has a draw function, which is called to
+	rasterize it the first time it's composited, and then not again until
+	the layer is invalidated.
+	Dynamic layers are drawn into every frame, with ASCIIGL.setLayer(),
+	and cleared again once they've been composited.
+
+	---COMPOSITING---
+	Compositing happens in blitToScreen(), right before the frame is
+	encoded. The surface's framebuffer always holds the last composite,
+	so only rows that might have changed are composited again: the rows
+	any dynamic layer has something in, now or the frame before, and every
+	row of a static layer that was just rasterized again. Those rows are
+	cleared to the clear character, and then every layer is laid over
+	them in z-order, skipping layers with nothing in them.
+	Laying a layer over the framebuffer only touches the cells that aren't
+	transparent. With NumPy, that's a masked copy. Without it, the cells
+	are picked out with itertools.compress(), which is still done in C.
+
+	---WHICH ROWS---
+	Which rows a layer has something in is kept as a bitmask, bit r for
+	row r, so working out the rows to composite is just a few ORs.
+"""
+
+#We want a fast path, but we don't want to need it.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+#For picking out the cells that aren't transparent, without NumPy.
+import itertools
+
+#Rows are compared as arrays.
+from array import array
+
+import ASCIIGLFramebuffer
+
+class Layer(object):
+
+	"""
+		Creates an empty layer.
+
+		PARAMETERS:
+		name:	The name of the layer.
+		z:		The z-order of the layer. Higher is on top.
+		sizeX:	The X size of the layer.
+		sizeY:	The Y size of the layer.
+		draw:	For a static layer, the function that rasterizes it, called
+				with the rendering surface. None for a dynamic layer.
+	"""
+	def __init__(self, name, z, sizeX, sizeY, draw=None):
+		self.name = name
+		self.z = z
+		self.draw = draw
+		self.frameBuffer = ASCIIGLFramebuffer.Framebuffer(sizeX, sizeY, "\0")
+
+		#Whether a static layer has been rasterized since it was last invalidated.
+		self.valid = False
+
+		#The rows the layer had something in when it was last composited.
+		self.rows = 0
+
+class Compositor(object):
+
+	"""
+		Creates a compositor with no layers.
+
+		PARAMETERS:
+		sizeX:	The X size of the rendering surface.
+		sizeY:	The Y size of the rendering surface.
+	"""
+	def __init__(self, sizeX, sizeY):
+		self.sizeX = sizeX
+		self.sizeY = sizeY
+		self.layers = []
+		self.layersByName = {}
+		self.emptyRow = array("I", [0]) * sizeX
+
+		#Rows that have to be composited next time, whatever the layers say.
+		#All of them, to start with.
+		self.pendingRows = (1 << sizeY) - 1
+
+		#How many rows were composited last time.
+		self.rowsComposited = 0
+
+	"""
+		Adds a layer. (See ASCIIGL.addLayer().)
+
+		RAISES:
+		ValueError, if there already is a layer with that name.
+	"""
+	def addLayer(self, name, z, draw=None):
+		if name in self.layersByName:
+			raise ValueError("There already is a layer named %r." % (name,))
+		layer = Layer(name, z, self.sizeX, self.sizeY, draw)
+		self.layersByName[name] = layer
+		#Layers with the same z-order stay in the order they were added.
+		self.layers.append(layer)
+		self.layers.sort(key=lambda layer: layer.z)
+		return layer
+
+	"""
+		Removes a layer. Whatever it covered gets composited again.
+	"""
+	def removeLayer(self, name):
+		layer = self.layersByName.pop(name)
+		self.layers.remove(layer)
+		self.pendingRows |= layer.rows
+
+	"""
+		Returns the layer with the given name.
+	"""
+	def getLayer(self, name):
+		return self.layersByName[name]
+
+	"""
+		Marks a static layer to be rasterized again next time.
+	"""
+	def invalidate(self, name):
+		self.layersByName[name].valid = False
+
+	"""
+		Marks every static layer to be rasterized again next time.
+	"""
+	def invalidateLayers(self):
+		for layer in self.layers:
+			layer.valid = False
+
+	"""
+		Marks every row to be composited again next time, like when
+		whatever was in the surface's framebuffer was thrown away.
+	"""
+	def invalidateAll(self):
+		self.pendingRows = (1 << self.sizeY) - 1
+
+	"""
+		Returns a bitmask of the rows of a framebuffer that have anything
+		in them, that is, any glyph but 0.
+	"""
+	def contentRows(self, frameBuffer):
+		sizeX = self.sizeX
+		glyphs = frameBuffer.glyphs
+		if numpy is not None:
+			rows = numpy.frombuffer(glyphs, dtype=numpy.uint32).reshape(self.sizeY, sizeX).any(axis=1)
+			return int.from_bytes(numpy.packbits(rows, bitorder="little").tobytes(), "little")
+		emptyRow = self.emptyRow
+		mask = 0
+		for row in range(self.sizeY):
+			if glyphs[row*sizeX:(row+1)*sizeX] != emptyRow:
+				mask |= 1 << row
+		return mask
+
+	"""
+		Composites every layer into the surface's framebuffer, as described
+		out front, and clears the dynamic layers for the next frame.
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface. No layer may be bound.
+	"""
+	def composite(self, renderer):
+		frameBuffer = renderer.frameBuffer
+		if frameBuffer.clearCode != ord(renderer.clearCharacter):
+			frameBuffer.clear(renderer.clearCharacter)
+			self.invalidateAll()
+
+		#Work out which rows might have changed, rasterizing static layers
+		#that need it along the way.
+		dirty = self.pendingRows
+		for layer in self.layers:
+			if layer.draw is not None:
+				if layer.valid:
+					continue
+				layer.frameBuffer.clear("\0")
+				renderer.setLayer(layer.name)
+				layer.draw(renderer)
+				renderer.setLayer(None)
+				layer.valid = True
+			rows = self.contentRows(layer.frameBuffer)
+			dirty |= layer.rows | rows
+			layer.rows = rows
+		self.pendingRows = 0
+
+		#Composite each stretch of dirty rows.
+		self.rowsComposited = 0
+		row = 0
+		while dirty >> row:
+			if not (dirty >> row) & 1:
+				row += 1
+				continue
+			top = row
+			while (dirty >> row) & 1:
+				row += 1
+			self.compositeRows(frameBuffer, top, row)
+			self.rowsComposited += row - top
+
+		for layer in self.layers:
+			if layer.draw is None and layer.rows:
+				layer.frameBuffer.clear("\0")
+
+	"""
+		Clears the rows [top, bottom) of the framebuffer, and lays every
+		layer with anything in them over them, in z-order.
+	"""
+	def compositeRows(self, frameBuffer, top, bottom):
+		start = top * self.sizeX
+		end = bottom * self.sizeX
+		frameBuffer.glyphs[start:end] = frameBuffer.clearGlyphs[start:end]
+		frameBuffer.fg[start:end] = frameBuffer.clearColors[start:end]
+		frameBuffer.bg[start:end] = frameBuffer.clearColors[start:end]
+		frameBuffer.style[start:end] = frameBuffer.clearStyles[start:end]
+
+		rows = ((1 << bottom) - 1) ^ ((1 << top) - 1)
+		for layer in self.layers:
+			if not layer.rows & rows:
+				continue
+			source = layer.frameBuffer
+			if numpy is not None:
+				glyphs = numpy.frombuffer(source.glyphs, dtype=numpy.uint32)[start:end]
+				opaque = glyphs != 0
+				numpy.frombuffer(frameBuffer.glyphs, dtype=numpy.uint32)[start:end][opaque] = glyphs[opaque]
+				for plane, dtype in (("fg", numpy.uint32), ("bg", numpy.uint32), ("style", numpy.uint8)):
+					numpy.frombuffer(getattr(frameBuffer, plane), dtype=dtype)[start:end][opaque] = numpy.frombuffer(getattr(source, plane), dtype=dtype)[start:end][opaque]
+				continue
+			glyphs, fg, bg, style = source.glyphs, source.fg, source.bg, source.style
+			toGlyphs, toFg, toBg, toStyle = frameBuffer.glyphs, frameBuffer.fg, frameBuffer.bg, frameBuffer.style
+			for i in itertools.compress(range(start, end), glyphs[start:end]):
+				toGlyphs[i] = glyphs[i]
+				toFg[i] = fg[i]
+				toBg[i] = bg[i]
+				toStyle[i] = style[i]
@@ -0,0 +1,189 @@
+"""
+	This module holds the output backends an ASCIIGL rendering surface
+	can present its frames to.
+
+	An output backend is anything with these methods:
+	write(data):	Writes the given bytes.
+	flush():		Makes sure everything written so far has gone out.
+	close():		Flushes, and lets go of whatever the backend writes to.
+	ready():		Whether a frame can be written right now without waiting.
+					If not, the surface drops the frame instead.
+
+	Every backend here also counts the bytes written to it in bytesWritten.
+
+	---BACKENDS---
+	TerminalOutput:	The console. The default.
+	MemoryOutput:	Keeps everything in memory, for looking at afterwards.
+	NullOutput:		Throws everything away. Good for measuring how fast
+					frames can be rendered, without a console slowing it down.
+	FileOutput:		Writes everything to a file. Cat the file in a console
+					to watch the show.
+
+	Pass one to ASCIIGL.setOutputBackend(). Or wrap one in an
+	ASCIIGLPresenter.Presenter first, to have it written on a thread
+	of its own.
+"""
+
+#The console is stdout.
+import sys
+
+#Which we write to directly, if we can.
+import os
+
+#On Windows, Colorama might need to see what we write.
+from colorama.ansitowin32 import StreamWrapper
+
+#Output is only a base for the backends.
+from abc import ABC, abstractmethod
+
+"""
+	The base of every output backend. It can't be used on its own: a
+	backend has to say how it writes, by overriding write(). The rest
+	have defaults that suit a backend with nothing to flush or close.
+"""
+class Output(ABC):
+
+	"""
+		Initializes the byte count.
+	"""
+	def __init__(self):
+		self.bytesWritten = 0
+
+	"""
+		Writes the given bytes. Every backend has to override this.
+	"""
+	@abstractmethod
+	def write(self, data):
+		pass
+
+	"""
+		Makes sure everything written so far has gone out.
+	"""
+	def flush(self):
+		pass
+
+	"""
+		Flushes, and lets go of whatever the backend writes to.
+	"""
+	def close(self):
+		self.flush()
+
+	"""
+		Returns whether a frame can be written right now without waiting.
+	"""
+	def ready(self):
+		return True
+
+class TerminalOutput(Output):
+
+	"""
+		Initializes the backend to write to the given text stream.
+
+		HOW IT WORKS:
+		Bytes are written straight to the stream's file descriptor with
+		os.write(), skipping the text layer and its buffers, so a frame
+		goes out in one system call as soon as it's written. If the
+		stream doesn't have a file descriptor, they're written to its
+		underlying binary buffer, and flushed right away. If it doesn't
+		have one of those either, or it's been wrapped by Colorama to
+		convert escapes for a Windows console, the bytes are decoded and
+		written as text instead.
+
+		PARAMETERS:
+		stream:	The text stream of the console. Defaults to whatever
+				sys.stdout is when a frame is written.
+	"""
+	def __init__(self, stream=None):
+		Output.__init__(self)
+		self.stream = stream
+
+	def write(self, data):
+		stream = self.stream or sys.stdout
+		buffer = getattr(stream, "buffer", None)
+		if buffer is None or isinstance(stream, StreamWrapper):
+			stream.write(str(data, "utf-8"))
+			stream.flush()
+		else:
+			#Anything already written as text has to go out first.
+			stream.flush()
+			try:
+				fd = stream.fileno()
+			except (AttributeError, OSError, ValueError):
+				fd = None
+			if fd is None:
+				buffer.write(data)
+				buffer.flush()
+			else:
+				#A console can take less than we gave it.
+				view = memoryview(data)
+				while view:
+					view = view[os.write(fd, view):]
+		self.bytesWritten += len(data)
+
+	def flush(self):
+		stream = self.stream or sys.stdout
+		stream.flush()
+		buffer = getattr(stream, "buffer", None)
+		if buffer is not None:
+			buffer.flush()
+
+class MemoryOutput(Output):
+
+	"""
+		Initializes the backend with nothing in it.
+	"""
+	def __init__(self):
+		Output.__init__(self)
+		self.data = bytearray()
+
+	def write(self, data):
+		self.data += data
+		self.bytesWritten += len(data)
+
+	"""
+		Returns everything written so far.
+	"""
+	def getvalue(self):
+		return bytes(self.data)
+
+	"""
+		Forgets everything written so far.
+	"""
+	def reset(self):
+		del self.data[:]
+
+class NullOutput(Output):
+
+	def write(self, data):
+		self.bytesWritten += len(data)
+
+class FileOutput(Output):
+
+	"""
+		Initializes the backend to write to the given file.
+
+		PARAMETERS:
+		file:	The name of the file to write to, which is created or
+				overwritten, or a file object already opened for writing
+				bytes.
+	"""
+	def __init__(self, file):
+		Output.__init__(self)
+		if isinstance(file, str):
+			self.file = open(file, "wb")
+			self.ownsFile = True
+		else:
+			self.file = file
+			self.ownsFile = False
+
+	def write(self, data):
+		self.file.write(data)
+		self.bytesWritten += len(data)
+
+	def flush(self):
+		self.file.flush()
+
+	def close(self):
+		self.flush()
+		if self.ownsFile:
+			self.file.close()
@@ -0,0 +1,320 @@
+"""
+	This module rasterizes frames for an ASCIIGL rendering surface on a
+	pool of processes. It's for very big surfaces with very many things
+	on them, where one Python process can't draw a frame in time.
+
+	---HOW IT WORKS---
+	The surface is split into horizontal bands, one per worker by default.
+	Instead of drawing straight onto the surface, you draw onto a
+	ParallelRasterizer, which just records what you asked for. Setters
+	are recorded too, and applied to the surface as well, so it always
+	has the render state you'd expect.
+	When the frame is finished, the framebuffer is copied into a block of
+	shared memory laid out just like it (the glyph plane, then the fg, bg
+	and style planes), and every band is handed its share of the recorded
+	commands. A worker draws its commands onto a surface of its own that
+	may only draw into its band (see ASCIIGL.setBand()), starting from
+	what's in shared memory, and then copies its band back there.
+	Finally the bands are copied out of shared memory into the surface's
+	framebuffer, in order, ready to be blitted.
+
+	---WHAT'S A BAND'S SHARE---
+	Commands whose rows we can tell cheaply only go to the bands they
+	cross: rectangles and lines in CULL mode, and, with NumPy, the points
+	of a points() call, which are split up by the band they land in.
+	Everything else, like text, goes to every band, and each worker just
+	culls what isn't in its band.
+
+	---THE SAME RESULT---
+	Each band sees its commands in the order they were recorded, and a
+	band-limited surface draws exactly what an unlimited one would inside
+	the band. So the framebuffer comes out the same as it would have
+	drawing everything in one process, down to the byte.
+	Attribute indices only mean the same thing in every process if the
+	attribute tables match, so every escape a command needs is interned
+	here while recording, and the table is sent along with the commands.
+
+	---LIMITS---
+	Drawing calls return nothing, since they haven't happened yet.
+	Only ASCIIGL's own drawing functions can be recorded; something that
+	writes into the framebuffer planes directly, like a particle system,
+	has to draw onto the surface itself, after finish().
+"""
+
+#We want a fast path, but we don't want to need it.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+#The workers.
+import multiprocessing
+
+#And the framebuffer they share.
+from multiprocessing import shared_memory
+
+import ASCIIGL, ASCIIGLConstants, ASCIIGLFramebuffer
+
+"""
+	The render state members a band's surface has to start a frame with.
+"""
+RENDER_STATE = ("clearCharacter", "flatMode", "borderCornerMode", "shapeFillMode", "cullMode",
+                "textWrapMode", "colorMode", "textColor", "textStyle", "bgColor",
+                "textureMode", "texBlendingMode")
+
+"""
+	Setters, which are applied to the surface as well as recorded.
+"""
+SETTERS = ("setClearChar", "setFlatMode", "setCornerMode", "setTextureMode", "setTextureBlendingMode",
+           "setFillMode", "setTextWrapMode", "setColorMode", "setTextColor", "setTextStyle", "setBGColor")
+
+"""
+	Drawing functions, which are only recorded.
+"""
+DRAWING = ("rect", "simpleRect", "texRect", "line", "texLine", "character", "points",
+           "applyTexel", "text", "clearFramebuffer")
+
+"""
+	The surfaces and shared memory a worker process has set up, kept from
+	frame to frame.
+"""
+workerSurfaces = {}
+workerMemory = {}
+
+"""
+	Returns the (offset, length) in bytes of each plane of a size-cell
+	framebuffer in shared memory, glyphs first.
+"""
+def planeLayout(size):
+	return ((0, 4*size), (4*size, 4*size), (8*size, 4*size), (12*size, size))
+
+"""
+	Copies the rows [top, bottom) of every plane of a framebuffer between
+	it and shared memory.
+
+	PARAMETERS:
+	frameBuffer:	The framebuffer.
+	memory:			The shared memory's buffer.
+	top:			The first row to copy.
+	bottom:			The row after the last one to copy.
+	toMemory:		Which way to copy.
+"""
+def copyRows(frameBuffer, memory, top, bottom, toMemory):
+	sizeX = frameBuffer.sizeX
+	planes = (frameBuffer.glyphs, frameBuffer.fg, frameBuffer.bg, frameBuffer.style)
+	for plane, (offset, length) in zip(planes, planeLayout(frameBuffer.size)):
+		itemSize = plane.itemsize
+		start = top*sizeX*itemSize
+		end = bottom*sizeX*itemSize
+		view = memoryview(plane).cast("B")
+		if toMemory:
+			memory[offset+start:offset+end] = view[start:end]
+		else:
+			view[start:end] = memory[offset+start:offset+end]
+		view.release()
+
+"""
+	Draws one band's share of a frame. This runs in a worker process.
+
+	PARAMETERS:
+	job:	A tuple of the name of the shared memory, the surface size, the
+			band's rows, the render state, the attribute table, and the
+			commands.
+
+	RAISES:
+	RuntimeError, if a command needed an attribute the table didn't have.
+"""
+def rasterizeBand(job):
+	memoryName, sizeX, sizeY, top, bottom, state, table, commands = job
+	ASCIIGLFramebuffer.loadAttributeTable(table)
+
+	memory = workerMemory.get(memoryName)
+	if memory is None:
+		memory = workerMemory[memoryName] = shared_memory.SharedMemory(name=memoryName)
+	key = (sizeX, sizeY, top, bottom)
+	renderer = workerSurfaces.get(key)
+	if renderer is None:
+		renderer = workerSurfaces[key] = ASCIIGL.ASCIIGL(sizeX, sizeY)
+		renderer.setBand(top, bottom)
+	for member, value in zip(RENDER_STATE, state):
+		setattr(renderer, member, value)
+	renderer.updateWriter()
+
+	copyRows(renderer.frameBuffer, memory.buf, top, bottom, False)
+	for name, args in commands:
+		getattr(renderer, name)(*args)
+	copyRows(renderer.frameBuffer, memory.buf, top, bottom, True)
+
+	if len(ASCIIGLFramebuffer.attributeTable) != len(table):
+		raise RuntimeError("A command used an attribute that wasn't interned while recording.")
+
+class ParallelRasterizer(object):
+
+	"""
+		Starts the workers, and sets up the shared framebuffer.
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface to draw onto.
+		workers:	How many worker processes to start.
+		bands:		How many bands to split the surface into. Defaults
+					to one per worker.
+	"""
+	def __init__(self, renderer, workers=4, bands=None):
+		self.renderer = renderer
+		self.workers = workers
+		bands = min(bands or workers, renderer.sizeY)
+		self.bands = [(k*renderer.sizeY // bands, (k+1)*renderer.sizeY // bands) for k in range(bands)]
+
+		#Which band each row is in.
+		self.bandOfRow = []
+		for k, (top, bottom) in enumerate(self.bands):
+			self.bandOfRow.extend([k] * (bottom - top))
+
+		self.memory = shared_memory.SharedMemory(create=True, size=13*renderer.sizeX*renderer.sizeY)
+		self.pool = multiprocessing.Pool(workers)
+
+		#The commands recorded for each band, and the render state the
+		#frame started with.
+		self.commands = [[] for band in self.bands]
+		self.state = None
+
+	def __getattr__(self, name):
+		if name in SETTERS:
+			def setter(*args):
+				self.startFrame()
+				getattr(self.renderer, name)(*args)
+				for commands in self.commands:
+					commands.append((name, args))
+			return setter
+		if name in DRAWING:
+			def drawing(*args):
+				self.startFrame()
+				self.record(name, args)
+			return drawing
+		raise AttributeError(name)
+
+	"""
+		Notes the render state the frame starts with, if this is the
+		first thing recorded for it.
+	"""
+	def startFrame(self):
+		if self.state is None:
+			self.state = tuple(getattr(self.renderer, member) for member in RENDER_STATE)
+
+	"""
+		Records a drawing command for the bands it could touch, interning
+		whatever attributes it'll need along the way.
+	"""
+	def record(self, name, args):
+		renderer = self.renderer
+		rows = None
+		cull = renderer.cullMode == ASCIIGLConstants.CULL
+
+		if name in ("rect", "simpleRect", "texRect"):
+			if name == "simpleRect":
+				ASCIIGLFramebuffer.parseTexel(args[4])
+				ASCIIGLFramebuffer.parseTexel(args[5])
+			elif name == "texRect":
+				ASCIIGLFramebuffer.texturePlanes(args[6])
+			if cull:
+				rows = (args[1], args[1] + args[3])
+		elif name == "line":
+			if cull:
+				startY = renderer.pushToInt(args[1])
+				endY = renderer.pushToInt(args[3])
+				rows = (min(startY, endY), max(startY, endY) + 1)
+		elif name == "texLine":
+			ASCIIGLFramebuffer.texturePlanes(args[6])
+		elif name == "applyTexel":
+			ASCIIGLFramebuffer.parseTexel(args[2])
+		elif name == "points":
+			colors = args[3] if len(args) > 3 else None
+			if isinstance(colors, (str, int)):
+				ASCIIGLFramebuffer.internColor(colors)
+			elif colors is not None:
+				for color in set(colors):
+					ASCIIGLFramebuffer.internColor(color)
+			if numpy is not None:
+				self.splitPoints(*args)
+				return
+
+		for k, (top, bottom) in enumerate(self.bands):
+			if rows is None or (rows[0] < bottom and rows[1] > top):
+				self.commands[k].append((name, args))
+
+	"""
+		Records a points() call, split up by the band each point lands in.
+
+		HOW IT WORKS:
+		Points are flattened and placed just like points() would, all at
+		once with NumPy. Culled points are left out. Then every band gets
+		the points that land in it, still in order.
+	"""
+	def splitPoints(self, xs, ys, chars, colors=None):
+		renderer = self.renderer
+		sizeX = renderer.sizeX
+		sizeY = renderer.sizeY
+		count = min(len(xs), len(ys))
+		flatten = numpy.floor if renderer.flatMode == ASCIIGLConstants.FLAT_FLOOR else numpy.ceil
+		xi = flatten(numpy.asarray(xs[:count], dtype=numpy.float64)).astype(numpy.int64)
+		yi = flatten(numpy.asarray(ys[:count], dtype=numpy.float64)).astype(numpy.int64)
+		if renderer.cullMode == ASCIIGLConstants.CULL:
+			visible = (xi >= 0) & (xi < sizeX) & (yi >= 0) & (yi < sizeY)
+		else:
+			visible = numpy.ones(count, dtype=bool)
+		rows = ((yi*sizeX + xi) % (sizeX*sizeY)) // sizeX
+		bands = numpy.asarray(self.bandOfRow)[rows]
+		xs = numpy.asarray(xs[:count])
+		ys = numpy.asarray(ys[:count])
+		single = isinstance(chars, str) and len(chars) == 1
+		if not single:
+			chars = numpy.asarray(list(chars[:count]), dtype=object)
+		if colors is not None and not isinstance(colors, (str, int)):
+			colors = numpy.asarray(list(colors[:count]), dtype=object)
+		for k in range(len(self.bands)):
+			chosen = numpy.flatnonzero(visible & (bands == k))
+			if not len(chosen):
+				continue
+			bandColors = colors if colors is None or isinstance(colors, (str, int)) else list(colors[chosen])
+			self.commands[k].append(("points", (xs[chosen], ys[chosen], chars if single else list(chars[chosen]), bandColors)))
+
+	"""
+		Draws everything recorded onto the surface's framebuffer, using
+		the workers.
+	"""
+	def finish(self):
+		if self.state is None:
+			return
+		renderer = self.renderer
+		frameBuffer = renderer.frameBuffer
+		memory = self.memory.buf
+		copyRows(frameBuffer, memory, 0, renderer.sizeY, True)
+
+		table = list(ASCIIGLFramebuffer.attributeTable)
+		jobs = [(self.memory.name, renderer.sizeX, renderer.sizeY, top, bottom, self.state, table, commands)
+		        for (top, bottom), commands in zip(self.bands, self.commands)
+		        if any(name in DRAWING for name, args in commands)]
+		self.pool.map(rasterizeBand, jobs)
+
+		#Merge the bands back in, in order.
+		for top, bottom in self.bands:
+			copyRows(frameBuffer, memory, top, bottom, False)
+
+		self.commands = [[] for band in self.bands]
+		self.state = None
+
+	"""
+		Finishes the frame, and blits it. (See ASCIIGL.blitToScreen().)
+	"""
+	def blitToScreen(self, reallyClear):
+		self.finish()
+		self.renderer.blitToScreen(reallyClear)
+
+	"""
+		Stops the workers, and lets go of the shared framebuffer.
+	"""
+	def close(self):
+		self.pool.close()
+		self.pool.join()
+		self.memory.close()
+		self.memory.unlink()
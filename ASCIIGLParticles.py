@@ -0,0 +1,472 @@
+"""
+	This module is a particle system for ASCIIGL rendering surfaces.
+	Rather than each particle being its own object that moves and draws
+	itself, every particle lives in a set of contiguous arrays, and the
+	whole lot is moved and drawn in one go.
+
+	---DATA ORGANISATION---
+	x, y:		The location of each particle, in caret-space.
+	vx, vy:		How far each particle moves every step.
+	age:		How many steps each particle has lived through.
+	phase:		Where in the character set each particle's glyph starts.
+	color:		The foreground color code of each particle.
+				(See ASCIIGLFramebuffer.)
+	group:		Whatever number the emitter wanted to tag the particle with,
+				so it can count how many of its particles are left.
+
+	Particle i lives at index i of every array. Only the first count
+	entries are live.
+
+	---NUMPY---
+	If NumPy is installed, the arrays are NumPy arrays, and stepping and
+	drawing are a handful of whole-array operations no matter how many
+	particles there are. That's what lets a show run tens of thousands of
+	particles at a time.
+	If it isn't, the arrays are from the standard array module, and we
+	walk them in plain Python. Same results, just slower.
+
+	---UPDATE INTERVAL---
+	With updateInterval set to n, step() only really moves the particles
+	every nth call, n steps at a time. They end up in the same places, but
+	their cells only change every nth frame, which is cheaper to present.
+	(See ASCIIGLQuality.) Particles emitted in between catch up with the
+	rest.
+
+	---SUB-CELL PLOTTING---
+	Instead of drawing a glyph each, particles can be plotted as dots into
+	an ASCIIGLBitplane with plot(), which is culled and retires particles
+	just like drawing is.
+
+	---DENSITY ACCUMULATION---
+	Normally every particle is written into its cell, so wherever several
+	land in the same cell, all but the last are written for nothing. With
+	a density ramp set, with setDensityRamp(), draw() counts how many
+	particles land in each cell instead, in one pass (a bincount over the
+	cell indices, with NumPy), and each cell with any in it is written
+	once, with the glyph the ramp has for that many. So a crowded cell
+	looks crowded, and a frame costs one write per cell, however many
+	particles there are. The ramp can have colors too.
+
+	---RETIREMENT---
+	A particle that gets culled while drawing, or plotting, is retired, and so is one
+	that outlives the lifetime of the system, if it has one. Either way
+	the live particles are packed down to the front of the arrays,
+	keeping their order.
+	Since the arrays only grow, to the most particles that were ever live
+	at once, a show that keeps emitting as many particles as it retires
+	settles down to a flat cost per frame.
+"""
+
+#We want a fast path, but we don't want to need it.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+#The fallback storage.
+from array import array
+
+import ASCIIGLConstants, ASCIIGLFramebuffer
+
+"""
+	The default density ramp, from one particle in a cell to a lot.
+"""
+DENSITY_RAMP = ".:*#@"
+
+class ParticleSystem(object):
+
+	"""
+		Initializes the particle system with room for the given number of
+		particles. It grows if it needs more.
+
+		PARAMETERS:
+		capacity:		How many particles to make room for up front.
+		characterSet:	The characters that particles cycle through as
+						they age.
+		lifetime:		How many steps a particle lives for before it's
+						retired. None means it lives until it's culled.
+	"""
+	def __init__(self, capacity=1024, characterSet="@#", lifetime=None):
+		self.count = 0
+		self.capacity = 0
+		self.characterSet = characterSet
+		self.lifetime = lifetime
+		self.updateInterval = 1
+
+		#Steps asked for that haven't been taken yet.
+		self.pendingSteps = 0
+
+		#The density ramp, if particles are being accumulated.
+		self.rampCodes = None
+		self.rampColors = None
+		self.densityScale = 1
+
+		#The color of the last particle in each cell, while accumulating.
+		self.cellColors = None
+		if numpy is not None:
+			self.charCodes = numpy.array([ord(c) for c in characterSet], dtype=numpy.uint32)
+			self.x = numpy.zeros(0)
+			self.y = numpy.zeros(0)
+			self.vx = numpy.zeros(0)
+			self.vy = numpy.zeros(0)
+			self.age = numpy.zeros(0, dtype=numpy.int64)
+			self.phase = numpy.zeros(0, dtype=numpy.int64)
+			self.color = numpy.zeros(0, dtype=numpy.uint32)
+			self.group = numpy.zeros(0, dtype=numpy.int64)
+		else:
+			self.charCodes = array("I", [ord(c) for c in characterSet])
+			self.x = array("d")
+			self.y = array("d")
+			self.vx = array("d")
+			self.vy = array("d")
+			self.age = array("q")
+			self.phase = array("q")
+			self.color = array("I")
+			self.group = array("q")
+		self.grow(capacity)
+
+	"""
+		Makes room for at least the given number of particles.
+
+		HOW IT WORKS:
+		The capacity is doubled until it fits, and every array is
+		extended to the new capacity.
+	"""
+	def grow(self, capacity):
+		if capacity <= self.capacity:
+			return
+		newCapacity = max(self.capacity, 16)
+		while newCapacity < capacity:
+			newCapacity *= 2
+		extra = newCapacity - self.capacity
+		for name in ("x", "y", "vx", "vy", "age", "phase", "color", "group"):
+			old = getattr(self, name)
+			if numpy is not None:
+				setattr(self, name, numpy.concatenate((old, numpy.zeros(extra, dtype=old.dtype))))
+			else:
+				old.extend(array(old.typecode, [0]) * extra)
+		self.capacity = newCapacity
+
+	"""
+		Emits a burst of particles from the location (x, y).
+
+		PARAMETERS:
+		x:		The X location of the burst.
+		y:		The Y location of the burst.
+		vx:		The X velocities of the particles, one per particle.
+		vy:		The Y velocities of the particles, one per particle.
+		color:	The color of the particles. Use ASCIIGLConstants.Fore, or a
+				color code from ASCIIGLColor.
+		group:	The group to tag the particles with.
+		phase:	Where in the character set the particles' glyphs start.
+	"""
+	def emit(self, x, y, vx, vy, color, group=0, phase=0):
+		amount = len(vx)
+		start = self.count
+		end = start + amount
+		self.grow(end)
+		colorIndex = ASCIIGLFramebuffer.internColor(color)
+		if numpy is not None:
+			self.x[start:end] = x
+			self.y[start:end] = y
+			self.vx[start:end] = vx
+			self.vy[start:end] = vy
+			self.age[start:end] = 0
+			self.phase[start:end] = phase
+			self.color[start:end] = colorIndex
+			self.group[start:end] = group
+		else:
+			for i in range(amount):
+				self.x[start+i] = x
+				self.y[start+i] = y
+				self.vx[start+i] = vx[i]
+				self.vy[start+i] = vy[i]
+				self.age[start+i] = 0
+				self.phase[start+i] = phase
+				self.color[start+i] = colorIndex
+				self.group[start+i] = group
+		self.count = end
+
+	"""
+		Moves every particle along by its velocity, and ages it by a step.
+		Particles that have reached the end of their lifetime are retired.
+		With an updateInterval, the steps are saved up and taken all at
+		once, every updateInterval calls.
+	"""
+	def step(self):
+		self.pendingSteps += 1
+		if self.pendingSteps < self.updateInterval:
+			return
+		steps = self.pendingSteps
+		self.pendingSteps = 0
+		n = self.count
+		if numpy is not None:
+			if steps == 1:
+				self.x[:n] += self.vx[:n]
+				self.y[:n] += self.vy[:n]
+			else:
+				self.x[:n] += self.vx[:n] * steps
+				self.y[:n] += self.vy[:n] * steps
+			self.age[:n] += steps
+		else:
+			x, y, vx, vy, age = self.x, self.y, self.vx, self.vy, self.age
+			for i in range(n):
+				x[i] += vx[i] * steps
+				y[i] += vy[i] * steps
+				age[i] += steps
+		if self.lifetime is not None:
+			self.expire()
+	
+	"""
+		Retires every particle that has lived for the lifetime of the
+		system or longer.
+		
+		RETURNS:
+		How many particles were retired.
+	"""
+	def expire(self):
+		n = self.count
+		if numpy is not None:
+			survivors = numpy.flatnonzero(self.age[:n] < self.lifetime)
+		else:
+			age = self.age
+			survivors = [i for i in range(n) if age[i] < self.lifetime]
+		expired = n - len(survivors)
+		if expired:
+			self.keep(survivors)
+		return expired
+
+	"""
+		Sets the density ramp particles are drawn with, as described out
+		front, or turns accumulation off.
+
+		PARAMETERS:
+		ramp:	The glyphs for one particle in a cell, two, and so on. The
+				last one is for that many or more. None to draw every
+				particle with its own glyph again.
+		colors:	Optional. A text color for each glyph of the ramp. None,
+				or a None in it, leaves cells the color of the last
+				particle drawn into them.
+		scale:	How many particles it takes to go up a step of the ramp.
+	"""
+	def setDensityRamp(self, ramp=DENSITY_RAMP, colors=None, scale=1):
+		if ramp is None:
+			self.rampCodes = None
+			self.rampColors = None
+			return
+		if colors is None:
+			colors = [None] * len(ramp)
+		if len(colors) != len(ramp):
+			raise ValueError("The density ramp has %d glyphs, but %d colors." % (len(ramp), len(colors)))
+		if scale < 1:
+			raise ValueError("The density scale has to be at least 1.")
+		#0 is no color of the ramp's own.
+		rampColors = [0 if color is None else ASCIIGLFramebuffer.internColor(color) for color in colors]
+		if numpy is not None:
+			self.rampCodes = numpy.array([ord(c) for c in ramp], dtype=numpy.uint32)
+			self.rampColors = numpy.array(rampColors, dtype=numpy.uint32)
+		else:
+			self.rampCodes = array("I", [ord(c) for c in ramp])
+			self.rampColors = array("I", rampColors)
+		self.densityScale = int(scale)
+
+	"""
+		Counts the particles in each cell, and picks the glyph and color
+		of each cell with any in it from the density ramp. NumPy only.
+
+		PARAMETERS:
+		index:	The cell of each particle.
+		colors:	The color of each particle.
+		size:	How many cells there are.
+
+		RETURNS:
+		The cells, and the glyph and color of each.
+	"""
+	def accumulate(self, index, colors, size):
+		counts = numpy.bincount(index, minlength=size)
+		cells = numpy.flatnonzero(counts)
+		levels = numpy.minimum((counts[cells] - 1) // self.densityScale, len(self.rampCodes) - 1)
+		#Where particles share a cell, the last one's color wins, just as
+		#it would if they were all drawn.
+		if self.cellColors is None or len(self.cellColors) != size:
+			self.cellColors = numpy.zeros(size, dtype=numpy.uint32)
+		self.cellColors[index] = colors
+		rampColors = self.rampColors[levels]
+		return cells, self.rampCodes[levels], numpy.where(rampColors != 0, rampColors, self.cellColors[cells])
+
+	"""
+		Draws every particle onto the given ASCIIGL rendering surface,
+		and retires the ones that were culled.
+
+		HOW IT WORKS:
+		Locations are flattened, mapped down to 1-D and culled all at
+		once, then the glyphs and attributes of the survivors are
+		scattered into the framebuffer planes.
+		Each particle's glyph is picked from the character set by its
+		age and phase, and its foreground is its own color. The background
+		and style come from the render state of the surface, just as they
+		would for a character() call.
+		With a density ramp, glyphs and colors are per cell instead.
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface to draw onto.
+
+		RETURNS:
+		How many particles were culled.
+	"""
+	def draw(self, renderer):
+		n = self.count
+		if n == 0:
+			return 0
+		frameBuffer = renderer.frameBuffer
+		sizeX = renderer.sizeX
+		size = frameBuffer.size
+		bg, style = renderer.currentAttributes()[1:]
+		keepColor = renderer.colorMode != ASCIIGLConstants.PRESERVE_COLOR
+		cull = renderer.cullMode == ASCIIGLConstants.CULL
+		if numpy is not None:
+			flatten = numpy.floor if renderer.flatMode == ASCIIGLConstants.FLAT_FLOOR else numpy.ceil
+			xi = flatten(self.x[:n]).astype(numpy.int64)
+			yi = flatten(self.y[:n]).astype(numpy.int64)
+			if cull:
+				visible = (xi >= 0) & (xi < sizeX) & (yi >= 0) & (yi < renderer.sizeY)
+				index = (yi*sizeX + xi)[visible]
+			else:
+				visible = None
+				index = (yi*sizeX + xi) % size
+			colors = self.color[:n]
+			if visible is not None:
+				colors = colors[visible]
+			culled = n - len(index)
+			if self.rampCodes is not None:
+				index, codes, colors = self.accumulate(index, colors, size)
+			else:
+				codes = self.charCodes[(self.age[:n] + self.phase[:n]) % len(self.charCodes)]
+				if visible is not None:
+					codes = codes[visible]
+			numpy.frombuffer(frameBuffer.glyphs, dtype=numpy.uint32)[index] = codes
+			numpy.frombuffer(frameBuffer.fg, dtype=numpy.uint32)[index] = colors if keepColor else 0
+			numpy.frombuffer(frameBuffer.bg, dtype=numpy.uint32)[index] = bg
+			numpy.frombuffer(frameBuffer.style, dtype=numpy.uint8)[index] = style
+			if renderer.stats is not None:
+				renderer.stats.cellsWritten += len(index)
+				renderer.stats.cellsCulled += culled
+			if visible is None:
+				return 0
+			if culled:
+				self.keep(numpy.flatnonzero(visible))
+			return culled
+		flatten = renderer.flatten
+		sizeY = renderer.sizeY
+		charCodes = self.charCodes
+		glyphs, fg, bgPlane, stylePlane = frameBuffer.glyphs, frameBuffer.fg, frameBuffer.bg, frameBuffer.style
+		survivors = []
+		accumulating = self.rampCodes is not None
+		#While accumulating, how many particles are in each cell, and the
+		#color of the last one.
+		counts = {}
+		cellColors = {}
+		for i in range(n):
+			xi = flatten(self.x[i])
+			yi = flatten(self.y[i])
+			if cull:
+				if not (0 <= xi < sizeX and 0 <= yi < sizeY):
+					continue
+				index = yi*sizeX + xi
+			else:
+				index = (yi*sizeX + xi) % size
+			survivors.append(i)
+			if accumulating:
+				counts[index] = counts.get(index, 0) + 1
+				cellColors[index] = self.color[i]
+				continue
+			glyphs[index] = charCodes[(self.age[i] + self.phase[i]) % len(charCodes)]
+			fg[index] = self.color[i] if keepColor else 0
+			bgPlane[index] = bg
+			stylePlane[index] = style
+		written = len(survivors)
+		if accumulating:
+			rampCodes, rampColors, scale = self.rampCodes, self.rampColors, self.densityScale
+			top = len(rampCodes) - 1
+			for index, count in counts.items():
+				level = min((count - 1) // scale, top)
+				glyphs[index] = rampCodes[level]
+				fg[index] = (rampColors[level] or cellColors[index]) if keepColor else 0
+				bgPlane[index] = bg
+				stylePlane[index] = style
+			written = len(counts)
+		culled = n - len(survivors)
+		if renderer.stats is not None:
+			renderer.stats.cellsWritten += written
+			renderer.stats.cellsCulled += culled
+		if culled:
+			self.keep(survivors)
+		return culled
+
+	"""
+		Plots every particle into a bitplane, as a dot in its own color,
+		instead of drawing its glyph, and retires the ones that were off
+		it. Particles then move at the bitplane's finer resolution.
+		(See ASCIIGLBitplane.)
+
+		PARAMETERS:
+		bitplane:	The ASCIIGLBitplane.Bitplane to plot into.
+
+		RETURNS:
+		How many particles were culled.
+	"""
+	def plot(self, bitplane):
+		n = self.count
+		if n == 0:
+			return 0
+		sizeX, sizeY = bitplane.sizeX, bitplane.sizeY
+		if numpy is not None:
+			x = self.x[:n]
+			y = self.y[:n]
+			survivors = numpy.flatnonzero((x >= 0) & (x < sizeX) & (y >= 0) & (y < sizeY))
+			bitplane.plot(x[survivors], y[survivors], self.color[survivors])
+		else:
+			x, y = self.x, self.y
+			survivors = [i for i in range(n) if 0 <= x[i] < sizeX and 0 <= y[i] < sizeY]
+			bitplane.plot([x[i] for i in survivors], [y[i] for i in survivors], [self.color[i] for i in survivors])
+		culled = n - len(survivors)
+		if culled:
+			self.keep(survivors)
+		return culled
+
+	"""
+		Keeps only the given particles, packing them down to the front
+		of the arrays in order.
+
+		PARAMETERS:
+		survivors:	The ascending indices of the particles to keep.
+	"""
+	def keep(self, survivors):
+		kept = len(survivors)
+		for name in ("x", "y", "vx", "vy", "age", "phase", "color", "group"):
+			values = getattr(self, name)
+			if numpy is not None:
+				values[:kept] = values[survivors]
+			else:
+				for k in range(kept):
+					values[k] = values[survivors[k]]
+		self.count = kept
+
+	"""
+		Counts the live particles in each group.
+
+		PARAMETERS:
+		groups:	How many groups there are. Groups are numbered
+				from 0.
+
+		RETURNS:
+		A sequence with the number of live particles in each group.
+	"""
+	def groupCounts(self, groups):
+		n = self.count
+		if numpy is not None:
+			return numpy.bincount(self.group[:n], minlength=groups)
+		counts = [0] * groups
+		for i in range(n):
+			counts[self.group[i]] += 1
+		return counts
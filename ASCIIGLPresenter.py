@@ -0,0 +1,140 @@
+"""
+	This module holds the pipelined presenter, an output backend that
+	writes frames to another backend on a thread of its own.
+
+	---WHY---
+	Writing a frame to a slow console blocks until the console has taken
+	it. Without a presenter, the show can't get on with the next frame
+	until then. With one, blitToScreen() just hands the frame over and
+	goes straight back to simulating and drawing, while the writer thread
+	does the waiting.
+
+	---BUFFERS---
+	The presenter has a fixed set of OutputBuffers, three by default:
+	one the writer thread is writing out, and up to two waiting in line
+	behind it. A frame handed to the presenter is copied into a free one
+	and queued. Once the writer thread is done with a buffer, it's free
+	again. Nothing new is allocated per frame.
+
+	---BACKPRESSURE---
+	If the console can't keep up, the buffers fill up. Then ready() is
+	false, and blitToScreen() drops the frame it was about to present,
+	rather than waiting. A dropped frame never becomes the last frame,
+	so the next delta is still worked out against what's actually
+	headed for the console.
+	Anything else written while every buffer is in use, like a clear
+	screen escape, waits for a free buffer instead of being dropped.
+
+	---WHAT YOU CAN SEE---
+	queueDepth():	How many frames are waiting to be written right now.
+	peakDepth:		The most that have ever been waiting at once.
+	framesWritten:	How many writes have gone out to the backend.
+	The frames dropped are counted by the surface, in droppedFrames.
+"""
+
+#The writer gets a thread of its own.
+import threading
+
+#And frames get to it through queues.
+import queue
+
+import ASCIIGLEncoder, ASCIIGLOutput
+
+class Presenter(ASCIIGLOutput.Output):
+
+	"""
+		Starts the writer thread.
+
+		PARAMETERS:
+		backend:	The output backend to write frames to.
+		buffers:	How many frames can be in flight at once, counting
+					the one being written.
+	"""
+	def __init__(self, backend, buffers=3):
+		ASCIIGLOutput.Output.__init__(self)
+		self.backend = backend
+		self.peakDepth = 0
+		self.framesWritten = 0
+
+		#If writing ever fails, this is what went wrong.
+		self.error = None
+
+		self.free = queue.Queue()
+		for i in range(buffers):
+			self.free.put(ASCIIGLEncoder.OutputBuffer())
+		self.pending = queue.Queue()
+
+		self.thread = threading.Thread(target=self.run, name="ASCIIGLPresenter")
+		self.thread.daemon = True
+		self.thread.start()
+
+	"""
+		The writer thread. Writes out queued buffers in order, until it
+		gets a None.
+	"""
+	def run(self):
+		while True:
+			buffer = self.pending.get()
+			if buffer is None:
+				self.pending.task_done()
+				return
+			try:
+				if self.error is None:
+					self.backend.write(buffer.getvalue())
+					self.framesWritten += 1
+			except Exception as error:
+				self.error = error
+			self.free.put(buffer)
+			self.pending.task_done()
+
+	"""
+		Returns whether a frame can be handed over without waiting.
+	"""
+	def ready(self):
+		return not self.free.empty()
+
+	"""
+		Returns how many frames are waiting to be written.
+	"""
+	def queueDepth(self):
+		return self.pending.qsize()
+
+	"""
+		Queues a copy of the given bytes to be written, waiting for a free
+		buffer if there isn't one.
+
+		RAISES:
+		Whatever the backend raised, if an earlier write failed.
+	"""
+	def write(self, data):
+		if self.error is not None:
+			raise self.error
+		buffer = self.free.get()
+		buffer.reset()
+		buffer.write(data)
+		self.pending.put(buffer)
+		self.bytesWritten += len(data)
+		depth = self.pending.qsize()
+		if depth > self.peakDepth:
+			self.peakDepth = depth
+
+	"""
+		Waits until everything queued has been written, then flushes
+		the backend.
+	"""
+	def flush(self):
+		self.pending.join()
+		if self.error is not None:
+			raise self.error
+		self.backend.flush()
+
+	"""
+		Writes out everything queued, stops the writer thread, and closes
+		the backend.
+	"""
+	def close(self):
+		self.pending.put(None)
+		self.thread.join()
+		if self.error is not None:
+			raise self.error
+		self.backend.close()
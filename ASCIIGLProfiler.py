@@ -0,0 +1,171 @@
+"""
+	This module holds the frame profiler for ASCIIGL rendering surfaces.
+	Turn it on with ASCIIGL.setProfiling(True), and the surface's stats
+	member becomes a FrameStats that counts what goes into every frame.
+
+	---WHAT'S COUNTED---
+	CELLS_WRITTEN:	Cells written into the framebuffer.
+	CELLS_CULLED:	Cells that were culled instead. For shapes that are
+					clipped in one go, that's the cells of the shape's
+					bounds that fell off the surface.
+	SGR_BYTES:		Bytes of color and style escapes sent.
+	TOTAL_BYTES:	Bytes sent altogether.
+	SIMULATE:		Seconds spent moving the show along.
+	RASTERIZE:		Seconds spent drawing into the framebuffer.
+	ENCODE:			Seconds spent turning the framebuffer into bytes.
+	WRITE:			Seconds spent writing those bytes out. With a
+					presenter, that's just handing them over.
+	FRAME_TIME:		Seconds from the end of one frame to the end of the next.
+	TEXT_HITS:		Text drawn with a layout that was already cached.
+	TEXT_MISSES:	Text that had to be laid out. (See ASCIIGL.layoutText().)
+
+	The surface times ENCODE and WRITE itself, in blitToScreen(). It can't
+	know what's simulation and what's drawing, though, so the show marks
+	those with begin() and end().
+
+	---HISTORY---
+	Every frame, the counts are stored in a rolling window of the last
+	few frames, and started again from zero. last() gives the figure for
+	the last frame, average() the average over the window, and summary()
+	and drawHUD() a readable rundown of the averages.
+
+	---OVERHEAD---
+	With profiling off, the surface's stats member is None, and the cell
+	writers are the plain ones, so nothing is counted at all. Only with
+	it on does the surface build writers that count as they go.
+"""
+
+#Keeping time.
+import time
+
+#The history is kept in arrays.
+from array import array
+
+"""
+	The things counted for every frame.
+"""
+CELLS_WRITTEN, CELLS_CULLED, SGR_BYTES, TOTAL_BYTES, SIMULATE, RASTERIZE, ENCODE, WRITE, FRAME_TIME, TEXT_HITS, TEXT_MISSES = range(11)
+METRICS = 11
+
+class FrameStats(object):
+
+	"""
+		Initializes the counts.
+
+		PARAMETERS:
+		window:	How many frames to keep in the history.
+	"""
+	def __init__(self, window=60):
+		self.cellsWritten = 0
+		self.cellsCulled = 0
+		self.textLayoutHits = 0
+		self.textLayoutMisses = 0
+		self.phaseTimes = array("d", [0.0]) * METRICS
+		self.phaseStarts = array("d", [0.0]) * METRICS
+
+		#How many frames have been counted so far.
+		self.frames = 0
+		self.window = window
+		self.history = [array("d", [0.0]) * window for metric in range(METRICS)]
+		self.lastFrameEnd = time.perf_counter()
+
+	"""
+		Marks the start of some time spent in the given phase.
+	"""
+	def begin(self, phase):
+		self.phaseStarts[phase] = time.perf_counter()
+
+	"""
+		Marks the end of some time spent in the given phase. A phase can
+		be begun and ended more than once a frame, like when a frame has
+		several simulation steps. The times are added up.
+	"""
+	def end(self, phase):
+		self.phaseTimes[phase] += time.perf_counter() - self.phaseStarts[phase]
+
+	"""
+		Stores the counts of the frame that was just presented in the
+		history, and starts the next one from zero.
+
+		PARAMETERS:
+		totalBytes:	How many bytes the frame cost.
+		sgrBytes:	How many of those were color and style escapes.
+	"""
+	def endFrame(self, totalBytes, sgrBytes):
+		now = time.perf_counter()
+		slot = self.frames % self.window
+		history = self.history
+		history[CELLS_WRITTEN][slot] = self.cellsWritten
+		history[CELLS_CULLED][slot] = self.cellsCulled
+		history[TEXT_HITS][slot] = self.textLayoutHits
+		history[TEXT_MISSES][slot] = self.textLayoutMisses
+		history[SGR_BYTES][slot] = sgrBytes
+		history[TOTAL_BYTES][slot] = totalBytes
+		for phase in (SIMULATE, RASTERIZE, ENCODE, WRITE):
+			history[phase][slot] = self.phaseTimes[phase]
+			self.phaseTimes[phase] = 0.0
+		history[FRAME_TIME][slot] = now - self.lastFrameEnd
+		self.lastFrameEnd = now
+		self.cellsWritten = 0
+		self.cellsCulled = 0
+		self.textLayoutHits = 0
+		self.textLayoutMisses = 0
+		self.frames += 1
+
+	"""
+		Returns the given metric for the last frame.
+	"""
+	def last(self, metric):
+		if not self.frames:
+			return 0.0
+		return self.history[metric][(self.frames - 1) % self.window]
+
+	"""
+		Returns the average of the given metric over the history.
+	"""
+	def average(self, metric):
+		kept = min(self.frames, self.window)
+		if not kept:
+			return 0.0
+		return sum(self.history[metric][:kept]) / kept
+
+	"""
+		Returns the fraction of text drawn over the history whose layout
+		was already cached, or 0 if no text was drawn.
+	"""
+	def textHitRate(self):
+		hits = self.average(TEXT_HITS)
+		total = hits + self.average(TEXT_MISSES)
+		return hits / total if total else 0.0
+	
+	"""
+		Returns a rundown of the averages over the history, as two lines.
+	"""
+	def summary(self):
+		frameTime = self.average(FRAME_TIME)
+		return ("%5.1f fps | sim %.2f ras %.2f enc %.2f wr %.2f ms\n%d cells, %d culled | %d bytes, %d SGR | text %d%% cached" %
+		        (1.0 / frameTime if frameTime else 0.0,
+		         self.average(SIMULATE) * 1000.0, self.average(RASTERIZE) * 1000.0,
+		         self.average(ENCODE) * 1000.0, self.average(WRITE) * 1000.0,
+		         self.average(CELLS_WRITTEN), self.average(CELLS_CULLED),
+		         self.average(TOTAL_BYTES), self.average(SGR_BYTES),
+		         self.textHitRate() * 100.0))
+
+	"""
+		Draws the summary onto the given ASCIIGL rendering surface, with
+		its top left corner at (x, y).
+
+		HOW IT WORKS:
+		The numbers change every frame, so the summary is never the same
+		text twice. Going through text() would miss its layout cache every
+		frame, and push the layouts of text that does repeat out of it.
+		So each line is clipped to the surface and written straight in as
+		one span, with writeGlyphs(), and the cache never sees it.
+	"""
+	def drawHUD(self, renderer, x, y):
+		sizeX = renderer.sizeX
+		for row, line in enumerate(self.summary().split("\n"), y):
+			left = max(x, 0)
+			right = min(x + len(line), sizeX)
+			if renderer.bandTop <= row < renderer.bandBottom and left < right:
+				renderer.writeGlyphs(row*sizeX + left, array("I", [ord(c) for c in line[left-x:right-x]]))
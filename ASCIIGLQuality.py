@@ -0,0 +1,182 @@
+"""
+	This module holds a quality controller for ASCIIGL rendering surfaces,
+	which gives up some of what a show looks like to keep it running at
+	the frame rate it should, when the console, or the link to it, can't
+	keep up.
+	Give a surface one with ASCIIGL.setQualityController().
+
+	---WHAT'S WATCHED---
+	Every frame, the surface tells the controller how long it took to
+	encode the frame and write it out. That's the part of a frame that
+	grows with a slow console: a console that can't draw fast enough
+	blocks the writes, and more colors mean more bytes. A frame that was
+	dropped because the output backend was still busy counts as over
+	budget, however long it took.
+	The times are smoothed, so one slow frame doesn't change anything.
+
+	---LEVELS---
+	FULL:			Everything, as the show set it up.
+	COLOR_16:		Colors are brought down to the 16 basic ones, which
+					have the shortest escapes.
+	NO_COLOR:		No colors or styles at all. (PRESERVE_COLOR)
+	HALF_PARTICLES:	And particles only move every other step, two steps
+					at a time, so half as many of their cells change.
+	Every level includes the ones above it.
+
+	---HYSTERESIS---
+	The controller steps down a level once the smoothed time has been over
+	budget for downAfter frames in a row, and back up once it's been under
+	headroom times the budget for upAfter frames in a row. Stepping up
+	takes a lot longer than stepping down, and there's a gap between the
+	two thresholds, so a show sitting right at its budget doesn't flap
+	between two levels. After every change, the smoothed time starts over,
+	since times from the old level don't say anything about the new one.
+
+	---EVENTS AND COUNTERS---
+	Functions added with addListener() are called with the controller, the
+	old level and the new one whenever the level changes.
+	stepsDown, stepsUp:		How many times the level has changed, each way.
+	framesOverBudget:		How many frames went over budget.
+	framesAtLevel:			How many frames were presented at each level.
+	averageTime:			The smoothed encode and write time, in seconds.
+"""
+
+import ASCIIGLConstants
+
+"""
+	The quality levels, from best to worst.
+"""
+FULL, COLOR_16, NO_COLOR, HALF_PARTICLES = range(4)
+LEVELS = 4
+
+"""
+	The names of the levels, for showing.
+"""
+LEVEL_NAMES = ("full", "16 colors", "no color", "half particles")
+
+class QualityController(object):
+
+	"""
+		Initializes the controller at full quality.
+
+		PARAMETERS:
+		budget:		How many seconds encoding and writing a frame may take.
+		downAfter:	How many frames in a row over budget before stepping down.
+		upAfter:	How many frames in a row with headroom before stepping up.
+		headroom:	The fraction of the budget a frame has to come in under
+					to count towards stepping up.
+		smoothing:	How much of each new frame time goes into the smoothed
+					time, from 0 to 1.
+		maxLevel:	The worst level to step down to.
+	"""
+	def __init__(self, budget, downAfter=5, upAfter=120, headroom=.5, smoothing=.2, maxLevel=HALF_PARTICLES):
+		self.budget = budget
+		self.downAfter = downAfter
+		self.upAfter = upAfter
+		self.headroom = headroom
+		self.smoothing = smoothing
+		self.maxLevel = maxLevel
+		self.level = FULL
+		self.particleSystems = []
+		self.listeners = []
+
+		#What the surface was set up with, to go back to at full quality.
+		self.fullColorDepth = None
+		self.fullColorMode = None
+
+		self.averageTime = None
+		self.overFrames = 0
+		self.underFrames = 0
+
+		self.stepsDown = 0
+		self.stepsUp = 0
+		self.framesOverBudget = 0
+		self.framesAtLevel = [0] * LEVELS
+
+	"""
+		Adds a particle system, whose updates get halved at the
+		HALF_PARTICLES level.
+	"""
+	def addParticleSystem(self, particles):
+		self.particleSystems.append(particles)
+		particles.updateInterval = 2 if self.level >= HALF_PARTICLES else 1
+
+	"""
+		Adds a function to be called with the controller, the old level and
+		the new one, whenever the level changes.
+	"""
+	def addListener(self, listener):
+		self.listeners.append(listener)
+
+	"""
+		Takes in how long a frame took to encode and write, and steps the
+		level down or up if it's time to. This is called by the surface at
+		the end of blitToScreen().
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface.
+		seconds:	How long the frame took to encode and write.
+		dropped:	Whether the frame was dropped instead.
+	"""
+	def frameDone(self, renderer, seconds, dropped=False):
+		self.framesAtLevel[self.level] += 1
+		if self.averageTime is None:
+			self.averageTime = seconds
+		else:
+			self.averageTime += (seconds - self.averageTime) * self.smoothing
+
+		if dropped or self.averageTime > self.budget:
+			self.framesOverBudget += 1
+			self.overFrames += 1
+			self.underFrames = 0
+			if self.overFrames >= self.downAfter and self.level < self.maxLevel:
+				self.setLevel(renderer, self.level + 1)
+		elif self.averageTime < self.budget * self.headroom:
+			self.underFrames += 1
+			self.overFrames = 0
+			if self.underFrames >= self.upAfter and self.level > FULL:
+				self.setLevel(renderer, self.level - 1)
+		else:
+			self.overFrames = 0
+			self.underFrames = 0
+
+	"""
+		Changes the quality level, applying it to the surface and the
+		particle systems, and lets the listeners know.
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface.
+		level:		The level to change to.
+	"""
+	def setLevel(self, renderer, level):
+		oldLevel = self.level
+		if level == oldLevel:
+			return
+		if oldLevel == FULL:
+			self.fullColorDepth = renderer.colorDepth
+			self.fullColorMode = renderer.colorMode
+
+		colorDepth = self.fullColorDepth
+		if level >= COLOR_16:
+			colorDepth = min(colorDepth, ASCIIGLConstants.COLOR_16)
+		if colorDepth != renderer.colorDepth:
+			renderer.setColorDepth(colorDepth)
+
+		colorMode = ASCIIGLConstants.PRESERVE_COLOR if level >= NO_COLOR else self.fullColorMode
+		if colorMode != renderer.colorMode:
+			renderer.setColorMode(colorMode)
+			renderer.invalidateLayers()
+
+		for particles in self.particleSystems:
+			particles.updateInterval = 2 if level >= HALF_PARTICLES else 1
+
+		self.level = level
+		if level > oldLevel:
+			self.stepsDown += 1
+		else:
+			self.stepsUp += 1
+		self.averageTime = None
+		self.overFrames = 0
+		self.underFrames = 0
+		for listener in self.listeners:
+			listener(self, oldLevel, level)
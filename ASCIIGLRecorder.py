@@ -0,0 +1,443 @@
+"""
+	This module records the frames an ASCIIGL rendering surface presents
+	to a file, and plays them back without running whatever drew them.
+	Record a heavy show offline as fast as the CPU allows, then replay it
+	smoothly somewhere else:
+
+	python ASCIIGLRecorder.py show.rec --speed 2
+
+	---RECORDING---
+	Give a surface a Recorder with setRecorder(), and every frame it
+	presents gets recorded. Nothing is kept in memory but the last frame
+	recorded; each frame is compressed and written out as it comes.
+	Every keyframeInterval frames, a keyframe is recorded, which is the
+	whole frame. In between, only the runs of cells that changed since
+	the frame before are.
+
+	---FILE FORMAT---
+	The file starts with a header:
+		8 bytes		b"ASCIIGLR"
+		1 byte		The version, 2.
+		2 x uint16	sizeX, sizeY.
+	Then it's a string of chunks, one per frame:
+		1 byte		b"K" for a keyframe, b"D" for a delta.
+		uint32		How many bytes of compressed record follow.
+	Each keyframe starts a new zlib stream, that every delta up to the
+	next keyframe carries on. Every chunk is flushed, so it decompresses
+	on its own once the chunks before it in the stream have been.
+	Decompressed, a record is:
+		float64		When the frame was presented, in seconds since the
+					first frame.
+		uint16		How many glyphs were added to the glyph dictionary.
+		uint16		How many attributes were added to the attribute
+					dictionary.
+		uint32		How many runs of cells there are.
+		Then the new glyphs, as uint32 codepoints.
+		Then the new attributes, each a uint32. Palette and RGB color
+		codes (see ASCIIGLColor) are just that. Anything less is an
+		escape, and is followed by a uint16 length and that many bytes
+		of UTF-8.
+		Then the runs, each:
+			uint32		The index of the first cell of the run.
+			uint32		How many cells are in the run.
+			uint16 x n	The glyph dictionary index of each cell.
+			uint16 x n	The attribute dictionary index of the fg of each cell.
+			uint16 x n	... of the bg of each cell.
+			uint16 x n	... of the style of each cell.
+	Everything is little-endian.
+	Both dictionaries start out empty at every keyframe, so a player can
+	start at any keyframe without reading what came before. Index 0 of
+	the attribute dictionary is always "no attribute", just like in
+	ASCIIGLFramebuffer.
+
+	---PLAYING BACK---
+	A Player reads a recording a chunk at a time. Opening one skims the
+	chunk headers to find the keyframes, so it can seek to any of them
+	straight away.
+"""
+
+import ASCIIGLFramebuffer, ASCIIGLColor
+
+#Records get compressed.
+import zlib
+
+#And packed.
+import struct
+
+#Cells are packed as arrays.
+from array import array
+
+#For the byte order, and the command line.
+import sys
+
+#For timing frames, recording and playing back.
+import time
+
+MAGIC = b"ASCIIGLR"
+VERSION = 2
+HEADER = struct.Struct("<8sBHH")
+CHUNK = struct.Struct("<cI")
+RECORD = struct.Struct("<dHHI")
+RUN = struct.Struct("<II")
+KEYFRAME = b"K"
+DELTA = b"D"
+
+"""
+	Returns the bytes of an array, little-endian.
+"""
+def littleEndian(values):
+	if sys.byteorder != "little" and values.itemsize > 1:
+		values = array(values.typecode, values)
+		values.byteswap()
+	return values.tobytes()
+
+"""
+	Returns an array of the given type from little-endian bytes.
+"""
+def fromLittleEndian(typecode, data):
+	values = array(typecode)
+	values.frombytes(data)
+	if sys.byteorder != "little" and values.itemsize > 1:
+		values.byteswap()
+	return values
+
+class Recorder(object):
+
+	"""
+		Starts a recording.
+
+		PARAMETERS:
+		file:				The name of the file to record to, which is
+							created or overwritten, or a file object
+							already opened for writing bytes.
+		sizeX:				The X size of the surface being recorded.
+		sizeY:				The Y size of the surface being recorded.
+		keyframeInterval:	How many frames apart keyframes are.
+	"""
+	def __init__(self, file, sizeX, sizeY, keyframeInterval=100):
+		if isinstance(file, str):
+			self.file = open(file, "wb")
+			self.ownsFile = True
+		else:
+			self.file = file
+			self.ownsFile = False
+		self.sizeX = sizeX
+		self.sizeY = sizeY
+		self.keyframeInterval = keyframeInterval
+		self.frames = 0
+
+		#When a frame was presented. By default that's when it was recorded,
+		#but a show that isn't running in real time might want to say so.
+		self.clock = time.perf_counter
+		self.start = None
+
+		#The last frame recorded, to work out what changed.
+		self.last = ASCIIGLFramebuffer.Framebuffer(sizeX, sizeY, " ")
+
+		self.file.write(HEADER.pack(MAGIC, VERSION, sizeX, sizeY))
+
+	"""
+		Starts a new block: a new zlib stream, and empty dictionaries.
+	"""
+	def resetBlock(self):
+		self.compressor = zlib.compressobj()
+		self.glyphIndex = {}
+		#Maps color codes and style indices to dictionary indices. 0 is always 0.
+		self.attributeIndex = {0: 0}
+
+	"""
+		Records a frame.
+
+		PARAMETERS:
+		frameBuffer:	The framebuffer being presented.
+	"""
+	def record(self, frameBuffer):
+		now = self.clock()
+		if self.start is None:
+			self.start = now
+		keyframe = self.frames % self.keyframeInterval == 0
+		if keyframe:
+			self.resetBlock()
+			runs = [(0, frameBuffer.size)]
+		else:
+			runs = self.changedRuns(frameBuffer)
+
+		#Add whatever glyphs and attributes the runs need to the dictionaries.
+		newGlyphs = []
+		newAttributes = []
+		glyphIndex = self.glyphIndex
+		attributeIndex = self.attributeIndex
+		for start, end in runs:
+			for glyph in set(frameBuffer.glyphs[start:end]):
+				if glyph not in glyphIndex:
+					if len(glyphIndex) > 65535:
+						raise RuntimeError("Too many distinct glyphs between two keyframes.")
+					glyphIndex[glyph] = len(glyphIndex)
+					newGlyphs.append(glyph)
+			for plane in (frameBuffer.fg, frameBuffer.bg, frameBuffer.style):
+				for attribute in set(plane[start:end]):
+					if attribute not in attributeIndex:
+						if len(attributeIndex) > 65535:
+							raise RuntimeError("Too many distinct attributes between two keyframes.")
+						attributeIndex[attribute] = len(attributeIndex)
+						newAttributes.append(attribute)
+
+		pieces = [RECORD.pack(now - self.start, len(newGlyphs), len(newAttributes), len(runs)),
+		          littleEndian(array("I", newGlyphs))]
+		for attribute in newAttributes:
+			pieces.append(struct.pack("<I", attribute))
+			if attribute < ASCIIGLColor.PALETTE:
+				escape = ASCIIGLFramebuffer.attributeTable[attribute].encode("utf-8")
+				pieces.append(struct.pack("<H", len(escape)))
+				pieces.append(escape)
+		for start, end in runs:
+			pieces.append(RUN.pack(start, end - start))
+			pieces.append(littleEndian(array("H", [glyphIndex[glyph] for glyph in frameBuffer.glyphs[start:end]])))
+			for plane in (frameBuffer.fg, frameBuffer.bg, frameBuffer.style):
+				pieces.append(littleEndian(array("H", [attributeIndex[attribute] for attribute in plane[start:end]])))
+
+		compressed = self.compressor.compress(b"".join(pieces)) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+		self.file.write(CHUNK.pack(KEYFRAME if keyframe else DELTA, len(compressed)))
+		self.file.write(compressed)
+		self.last.copyFrom(frameBuffer)
+		self.frames += 1
+
+	"""
+		Returns the runs of cells that changed since the last frame
+		recorded, as (start, end) pairs.
+
+		HOW IT WORKS:
+		Scanlines that didn't change are skipped outright. For the rest,
+		we walk the cells, gathering runs of changed ones. A run is only
+		broken by more than a couple of unchanged cells, since each run
+		costs a few bytes of its own.
+	"""
+	def changedRuns(self, frameBuffer):
+		last = self.last
+		sizeX = self.sizeX
+		runs = []
+		for rowStart in range(0, frameBuffer.size, sizeX):
+			rowEnd = rowStart + sizeX
+			if frameBuffer.sameRun(last, rowStart, rowEnd):
+				continue
+			runStart = -1
+			runEnd = -1
+			for i in range(rowStart, rowEnd):
+				if frameBuffer.sameCell(last, i):
+					continue
+				if runStart >= 0 and i - runEnd > 2:
+					runs.append((runStart, runEnd))
+					runStart = -1
+				if runStart < 0:
+					runStart = i
+				runEnd = i+1
+			if runStart >= 0:
+				runs.append((runStart, runEnd))
+		return runs
+
+	"""
+		Finishes the recording.
+	"""
+	def close(self):
+		self.file.flush()
+		if self.ownsFile:
+			self.file.close()
+
+class Player(object):
+
+	"""
+		Opens a recording, and finds its keyframes.
+
+		PARAMETERS:
+		file:	The name of the recording, or a file object opened for
+				reading bytes that can seek.
+
+		RAISES:
+		ValueError, if the file isn't a recording.
+	"""
+	def __init__(self, file):
+		if isinstance(file, str):
+			self.file = open(file, "rb")
+			self.ownsFile = True
+		else:
+			self.file = file
+			self.ownsFile = False
+		magic, version, self.sizeX, self.sizeY = HEADER.unpack(self.file.read(HEADER.size))
+		if magic != MAGIC or version != VERSION:
+			raise ValueError("Not an ASCIIGL recording.")
+
+		#The frame as of the last record read.
+		self.frameBuffer = ASCIIGLFramebuffer.Framebuffer(self.sizeX, self.sizeY, " ")
+
+		#Where each keyframe's chunk starts, and which frame it is.
+		self.keyframeOffsets = []
+		self.keyframeFrames = []
+		self.frameCount = 0
+		offset = self.file.tell()
+		while True:
+			header = self.file.read(CHUNK.size)
+			if len(header) < CHUNK.size:
+				break
+			kind, length = CHUNK.unpack(header)
+			if kind == KEYFRAME:
+				self.keyframeOffsets.append(offset)
+				self.keyframeFrames.append(self.frameCount)
+			self.frameCount += 1
+			offset += CHUNK.size + length
+			self.file.seek(offset)
+		self.seek(0)
+
+	"""
+		Moves to the given keyframe, so it's the next frame read.
+
+		PARAMETERS:
+		keyframe:	Which keyframe, counting from 0.
+
+		RETURNS:
+		The frame number of the keyframe.
+	"""
+	def seek(self, keyframe):
+		self.file.seek(self.keyframeOffsets[keyframe] if self.keyframeOffsets else HEADER.size)
+		self.frame = self.keyframeFrames[keyframe] if self.keyframeFrames else 0
+		self.decompressor = None
+		return self.frame
+
+	"""
+		Moves to the last keyframe at or before the given frame.
+
+		RETURNS:
+		The frame number of the keyframe.
+	"""
+	def seekFrame(self, frame):
+		keyframe = 0
+		while keyframe + 1 < len(self.keyframeFrames) and self.keyframeFrames[keyframe + 1] <= frame:
+			keyframe += 1
+		return self.seek(keyframe)
+
+	"""
+		Reads the next frame into frameBuffer.
+
+		RETURNS:
+		When the frame was presented, in seconds since the first frame,
+		or None if there are no more frames.
+	"""
+	def nextFrame(self):
+		header = self.file.read(CHUNK.size)
+		if len(header) < CHUNK.size:
+			return None
+		kind, length = CHUNK.unpack(header)
+		compressed = self.file.read(length)
+		if len(compressed) < length:
+			return None
+		if kind == KEYFRAME:
+			self.decompressor = zlib.decompressobj()
+			self.glyphs = []
+			#What each attribute dictionary index means here: a color code,
+			#or the index of an interned escape.
+			self.attributes = [0]
+		elif self.decompressor is None:
+			raise ValueError("A delta has to follow a keyframe.")
+		data = self.decompressor.decompress(compressed)
+
+		timestamp, glyphCount, attributeCount, runCount = RECORD.unpack_from(data, 0)
+		offset = RECORD.size
+		self.glyphs.extend(fromLittleEndian("I", data[offset:offset + 4*glyphCount]))
+		offset += 4*glyphCount
+		for i in range(attributeCount):
+			attribute, = struct.unpack_from("<I", data, offset)
+			offset += 4
+			if attribute < ASCIIGLColor.PALETTE:
+				length, = struct.unpack_from("<H", data, offset)
+				offset += 2
+				attribute = ASCIIGLFramebuffer.internAttribute(data[offset:offset + length].decode("utf-8"))
+				offset += length
+			self.attributes.append(attribute)
+
+		frameBuffer = self.frameBuffer
+		glyphs = self.glyphs
+		attributes = self.attributes
+		for i in range(runCount):
+			start, count = RUN.unpack_from(data, offset)
+			offset += RUN.size
+			end = start + count
+			indices = fromLittleEndian("H", data[offset:offset + 2*count])
+			offset += 2*count
+			frameBuffer.glyphs[start:end] = array("I", [glyphs[index] for index in indices])
+			for plane in (frameBuffer.fg, frameBuffer.bg, frameBuffer.style):
+				indices = fromLittleEndian("H", data[offset:offset + 2*count])
+				plane[start:end] = array(plane.typecode, [attributes[index] for index in indices])
+				offset += 2*count
+		self.frame += 1
+		return timestamp
+
+	"""
+		Plays the recording back on the given ASCIIGL rendering surface,
+		from wherever the player is up to.
+
+		HOW IT WORKS:
+		Each frame is read, copied into the surface's framebuffer, and
+		blitted. Between frames, we sleep until it's time for the next
+		one, going by the recorded times.
+
+		PARAMETERS:
+		renderer:	The ASCIIGL rendering surface to play back on. It has to
+					be the size of the recording.
+		speed:		How many times faster than recorded to play back. 0
+					plays back as fast as possible.
+
+		RETURNS:
+		How many frames were played.
+	"""
+	def play(self, renderer, speed=1.0):
+		played = 0
+		startTime = None
+		startClock = time.perf_counter()
+		while True:
+			timestamp = self.nextFrame()
+			if timestamp is None:
+				return played
+			if startTime is None:
+				startTime = timestamp
+			if speed:
+				wait = (timestamp - startTime) / speed - (time.perf_counter() - startClock)
+				if wait > 0:
+					time.sleep(wait)
+			renderer.frameBuffer.copyFrom(self.frameBuffer)
+			renderer.blitToScreen(True)
+			played += 1
+
+	"""
+		Closes the recording.
+	"""
+	def close(self):
+		if self.ownsFile:
+			self.file.close()
+
+"""
+	Plays a recording back in the console.
+"""
+def main(argv=None):
+	import argparse
+	import ASCIIGL
+	parser = argparse.ArgumentParser(description="Plays back an ASCIIGL recording.")
+	parser.add_argument("recording", help="The recording to play.")
+	parser.add_argument("--speed", type=float, default=1.0,
+	                    help="How many times faster than recorded to play back. 0 is as fast as possible.")
+	parser.add_argument("--keyframe", type=int, default=0,
+	                    help="The keyframe to start playing from.")
+	arguments = parser.parse_args(argv)
+
+	player = Player(arguments.recording)
+	player.seek(arguments.keyframe)
+	renderer = ASCIIGL.ASCIIGL(player.sizeX, player.sizeY)
+	renderer.clearScreen()
+	try:
+		player.play(renderer, arguments.speed)
+	except KeyboardInterrupt:
+		pass
+	renderer.resetAppearance()
+	renderer.clearScreen()
+	player.close()
+
+if __name__ == "__main__":
+	main()
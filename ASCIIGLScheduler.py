@@ -0,0 +1,123 @@
+"""
+	This module holds a scheduler that runs a show's simulation at a
+	fixed timestep, and renders it at a target frame rate.
+
+	---HOW IT WORKS---
+	The simulation is stepped on a fixed clock: stepRate steps every
+	second, no matter how long rendering takes. So a slow frame doesn't
+	slow the show down, it just makes it choppier.
+	Rendering happens on a clock of its own, targetFPS times a second.
+	If rendering falls behind, the frames it missed are skipped and
+	counted, but the simulation steps that were due are all still run,
+	to catch up. To keep a show whose simulation can't keep up from never
+	rendering at all, at most maxCatchUp steps run between two renders.
+
+	When there's nothing due, the scheduler sleeps until the next step or
+	frame is. time.sleep() can oversleep by a good millisecond or more,
+	(much more, on Windows), so it sleeps until spinMargin seconds before
+	the deadline, then waits out the rest in a loop.
+
+	If targetFPS is 0, the scheduler doesn't keep time at all. Every step
+	is rendered, straight after the last, as fast as things go. That's
+	for measuring throughput.
+
+	---WHAT YOU CAN SEE---
+	steps:			How many simulation steps have been run.
+	frames:			How many frames have been rendered.
+	skippedFrames:	How many frames were due, but skipped.
+	elapsed:		How many seconds the show has run for.
+	achievedFPS():	How many frames were rendered per second.
+"""
+
+#Keeping time.
+import time
+
+class Scheduler(object):
+
+	"""
+		Initializes the scheduler.
+
+		PARAMETERS:
+		stepRate:	How many simulation steps to run per second.
+		targetFPS:	How many frames to render per second, or 0 to render
+					every step as fast as possible.
+		maxCatchUp:	The most simulation steps to run between two renders.
+		spinMargin:	How many seconds before a deadline to stop sleeping
+					and start spinning.
+	"""
+	def __init__(self, stepRate=100.0, targetFPS=60.0, maxCatchUp=5, spinMargin=.002):
+		self.stepTime = 1.0 / stepRate
+		self.frameTime = 1.0 / targetFPS if targetFPS else 0.0
+		self.maxCatchUp = maxCatchUp
+		self.spinMargin = spinMargin
+		self.steps = 0
+		self.frames = 0
+		self.skippedFrames = 0
+		self.elapsed = 0.0
+
+	"""
+		Runs the show until the given number of simulation steps have
+		been run in total. It can be called again to carry on, say after
+		a KeyboardInterrupt.
+
+		PARAMETERS:
+		simulate:	Called with no arguments to run one simulation step.
+		render:		Called with no arguments to render a frame.
+		steps:		How many simulation steps to stop after.
+	"""
+	def run(self, simulate, render, steps):
+		clock = time.perf_counter
+		start = clock()
+		try:
+			if not self.frameTime:
+				while self.steps < steps:
+					simulate()
+					self.steps += 1
+					render()
+					self.frames += 1
+				return
+
+			nextStep = start
+			nextFrame = start
+			while self.steps < steps:
+				now = clock()
+
+				#Every step that's due gets run, however far behind we are.
+				caughtUp = 0
+				while nextStep <= now and self.steps < steps and caughtUp < self.maxCatchUp:
+					simulate()
+					self.steps += 1
+					caughtUp += 1
+					nextStep += self.stepTime
+
+				now = clock()
+				if now >= nextFrame:
+					#Frames we're too late for are skipped, not rendered late.
+					missed = int((now - nextFrame) / self.frameTime)
+					self.skippedFrames += missed
+					nextFrame += missed * self.frameTime
+					render()
+					self.frames += 1
+					nextFrame += self.frameTime
+
+				self.waitUntil(min(nextStep, nextFrame))
+		finally:
+			self.elapsed += clock() - start
+
+	"""
+		Sleeps until the given time on the perf_counter() clock, spinning
+		for the last spinMargin seconds.
+	"""
+	def waitUntil(self, deadline):
+		clock = time.perf_counter
+		remaining = deadline - clock()
+		if remaining > self.spinMargin:
+			time.sleep(remaining - self.spinMargin)
+		while clock() < deadline:
+			pass
+
+	"""
+		Returns how many frames were rendered per second.
+	"""
+	def achievedFPS(self):
+		return self.frames / self.elapsed if self.elapsed else 0.0
@@ -1,10 +1,11 @@
 
+import os
 import re
 import sys
 
 from .ansi import AnsiFore, AnsiBack, AnsiStyle, Style
 from .winterm import WinTerm, WinColor, WinStyle
-from .win32 import windll
+from .win32 import windll, EnableVirtualTerminalProcessing
 
 
 if windll is not None:
@@ -15,6 +16,44 @@ def is_a_tty(stream):
     return hasattr(stream, 'isatty') and stream.isatty()
 
 
+# the streams whose consoles have been asked to handle ANSI sequences
+# themselves, and said yes
+vt_streams = []
+
+
+def enable_vt_processing(stream, stream_id):
+    '''
+    Asks the Windows 10+ console behind the given stream, STDOUT or STDERR,
+    to handle ANSI sequences itself. This changes the console's mode, so
+    init() does it once, for the real stdout and stderr only.
+    '''
+    if windll is None or not is_a_tty(stream):
+        return False
+    if EnableVirtualTerminalProcessing(stream_id):
+        vt_streams.append(stream)
+        return True
+    return False
+
+
+def handles_ansi(stream):
+    '''
+    True if whatever the stream writes to understands ANSI sequences as they
+    are, so there's nothing for us to strip or convert. That's everything
+    but Windows, and on Windows, terminals that say they do (ANSICON,
+    Windows Terminal, and the likes of mintty, which set TERM), and Windows
+    10 consoles that enable_vt_processing() has been through. Redirected
+    streams on Windows aren't terminals at all, so they're stripped as
+    they always were.
+    '''
+    if not sys.platform.startswith('win'):
+        return True
+    if not is_a_tty(stream):
+        return False
+    if 'ANSICON' in os.environ or 'WT_SESSION' in os.environ or 'TERM' in os.environ:
+        return True
+    return any(vt_stream is stream for vt_stream in vt_streams)
+
+
 class StreamWrapper(object):
     '''
     Wraps a stream (such as stdout), acting as a transparent proxy for all
@@ -54,14 +93,18 @@ class AnsiToWin32(object):
 
         on_windows = sys.platform.startswith('win')
 
+        # can the stream take ANSI sequences as they are? If so, there's no
+        # need to wrap it at all, unless asked to.
+        native_ansi = handles_ansi(wrapped)
+
         # should we strip ANSI sequences from our output?
         if strip is None:
-            strip = on_windows
+            strip = on_windows and not native_ansi
         self.strip = strip
 
         # should we should convert ANSI sequences into win32 calls?
         if convert is None:
-            convert = on_windows and is_a_tty(wrapped)
+            convert = on_windows and not native_ansi and is_a_tty(wrapped)
         self.convert = convert
 
         # dict of ansi codes to win32 functions and parameters
@@ -133,6 +176,11 @@ class AnsiToWin32(object):
         sequences from the text, and optionally converting them into win32
         calls.
         '''
+        # most writes don't have any sequences in them at all, and finding
+        # that out doesn't need the regex.
+        if '\033' not in text:
+            self.write_plain_text(text, 0, len(text))
+            return
         cursor = 0
         for match in self.ANSI_RE.finditer(text):
             start, end = match.span()
@@ -1,7 +1,8 @@
 import atexit
 import sys
 
-from .ansitowin32 import AnsiToWin32
+from .ansitowin32 import AnsiToWin32, enable_vt_processing
+from .win32 import STDOUT, STDERR
 
 
 orig_stdout = sys.stdout
@@ -12,6 +13,8 @@ wrapped_stderr = sys.stderr
 
 atexit_done = False
 
+vt_done = False
+
 
 def reset_all():
     AnsiToWin32(orig_stdout).reset_all()
@@ -22,6 +25,14 @@ def init(autoreset=False, convert=None, strip=None, wrap=True):
     if not wrap and any([autoreset, convert, strip]):
         raise ValueError('wrap=False conflicts with any other arg=True')
 
+    # only ever change the consoles' mode once, and only for the real
+    # stdout and stderr
+    global vt_done
+    if not vt_done:
+        enable_vt_processing(orig_stdout, STDOUT)
+        enable_vt_processing(orig_stderr, STDERR)
+        vt_done = True
+
     global wrapped_stdout, wrapped_stderr
     sys.stdout = wrapped_stdout = \
         wrap_stream(orig_stdout, convert, strip, autoreset, wrap)
@@ -3,11 +3,15 @@
 STDOUT = -11
 STDERR = -12
 
+# from wincon.h
+ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
+
 try:
     from ctypes import windll
 except ImportError:
     windll = None
     SetConsoleTextAttribute = lambda *_: None
+    EnableVirtualTerminalProcessing = lambda *_: False
 else:
     from ctypes import (
         byref, Structure, c_char, c_short, c_uint32, c_ushort
@@ -70,6 +74,19 @@ else:
         return windll.kernel32.SetConsoleTextAttribute(handle, attrs)
 
 
+    def EnableVirtualTerminalProcessing(stream_id):
+        ''' Asks the console to handle ANSI sequences itself, as Windows 10
+        and later can. Returns True if it will. '''
+        handle = handles[stream_id]
+        mode = DWORD(0)
+        if not windll.kernel32.GetConsoleMode(handle, byref(mode)):
+            return False
+        if mode.value & ENABLE_VIRTUAL_TERMINAL_PROCESSING:
+            return True
+        return bool(windll.kernel32.SetConsoleMode(
+            handle, mode.value | ENABLE_VIRTUAL_TERMINAL_PROCESSING))
+
+
     def SetConsoleCursorPosition(stream_id, position):
         position = COORD(*position)
         # If the position is out of range, do nothing.
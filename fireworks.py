@@ -1,4 +1,4 @@
-import ASCIIGL, ASCIIGLConstants, random, time, os, sys
+import ASCIIGL, ASCIIGLConstants, ASCIIGLColor, ASCIIGLParticles, ASCIIGLBitplane, ASCIIGLOutput, ASCIIGLPresenter, ASCIIGLScheduler, ASCIIGLProfiler, ASCIIGLQuality, ASCIIGLRecorder, random, sys, argparse
 
 width = 100
 
@@ -8,6 +8,12 @@ height = 60
 riseSpeed = 2
 particleSpeed = 3
 
+#How many steps a particle lives for.
+particleLifetime = 40
+
+#How many fireworks to make up front.
+fireworkPoolSize = 32
+
 frameCount = 0
 maxFrameCount = 400
 
@@ -18,47 +24,32 @@ class PDir(object):
 class FWState(object):
 	rise, explode = range(2)
 
-class Particle(object):
-	
-	x = 0
-	y = 0
-	dir = PDir.U
-	characterSet = ["@", "#"]
-	frames = 0
-	offScreen = False
-	
-	def __init__(self, x, y, direction):
-		self.x = x
-		self.y = y
-		self.dir = direction
-	
-	def handle(self, renderer):
-		offScreen = renderer.character(self.x, self.y, self.characterSet[self.frames%2])
-		self.frames = self.frames+1
-		if self.dir == PDir.U:	
-			self.y-=1*particleSpeed
-		elif self.dir == PDir.D:	
-			self.y+=1*particleSpeed
-		elif self.dir == PDir.L:	
-			self.x-=1*particleSpeed
-		elif self.dir == PDir.R:	
-			self.x+=1*particleSpeed
-		elif self.dir == PDir.UL:	
-			self.y-=.25*particleSpeed
-			self.x-=.25*particleSpeed
-		elif self.dir == PDir.UR:	
-			self.y-=.25*particleSpeed 
-			self.x+=.25*particleSpeed
-		elif self.dir == PDir.DL:	
-			self.y+=.25*particleSpeed 
-			self.x-=.25*particleSpeed
-		elif self.dir == PDir.DR:	
-			self.y+=.25*particleSpeed 
-			self.x+=.25*particleSpeed
+"""
+	How far a particle moves each step in each PDir direction.
+"""
+burstVX = [0, 0, -1, 1, -.25, .25, -.25, .25]
+burstVY = [-1, 1, 0, 0, -.25, -.25, .25, .25]
+burstVX = [v*particleSpeed for v in burstVX]
+burstVY = [v*particleSpeed for v in burstVY]
 
 class Firework(object):
 	
-	def __init__(self, x, color, explodeHeight):
+	__slots__ = ("ox", "cx", "oy", "cy", "color", "explodeHeight", "state", "group", "done")
+	
+	"""
+		Makes a firework that isn't in the show yet. Its group is
+		its own for good, and is reused every time it's launched.
+	"""
+	def __init__(self, group):
+		self.group = group
+		self.launch(0, None, 0)
+		self.done = True
+	
+	"""
+		Sets the firework up to rise from the bottom at x, and explode
+		at explodeHeight.
+	"""
+	def launch(self, x, color, explodeHeight):
 		self.ox = x
 		self.cx = x
 		self.oy = height
@@ -66,28 +57,49 @@ class Firework(object):
 		self.color = color
 		self.explodeHeight = explodeHeight
 		self.state = FWState.rise
-		self.particleList = []
 		self.done = False
 	
-	def handle(self, renderer):
+	def draw(self, renderer):
 	
-		if self.state == FWState.explode:
-			self.done = True
-			renderer.setTextColor(self.color)
-			for i in range(len(self.particleList)):
-				if not self.particleList[i].offScreen:
-					self.done = False
-					self.particleList[i].handle(renderer)
-		else:
+		#Once exploded, our particles are drawn by the particle system.
+		if self.state == FWState.rise:
 			renderer.setTextColor(ASCIIGLConstants.Fore.WHITE)
 			renderer.line(self.cx, self.cy, self.ox, self.oy, ":")
+	
+	def step(self, particles):
+		if self.state == FWState.rise:
 			self.cy -= riseSpeed
 			self.oy -= riseSpeed/2
-			if(self.cy <= self.explodeHeight and self.state == FWState.rise):
+			if(self.cy <= self.explodeHeight):
 				self.state = FWState.explode
-				for i in range(8):
-					#Sneaky sneaky...
-					self.particleList.append(Particle(self.cx, self.cy, i))
+				#Sneaky sneaky...
+				particles.emit(self.cx, self.cy, burstVX, burstVY, self.color, self.group)
+
+"""
+	Fireworks made up front, so the show doesn't make new ones as it goes.
+	Each one has its own particle group, so groups get reused along with
+	the fireworks, and there are only ever as many as there are fireworks.
+"""
+class FireworkPool(object):
+	
+	def __init__(self, capacity):
+		self.fireworks = [Firework(group) for group in range(capacity)]
+		self.free = self.fireworks[::-1]
+	
+	"""
+		Hands out a free firework, making a new one if they're all in use.
+	"""
+	def acquire(self):
+		if not self.free:
+			self.fireworks.append(Firework(len(self.fireworks)))
+			return self.fireworks[-1]
+		return self.free.pop()
+	
+	"""
+		Takes a firework back once it's done.
+	"""
+	def release(self, firework):
+		self.free.append(firework)
 
 class Sign(object):
 	
@@ -105,53 +117,213 @@ class Fireworks(object):
 	fireworkList = []
 	sign = Sign()
 	
+	#Every particle of every firework lives in here.
+	particles = ASCIIGLParticles.ParticleSystem(lifetime=particleLifetime)
+	
+	#Where fireworks come from, and go back to.
+	pool = FireworkPool(fireworkPoolSize)
+	
+	#If the particles are plotted as dots, what they're plotted into.
+	bitplane = None
+	
 	renderer = ASCIIGL.ASCIIGL(width, height)
 	renderer.setColorMode(ASCIIGLConstants.EDIT_COLOR)
 	renderer.setBGColor(ASCIIGLConstants.Back.BLACK)
 	renderer.setTextStyle(ASCIIGLConstants.Style.BRIGHT)
 	
+	#The show moves every frame, and the HUD goes over it, but the sign
+	#never changes, so it's only drawn once.
+	renderer.addLayer("show", 0)
+	renderer.addLayer("sign", 1, sign.handle)
+	renderer.addLayer("hud", 2)
+	
 	colorList = [ASCIIGLConstants.Fore.RED    ,
 	             ASCIIGLConstants.Fore.GREEN  ,
 	             ASCIIGLConstants.Fore.YELLOW ,
 	             ASCIIGLConstants.Fore.BLUE   ,
 	             ASCIIGLConstants.Fore.MAGENTA,
 	             ASCIIGLConstants.Fore.CYAN,
-				 ASCIIGLConstants.Fore.WHITE]
+				 ASCIIGLConstants.Fore.WHITE,
+	             #Consoles that can't show these get the nearest color they can.
+	             ASCIIGLColor.rgb(255, 140, 0),
+	             ASCIIGLColor.rgb(255, 105, 180),
+	             ASCIIGLColor.rgb(255, 215, 0),
+	             ASCIIGLColor.rgb(148, 0, 211)]
 	
 	
-	def handle(self):
-		for i in range(len(self.fireworkList)):
-			if not self.fireworkList[i].done:
-				self.fireworkList[i].handle(self.renderer)
+	"""
+		Runs one step of the show.
+	"""
+	def simulate(self):
+		for firework in self.fireworkList:
+			firework.step(self.particles)
+		
+		#All of the particles get moved in one go.
+		self.particles.step()
+		
+		#A firework is done when it has exploded and all its particles are gone.
+		#Done ones go back to the pool, with the last firework in the list
+		#moved into their place.
+		counts = self.particles.groupCounts(len(self.pool.fireworks))
+		fireworkList = self.fireworkList
+		i = 0
+		while i < len(fireworkList):
+			firework = fireworkList[i]
+			if firework.state == FWState.explode and counts[firework.group] == 0:
+				firework.done = True
+				fireworkList[i] = fireworkList[-1]
+				fireworkList.pop()
+				self.pool.release(firework)
 			else:
-				self.fireworkList[i] = None
+				i += 1
+	
+	"""
+		Draws the show as it is, and presents it.
+	"""
+	def render(self):
+		stats = self.renderer.stats
+		if stats is not None:
+			stats.begin(ASCIIGLProfiler.RASTERIZE)
+		self.renderer.setLayer("show")
+		for firework in self.fireworkList:
+			firework.draw(self.renderer)
 		
+		#All of the particles get drawn in one go, too.
+		if self.bitplane is not None:
+			self.particles.plot(self.bitplane)
+			self.bitplane.draw(self.renderer)
+		else:
+			self.particles.draw(self.renderer)
 		
-		self.sign.handle(self.renderer)
+		if stats is not None:
+			self.renderer.setLayer("hud")
+			stats.drawHUD(self.renderer, 0, height-3)
+			stats.end(ASCIIGLProfiler.RASTERIZE)
 		self.renderer.blitToScreen(True)
 	
 	def addFirework(self, x, explodeHeight):
-		self.fireworkList.append(Firework(x, self.colorList[random.randrange(len(self.colorList))], explodeHeight))
+		firework = self.pool.acquire()
+		firework.launch(x, self.colorList[random.randrange(len(self.colorList))], explodeHeight)
+		self.fireworkList.append(firework)
 
-def main():
+"""
+	Reads the command line.
+"""
+def parseArguments(argv=None):
+	parser = argparse.ArgumentParser(description="Fireworks are the best, aren't they, when ASCII?")
+	parser.add_argument("--output", choices=("terminal", "memory", "null", "file"), default="terminal",
+	                    help="Where to present frames to. Anything but the terminal runs without a console.")
+	parser.add_argument("--file", default="fireworks.out",
+	                    help="The file to write frames to, with --output file.")
+	parser.add_argument("--pipelined", action="store_true",
+	                    help="Write frames on a background thread while the next one is drawn.")
+	parser.add_argument("--hud", action="store_true",
+	                    help="Profile every frame, and show a rundown of where the time goes.")
+	parser.add_argument("--budget", type=float, metavar="MS",
+	                    help="Lower the quality of the show whenever encoding and writing a frame takes longer than this.")
+	parser.add_argument("--density", action="store_true",
+	                    help="Draw particles that pile up in the same cell as denser and denser characters.")
+	parser.add_argument("--subcell", choices=("halfblock", "braille"),
+	                    help="Plot particles as dots, finer than a character. Needs a font with the block or Braille characters.")
+	parser.add_argument("--record", metavar="PATH",
+	                    help="Record every frame to a file, for ASCIIGLRecorder.py to play back.")
+	parser.add_argument("--frames", type=int, default=maxFrameCount,
+	                    help="How many simulation steps to run the show for.")
+	parser.add_argument("--step-rate", type=float, default=100.0,
+	                    help="How many simulation steps to run per second.")
+	parser.add_argument("--fps", type=float, default=60.0,
+	                    help="How many frames to render per second. 0 renders every step, as fast as possible.")
+	return parser.parse_args(argv)
+
+"""
+	Makes the output backend the command line asked for.
+"""
+def makeOutput(arguments):
+	if arguments.output == "memory":
+		return ASCIIGLOutput.MemoryOutput()
+	if arguments.output == "null":
+		return ASCIIGLOutput.NullOutput()
+	if arguments.output == "file":
+		return ASCIIGLOutput.FileOutput(arguments.file)
+	return ASCIIGLOutput.TerminalOutput()
+
+def main(argv=None):
+	arguments = parseArguments(argv)
+	output = makeOutput(arguments)
+	if arguments.pipelined:
+		output = ASCIIGLPresenter.Presenter(output)
 	show = Fireworks()
+	show.renderer.setOutputBackend(output)
+	show.renderer.setColorDepth(ASCIIGLColor.detectColorDepth())
+	show.renderer.setProfiling(arguments.hud)
+	if arguments.density:
+		show.particles.setDensityRamp()
+	if arguments.subcell:
+		mode = ASCIIGLBitplane.BRAILLE if arguments.subcell == "braille" else ASCIIGLBitplane.HALF_BLOCK
+		show.bitplane = ASCIIGLBitplane.Bitplane(width, height, mode)
 	show.renderer.clearScreen()
-	frameCount = 0
-	maxFrameCount = 400
-	while(frameCount < maxFrameCount):
+	maxFrameCount = arguments.frames
+	scheduler = ASCIIGLScheduler.Scheduler(arguments.step_rate, arguments.fps)
+	recorder = None
+	if arguments.record:
+		recorder = ASCIIGLRecorder.Recorder(arguments.record, width, height)
+		#Frames are stamped with the time in the show, not the time it took
+		#to render them, so a show rendered flat out plays back at the right speed.
+		recorder.clock = lambda: scheduler.steps * scheduler.stepTime
+		show.renderer.setRecorder(recorder)
+	quality = None
+	qualityChanges = []
+	if arguments.budget:
+		quality = ASCIIGLQuality.QualityController(arguments.budget / 1000.0)
+		quality.addParticleSystem(show.particles)
+		quality.addListener(lambda controller, old, new: qualityChanges.append((scheduler.steps, new)))
+		show.renderer.setQualityController(quality)
+	
+	def simulate():
+		if((scheduler.steps+1) % 5 == 0):
+			show.addFirework( random.randrange(int(width*.25), int(width*.75)), random.randrange(int(height*.05), int(height*.25)))
+		stats = show.renderer.stats
+		if stats is not None:
+			stats.begin(ASCIIGLProfiler.SIMULATE)
+		show.simulate()
+		if stats is not None:
+			stats.end(ASCIIGLProfiler.SIMULATE)
+	
+	def render():
+		#The HUD, if there is one, says a lot more than this.
+		if show.renderer.stats is None:
+			show.renderer.setLayer("hud")
+			show.renderer.text(0, height-1, "Frames: "+str(scheduler.steps)+ " / "+str(maxFrameCount) )
+		show.render()
+	
+	while(scheduler.steps < maxFrameCount):
 		try:
-			frameCount+=1
-			show.renderer.text(0, height, "Frames: "+str(frameCount)+ " / "+str(maxFrameCount) )
-			if(frameCount % 5 == 0):
-				show.addFirework( random.randrange(int(width*.25), int(width*.75)), random.randrange(int(height*.05), int(height*.25)))
-			show.handle()
-			time.sleep(.01)
+			scheduler.run(simulate, render, maxFrameCount)
 		except KeyboardInterrupt:
 			maxFrameCount+=100
 	show.renderer.resetAppearance()
 	show.renderer.clearScreen()
+	output.close()
+	if recorder is not None:
+		show.renderer.setRecorder(None)
+		recorder.close()
+	
+	sys.stderr.write("%d steps, %d frames rendered in %.3f s (%.1f frames/s), %d frames skipped\n" %
+	                 (scheduler.steps, scheduler.frames, scheduler.elapsed, scheduler.achievedFPS(), scheduler.skippedFrames))
 	
-main()
+	#Without a console, say how much was written, too.
+	if arguments.output != "terminal":
+		sys.stderr.write("%d bytes (%.0f bytes/frame)\n" % (output.bytesWritten, output.bytesWritten / float(max(scheduler.frames, 1))))
+	if quality is not None:
+		sys.stderr.write("quality: %d steps down, %d steps up, %d frames over budget, ended at %s\n" %
+		                 (quality.stepsDown, quality.stepsUp, quality.framesOverBudget, ASCIIGLQuality.LEVEL_NAMES[quality.level]))
+		for step, level in qualityChanges:
+			sys.stderr.write("  step %d: %s\n" % (step, ASCIIGLQuality.LEVEL_NAMES[level]))
+	if arguments.pipelined:
+		sys.stderr.write("%d frames dropped, at most %d frames waiting\n" % (show.renderer.droppedFrames, output.peakDepth))
+
+if __name__ == "__main__":
+	main()
 	
 
 